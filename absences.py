@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""Absences (congés, maladie...) : types, index d'intervalles par employé et heures d'absence.
+
+Les absences d'un employé ne se chevauchent pas : triées par début, leurs fins sont aussi
+triées, et les absences qui recoupent un intervalle se trouvent par deux bisections
+(AbsenceIndex, O(log n)). Côté base, find_absence et get_blocking_absence lisent une seule
+ligne de l'index (employee_id, start).
+
+Chaque type compte ou non dans les heures du contrat : un congé payé est crédité comme du
+travail, une absence maladie reste un manque d'heures mais est distinguée d'un sous-planning.
+Surcharge possible : ABSENCE_COUNTED_TYPES="conges_payes,rtt,formation".
+"""
+import os
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from models import db, Absence
+
+ABSENCE_TYPES = {
+    'conges_payes': {'label': 'Congés payés', 'counts_toward_contract': True},
+    'rtt': {'label': 'RTT', 'counts_toward_contract': True},
+    'formation': {'label': 'Formation', 'counts_toward_contract': True},
+    'maladie': {'label': 'Maladie', 'counts_toward_contract': False},
+    'sans_solde': {'label': 'Congé sans solde', 'counts_toward_contract': False},
+}
+
+if os.environ.get("ABSENCE_COUNTED_TYPES") is not None:
+    _counted = {name.strip() for name in os.environ["ABSENCE_COUNTED_TYPES"].split(",")}
+    for _name, _config in ABSENCE_TYPES.items():
+        _config['counts_toward_contract'] = _name in _counted
+
+# Une journée d'absence vaut heures hebdomadaires / ABSENCE_DAYS_PER_WEEK, du lundi au vendredi
+ABSENCE_DAYS_PER_WEEK = 5
+
+
+class AbsenceIndex:
+    """Absences d'un employé triées par début (sans chevauchement)."""
+
+    def __init__(self, absences):
+        self.absences = sorted(absences, key=lambda absence: absence.start)
+        self._starts = [absence.start for absence in self.absences]
+        self._ends = [absence.end for absence in self.absences]
+
+    def overlapping(self, start, end):
+        """Absences qui recoupent [start, end[."""
+        # Première absence finissant après 'start', première commençant à partir de 'end'
+        return self.absences[bisect_right(self._ends, start):bisect_left(self._starts, end)]
+
+    def find(self, start, end, approved_only=True):
+        for absence in self.overlapping(start, end):
+            if absence.approved or not approved_only:
+                return absence
+        return None
+
+
+def load_absence_indexes(employee_ids, range_start, range_end):
+    """{employee_id: AbsenceIndex} des absences recoupant [range_start, range_end[, en une requête.
+
+    Chaque employé demandé a un index (éventuellement vide).
+    """
+    by_employee = defaultdict(list)
+    if employee_ids:
+        rows = db.session.query(
+            Absence.id, Absence.employee_id, Absence.absence_type, Absence.start, Absence.end, Absence.approved
+        ).filter(
+            Absence.employee_id.in_(employee_ids),
+            Absence.start < range_end,
+            Absence.end > range_start
+        ).all()
+        for row in rows:
+            by_employee[row.employee_id].append(row)
+    return {employee_id: AbsenceIndex(by_employee.get(employee_id, ())) for employee_id in employee_ids}
+
+
+def _overlapping_absences(employee_id, start, end):
+    return Absence.query.filter(
+        Absence.employee_id == employee_id,
+        Absence.start < end,
+        Absence.end > start
+    ).order_by(Absence.start.desc())
+
+
+def find_absence(employee_id, start, end):
+    """Absence (approuvée ou non) recoupant [start, end[, lue par l'index (employé, début)."""
+    return _overlapping_absences(employee_id, start, end).first()
+
+
+def get_blocking_absence(employee_id, start, end):
+    """Absence approuvée qui empêche de planifier l'employé sur [start, end[, ou None.
+
+    Filtrée en base : une demande en attente qui recoupe aussi le créneau ne masque pas
+    l'absence approuvée.
+    """
+    return _overlapping_absences(employee_id, start, end).filter(Absence.approved.is_(True)).first()
+
+
+def get_absence_version(employee_ids, range_start, range_end):
+    """Version des absences d'une fenêtre (pour l'ETag du planning)."""
+    if not employee_ids:
+        return None
+    return tuple(db.session.query(
+        db.func.count(Absence.id),
+        db.func.max(Absence.updated_at),
+        db.func.coalesce(db.func.sum(Absence.id), 0)
+    ).filter(
+        Absence.employee_id.in_(employee_ids),
+        Absence.start < range_end,
+        Absence.end > range_start
+    ).one())
+
+
+def absence_hours(index, range_start, range_end, hours_per_week):
+    """(heures créditées au contrat, heures d'absence totales) des absences approuvées sur la fenêtre.
+
+    Chaque jour ouvré couvert compte au plus heures hebdomadaires / ABSENCE_DAYS_PER_WEEK.
+    """
+    if index is None:
+        return 0.0, 0.0
+    daily_hours = (hours_per_week or 35.0) / ABSENCE_DAYS_PER_WEEK
+    credited = total = 0.0
+    for absence in index.overlapping(range_start, range_end):
+        if not absence.approved:
+            continue
+        start, end = max(absence.start, range_start), min(absence.end, range_end)
+        hours = 0.0
+        day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        while day < end:
+            next_day = day + timedelta(days=1)
+            if day.weekday() < ABSENCE_DAYS_PER_WEEK:
+                covered = (min(end, next_day) - max(start, day)).total_seconds() / 3600
+                hours += min(covered, daily_hours)
+            day = next_day
+        total += hours
+        if ABSENCE_TYPES.get(absence.absence_type, {}).get('counts_toward_contract'):
+            credited += hours
+    return round(credited, 2), round(total, 2)
+
+
+def serialize_absence(absence):
+    return {
+        "id": absence.id,
+        "employee_id": absence.employee_id,
+        "type": absence.absence_type,
+        "label": ABSENCE_TYPES.get(absence.absence_type, {}).get('label', absence.absence_type),
+        "start": absence.start.isoformat(),
+        "end": absence.end.isoformat(),
+        "approved": bool(absence.approved),
+    }
+
+
+def parse_absence_bound(value, is_end=False):
+    """Date 'AAAA-MM-JJ' (journée entière, fin incluse) ou date-heure ISO."""
+    if len(value) == 10:
+        day = datetime.strptime(value, '%Y-%m-%d')
+        return day + timedelta(days=1) if is_end else day
+    return datetime.fromisoformat(value.replace('Z', ''))
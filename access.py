@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Contrôle d'accès partagé par les blueprints : périmètre d'un manager, réservé Ultra-Admin."""
+from functools import wraps
+
+from flask import redirect, url_for, flash
+from flask_login import current_user
+
+from models import Employee, Team
+
+def get_manageable_employees(user):
+    """Retourne les employés qu'un manager peut gérer"""
+    if user.is_admin:
+        return Employee.query.filter_by(is_active=True).all()
+    
+    if not user.is_manager:
+        return []
+    
+    manager_employee = user.employee
+    if not manager_employee:
+        return []
+    
+    # Employés des équipes gérées par ce manager
+    managed_teams = Team.query.filter_by(manager_id=manager_employee.id).all()
+    team_employees = []
+    for team in managed_teams:
+        team_employees.extend(team.members)
+    
+    # Employés sans équipe (si le manager peut les gérer)
+    unassigned_employees = Employee.query.filter_by(team_id=None, is_active=True).all()
+    
+    all_employees = team_employees + unassigned_employees
+    # Supprimer les doublons
+    unique_employees = {emp.id: emp for emp in all_employees}.values()
+    
+    return list(unique_employees)
+
+def super_admin_required(f):
+    """Décorateur pour exiger que l'utilisateur soit un Ultra-Admin."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        # Utilise getattr pour gérer les cas où la colonne n'existerait pas encore (avant migration)
+        if not current_user.is_authenticated or not getattr(current_user, 'is_super_admin', False):
+            flash("Accès refusé. Fonctionnalité réservée à l'Ultra-Administrateur.", 'error')
+            return redirect(url_for('dashboard.index')) 
+        return f(*args, **kwargs)
+    return decorated_function
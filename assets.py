@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Pipeline des fichiers statiques : noms empreintés (hash du contenu) et cache longue durée.
+
+Au démarrage (ou via 'flask build-assets'), chaque fichier de static/ est copié dans
+static/dist/ sous un nom contenant le hash de son contenu. Les templates utilisent
+asset_url() ; ces URL ne changent qu'avec le contenu, elles peuvent donc être mises
+en cache un an ('immutable') : aucune requête d'asset une fois le cache chaud.
+"""
+import hashlib
+import json
+import os
+import re
+
+from flask import send_from_directory, url_for
+
+ASSETS_DIST_DIR = 'dist'
+ASSETS_MANIFEST = 'manifest.json'
+ASSETS_URL_PREFIX = '/assets'
+ASSETS_MAX_AGE = 365 * 24 * 3600
+
+_manifest = {}
+
+
+def _minify_css(text):
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    return re.sub(r'\s*([{}:;,>])\s*', r'\1', text).strip()
+
+
+def _minify_js(text):
+    # Minification prudente : indentation et lignes vides uniquement (pas d'analyse syntaxique)
+    return '\n'.join(line.strip() for line in text.splitlines() if line.strip()) + '\n'
+
+
+MINIFIERS = {
+    '.css': _minify_css,
+    '.js': _minify_js,
+}
+
+
+def build_assets(static_folder, minify=False):
+    """Écrit les copies empreintées dans static/dist et retourne le manifeste {nom logique: nom empreinté}."""
+    dist_folder = os.path.join(static_folder, ASSETS_DIST_DIR)
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.abspath(root) == os.path.abspath(static_folder):
+            dirs[:] = [d for d in dirs if d != ASSETS_DIST_DIR]
+        for name in files:
+            source = os.path.join(root, name)
+            logical = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            stem, ext = os.path.splitext(logical)
+
+            with open(source, 'rb') as f:
+                content = f.read()
+            if minify and ext in MINIFIERS:
+                content = MINIFIERS[ext](content.decode('utf-8')).encode('utf-8')
+
+            digest = hashlib.sha256(content).hexdigest()[:12]
+            hashed = f"{stem}.{digest}{ext}"
+            target = os.path.join(dist_folder, hashed)
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                # Écriture atomique : plusieurs workers peuvent construire en même temps
+                tmp = f"{target}.{os.getpid()}.tmp"
+                with open(tmp, 'wb') as f:
+                    f.write(content)
+                os.replace(tmp, target)
+            manifest[logical] = hashed
+
+    tmp = os.path.join(dist_folder, f"{ASSETS_MANIFEST}.{os.getpid()}.tmp")
+    os.makedirs(dist_folder, exist_ok=True)
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, os.path.join(dist_folder, ASSETS_MANIFEST))
+    return manifest
+
+
+def load_manifest(static_folder):
+    path = os.path.join(static_folder, ASSETS_DIST_DIR, ASSETS_MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def asset_url(filename):
+    """URL empreintée d'un fichier de static/ (repli sur l'URL classique s'il n'est pas dans le manifeste)."""
+    hashed = _manifest.get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('hashed_asset', filename=hashed)
+
+
+def init_assets(app):
+    """Construit (ou charge, si ASSETS_PREBUILT=1) le manifeste et enregistre la route et le helper."""
+    global _manifest
+    minify = os.environ.get("ASSETS_MINIFY", "0") == "1"
+    manifest = load_manifest(app.static_folder) if os.environ.get("ASSETS_PREBUILT") == "1" else None
+    _manifest = manifest if manifest is not None else build_assets(app.static_folder, minify=minify)
+
+    dist_folder = os.path.join(app.static_folder, ASSETS_DIST_DIR)
+
+    @app.route(f"{ASSETS_URL_PREFIX}/<path:filename>", endpoint='hashed_asset')
+    def hashed_asset(filename):
+        response = send_from_directory(dist_folder, filename, max_age=ASSETS_MAX_AGE)
+        response.headers['Cache-Control'] = f"public, max-age={ASSETS_MAX_AGE}, immutable"
+        return response
+
+    @app.cli.command("build-assets")
+    def build_assets_command():
+        """Construit les fichiers statiques empreintés (à lancer au build)."""
+        result = build_assets(app.static_folder, minify=minify)
+        print(f"{len(result)} fichiers empreintés dans {dist_folder}")
+
+    app.add_template_global(asset_url, 'asset_url')
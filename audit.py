@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""Journal des modifications du planning (AuditLog) écrit en tâche de fond.
+
+Les vues appellent record_audit() après un commit réussi : l'entrée (valeurs avant / après,
+auteur, date) est seulement déposée dans une file en mémoire, la requête n'attend aucune
+écriture. Un thread par processus vide la file par lots (AUDIT_BATCH_SIZE lignes par INSERT,
+au plus toutes les AUDIT_FLUSH_INTERVAL secondes). À l'arrêt (atexit, worker_exit de
+gunicorn), flush_audit() écrit ce qui reste dans la file.
+
+Le thread est démarré à la première entrée de chaque processus : en mode préchargé, les
+workers forkés ont chacun le leur (aucun thread hérité du maître).
+"""
+import atexit
+import os
+import queue
+import threading
+from datetime import date, datetime, time
+
+from flask import has_request_context
+from flask_login import current_user
+
+from models import db, AuditLog, User
+
+AUDIT_BATCH_SIZE = int(os.environ.get("AUDIT_BATCH_SIZE", 200))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get("AUDIT_FLUSH_INTERVAL", 1.0))
+# File pleine (base indisponible) : les entrées sont comptées comme perdues plutôt que de bloquer les requêtes
+AUDIT_QUEUE_SIZE = int(os.environ.get("AUDIT_QUEUE_SIZE", 10000))
+
+# Champs journalisés par type d'entité
+ASSIGNMENT_FIELDS = ('employee_id', 'shift_id', 'start', 'end', 'notes', 'version')
+SHIFT_FIELDS = ('name', 'color', 'start_time', 'end_time', 'employees_needed')
+TEAM_FIELDS = ('name', 'description', 'manager_id')
+CONTRACT_FIELDS = ('contract_hours_per_week', 'contract_hours_per_month', 'contract_type')
+
+
+def snapshot(obj, fields):
+    """Valeurs des champs d'un objet, sérialisables en JSON."""
+    values = {}
+    for field in fields:
+        value = getattr(obj, field, None)
+        if isinstance(value, (datetime, date, time)):
+            value = value.isoformat()
+        values[field] = value
+    return values
+
+
+class AuditWriter:
+    """File d'entrées du journal et thread d'écriture par lots (un par processus)."""
+
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._stop = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def init_app(self, app):
+        if self.app is None:
+            atexit.register(self.flush)
+        self.app = app
+
+    def _ensure_started(self):
+        # Après un fork, la file et le thread du processus parent ne sont plus utilisables
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=AUDIT_QUEUE_SIZE)
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def put(self, entry):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+            print(f"Journal des modifications : file pleine, entrée perdue ({entry['action']} {entry['entity_type']})")
+
+    def _next_batch(self, timeout):
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(batch) < AUDIT_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        with self.app.app_context():
+            try:
+                # Nom et établissement des auteurs lus ici, une requête par lot (pas dans la requête HTTP)
+                user_ids = {entry["user_id"] for entry in batch if entry["user_id"] is not None}
+                users = {row.id: row for row in db.session.query(
+                    User.id, User.username, User.establishment_id).filter(User.id.in_(user_ids))} if user_ids else {}
+                for entry in batch:
+                    user = users.get(entry["user_id"])
+                    entry["username"] = user.username if user else None
+                    entry["establishment_id"] = user.establishment_id if user else None
+                db.session.execute(db.insert(AuditLog), batch)
+                db.session.commit()
+                self.written += len(batch)
+            except Exception as e:
+                db.session.rollback()
+                self.failed += len(batch)
+                print(f"Erreur lors de l'écriture du journal des modifications ({len(batch)} entrées): {e}")
+            finally:
+                db.session.remove()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch(AUDIT_FLUSH_INTERVAL)
+            if batch:
+                self._write(batch)
+
+    def flush(self, timeout=5.0):
+        """Arrête le thread du processus et écrit les entrées restantes (arrêt du processus)."""
+        if self._pid != os.getpid() or self.app is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        while True:
+            batch = self._next_batch(0)
+            if not batch:
+                break
+            self._write(batch)
+        self._pid = None
+
+    def stats(self):
+        pending = self._queue.qsize() if self._pid == os.getpid() else 0
+        return {"pending": pending, "written": self.written, "dropped": self.dropped, "failed": self.failed}
+
+
+audit_writer = AuditWriter()
+
+
+def init_audit(app):
+    audit_writer.init_app(app)
+
+
+def record_audit(action, entity_type, entity_id, before=None, after=None):
+    """Dépose une entrée du journal (à appeler après le commit de la modification)."""
+    user_id = None
+    if has_request_context() and not current_user.is_anonymous:
+        # Identité lue dans la clé de l'objet : pas de rechargement de l'utilisateur expiré par le commit
+        user_id = db.inspect(current_user._get_current_object()).identity[0]
+    audit_writer.put({
+        "created_at": datetime.utcnow(),
+        "user_id": user_id,
+        "action": action,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "before": before,
+        "after": after,
+    })
+
+
+def flush_audit():
+    audit_writer.flush()
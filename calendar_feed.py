@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Flux iCalendar (.ics) des assignations d'un employé, pour les agendas des téléphones.
+
+L'URL contient un jeton secret propre à l'employé ('<établissement>.<aléa>' : le préfixe
+désigne le shard à interroger, voir sharding.py). Le flux couvre une fenêtre glissante
+(CALENDAR_FEED_PAST_DAYS jours passés, CALENDAR_FEED_FUTURE_DAYS à venir).
+
+Les agendas interrogent le flux toutes les quelques minutes : sa version (employé, dernier
+updated_at, nombre d'assignations) est lue en une requête sur l'index (employee_id,
+updated_at) et la plupart des appels reçoivent un 304 sans charger d'assignation. Le nombre
+détecte les suppressions, qui ne modifient aucun updated_at.
+
+Seul l'ETag sert de validateur : une date Last-Modified tirée de MAX(updated_at) ne
+changerait ni après une suppression ni après le renommage d'un service.
+"""
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+
+from models import db, Employee, Assignment
+
+CALENDAR_FEED_PAST_DAYS = 30
+CALENDAR_FEED_FUTURE_DAYS = 90
+# Délai de rafraîchissement suggéré aux agendas
+CALENDAR_FEED_REFRESH = "PT15M"
+
+
+def generate_calendar_token(employee):
+    """Nouveau jeton (l'ancien cesse de fonctionner) ; commit laissé à l'appelant."""
+    employee.calendar_token = f"{employee.establishment_id or 0}.{secrets.token_urlsafe(24)}"
+    return employee.calendar_token
+
+
+def token_establishment(token):
+    """Établissement désigné par le jeton (None : base centrale) ; ValueError si le jeton est mal formé."""
+    prefix, _, secret = token.partition(".")
+    if not secret:
+        raise ValueError("Jeton de calendrier invalide")
+    return int(prefix) or None
+
+
+def get_feed_version(token):
+    """(employee_id, nom, dernier updated_at, nombre d'assignations) en une requête, ou None si jeton inconnu."""
+    return db.session.query(
+        Employee.id,
+        Employee.full_name,
+        db.func.max(Assignment.updated_at),
+        db.func.count(Assignment.employee_id)
+    ).outerjoin(Assignment, Assignment.employee_id == Employee.id).filter(
+        Employee.calendar_token == token,
+        Employee.is_active.is_(True)
+    ).group_by(Employee.id, Employee.full_name).first()
+
+
+def feed_window(now=None):
+    """Fenêtre glissante [début, fin[ du flux, en jours entiers (heure locale)."""
+    today = (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=CALENDAR_FEED_PAST_DAYS), today + timedelta(days=CALENDAR_FEED_FUTURE_DAYS + 1)
+
+
+def feed_etag(version, window_start, shift_catalog):
+    """ETag du flux : version de l'employé, début de la fenêtre glissante et catalogue des services."""
+    return hashlib.sha1(repr((tuple(version), window_start, shift_catalog)).encode("utf-8")).hexdigest()
+
+
+def _escape(text):
+    return (text or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n")
+
+
+def _fold(line):
+    """Lignes de 75 octets au plus, suite précédée d'une espace (RFC 5545, 3.1)."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    parts, current = [], b""
+    for char in line:
+        char_bytes = char.encode("utf-8")
+        # 74 octets pour les lignes de continuation (l'espace initiale compte)
+        if len(current) + len(char_bytes) > (75 if not parts else 74):
+            parts.append(current.decode("utf-8"))
+            current = b""
+        current += char_bytes
+    parts.append(current.decode("utf-8"))
+    return "\r\n ".join(parts)
+
+
+def _local(value):
+    # Heure « flottante » : affichée telle quelle, comme dans le planning
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+def _utc(value):
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+def build_calendar(employee_name, assignments, shift_names, generated_at):
+    """Texte iCalendar : assignations (id, start, end, shift_id, notes, version, updated_at)."""
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Maihlili//Planning//FR",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(f'Planning - {employee_name}')}",
+        f"REFRESH-INTERVAL;VALUE=DURATION:{CALENDAR_FEED_REFRESH}",
+        f"X-PUBLISHED-TTL:{CALENDAR_FEED_REFRESH}",
+    ]
+    for assignment in assignments:
+        stamp = assignment.updated_at or generated_at
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:assignment-{assignment.id}@maihlili",
+            f"DTSTAMP:{_utc(stamp)}",
+            f"LAST-MODIFIED:{_utc(stamp)}",
+            f"SEQUENCE:{max((assignment.version or 1) - 1, 0)}",
+            f"DTSTART:{_local(assignment.start)}",
+            f"DTEND:{_local(assignment.end)}",
+            f"SUMMARY:{_escape(shift_names.get(assignment.shift_id, 'Service'))}",
+        ]
+        if assignment.notes:
+            lines.append(f"DESCRIPTION:{_escape(assignment.notes)}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(_fold(line) for line in lines) + "\r\n"
+
+
+def load_feed_assignments(employee_id, window_start, window_end):
+    return db.session.query(
+        Assignment.id, Assignment.start, Assignment.end, Assignment.shift_id, Assignment.notes,
+        Assignment.version, Assignment.updated_at
+    ).filter(
+        Assignment.employee_id == employee_id,
+        Assignment.start < window_end,
+        Assignment.end > window_start
+    ).order_by(Assignment.start).all()
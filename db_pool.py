@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""Profils de pool de connexions (DB_POOL_PROFILE) et métriques des pools.
+
+Profils :
+- render (défaut) : réglages historiques, pre-ping à chaque emprunt et recyclage à 300 s ;
+- single-worker : un seul processus, pool plus large, sans pre-ping (recyclage à 30 min) ;
+- multi-worker : budget de connexions DB_MAX_CONNECTIONS réparti entre WEB_CONCURRENCY workers ;
+- pgbouncer-transaction : PgBouncer en mode transaction fait office de pool, aucune connexion conservée.
+
+Les pools sont instrumentés (emprunts, attente, débordement, invalidations, délais dépassés) ;
+les compteurs sont propres à chaque processus.
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import NullPool, QueuePool
+
+DEFAULT_POOL_PROFILE = "render"
+
+
+class _PoolMetrics:
+    """Compteurs d'un pool, protégés par un verrou (plusieurs threads empruntent en parallèle)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+        self.invalidations = 0
+
+    def record_checkout(self, waited):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_invalidation(self, *args):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "wait_ms_avg": round(1000 * self.wait_seconds_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(1000 * self.wait_seconds_max, 3),
+                "timeouts": self.timeouts,
+                "invalidations": self.invalidations,
+            }
+
+
+class _InstrumentedPoolMixin:
+    """Mesure le temps passé à obtenir une connexion du pool (attente comprise)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = _PoolMetrics()
+        event.listen(self, "invalidate", self.metrics.record_invalidation)
+        event.listen(self, "soft_invalidate", self.metrics.record_invalidation)
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout()
+            raise
+        self.metrics.record_checkout(time.perf_counter() - started)
+        return connection
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedNullPool(_InstrumentedPoolMixin, NullPool):
+    pass
+
+
+def _multi_worker_options():
+    workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+    threads = int(os.environ.get("GUNICORN_THREADS", 1))
+    budget = int(os.environ.get("DB_MAX_CONNECTIONS", 20))
+    # Une connexion permanente par thread ; le reste du budget du worker en débordement
+    pool_size = max(1, threads)
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max(0, budget // max(1, workers) - pool_size),
+        "pool_timeout": 10,
+        "pool_recycle": 1800,
+        "pool_use_lifo": True,
+    }
+
+
+POOL_PROFILES = {
+    "render": lambda: {
+        "poolclass": InstrumentedQueuePool,
+        "pool_pre_ping": True,
+        "pool_recycle": 300,
+    },
+    "single-worker": lambda: {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": 10,
+        "max_overflow": 10,
+        "pool_timeout": 10,
+        "pool_recycle": 1800,
+        # LIFO : les connexions inutilisées restent au repos et sont recyclées, les autres restent chaudes
+        "pool_use_lifo": True,
+    },
+    "multi-worker": _multi_worker_options,
+    "pgbouncer-transaction": lambda: {
+        "poolclass": InstrumentedNullPool,
+    },
+}
+
+
+def get_engine_options(profile=None):
+    """Options d'engine du profil demandé (DB_POOL_PROFILE par défaut)."""
+    profile = profile or os.environ.get("DB_POOL_PROFILE", DEFAULT_POOL_PROFILE)
+    if profile not in POOL_PROFILES:
+        raise ValueError(f"Profil de pool inconnu : {profile} (disponibles : {', '.join(POOL_PROFILES)})")
+    return profile, POOL_PROFILES[profile]()
+
+
+def get_pool_metrics(engines):
+    """État des pools de chaque bind : compteurs cumulés + occupation instantanée."""
+    pools = {}
+    for bind_key, engine in engines.items():
+        pool = engine.pool
+        stats = pool.metrics.snapshot() if hasattr(pool, "metrics") else {}
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(0, pool.overflow()),
+            })
+        pools[bind_key or "default"] = stats
+    return pools
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""Routage lecture / écriture entre la base principale et des réplicas en lecture.
+
+Les réplicas sont optionnels (SQLALCHEMY_REPLICA_URIS, séparées par des virgules) et
+déclarés comme binds 'replica_0', 'replica_1'... Seules les routes marquées @read_replica
+lisent sur un réplica, pour les requêtes GET/HEAD. Les écritures (flush, UPDATE/DELETE
+en bloc) vont toujours à la base principale. Après une écriture, l'utilisateur lit
+sur la base principale pendant REPLICA_READ_YOUR_WRITES_SECONDS (lecture de ses propres
+écritures malgré le retard de réplication).
+
+Les résultats gardés en cache par processus (historique des heures, payloads et catalogue
+du planning, statistiques) sont lus dans un bloc primary_reads() : un réplica en retard
+n'y laisse pas un état ancien que rien n'invaliderait.
+
+Test en local : deux fichiers SQLite (le réplica étant une copie du principal) ou deux
+bases PostgreSQL locales en réplication.
+
+Les tables d'un établissement (TENANT_TABLES) peuvent en outre vivre sur un shard dédié :
+voir sharding.py, qui fixe le bind de l'établissement courant.
+"""
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.sql.util import find_tables
+
+REPLICA_BIND_PREFIX = "replica_"
+REPLICA_READ_YOUR_WRITES_SECONDS = float(os.environ.get("REPLICA_READ_YOUR_WRITES_SECONDS", 10))
+
+# Horodatage de la dernière écriture, conservé dans la session Flask (cookie)
+LAST_WRITE_SESSION_KEY = "_last_write_at"
+
+
+# Tables propres à un établissement : servies par la base (shard) de l'établissement courant
+TENANT_TABLES = frozenset({
+    'employees', 'employee_teams', 'teams', 'assignments', 'timesheet_entries', 'clock_punches', 'absences',
+})
+
+# Bind de l'établissement courant (None : base centrale) ; ContextVar pour les threads et la CLI
+_tenant_bind = ContextVar("tenant_bind", default=None)
+
+
+def current_tenant_bind():
+    return _tenant_bind.get()
+
+
+def set_tenant_bind(bind_key):
+    """Fixe le bind des tables d'établissement ; retourne le jeton à passer à reset_tenant_bind."""
+    return _tenant_bind.set(bind_key)
+
+
+def reset_tenant_bind(token):
+    _tenant_bind.reset(token)
+
+
+def _touches_tenant_tables(mapper, clause):
+    if mapper is not None:
+        return sa_inspect(mapper).local_table.name in TENANT_TABLES
+    if clause is not None:
+        return any(getattr(table, "name", None) in TENANT_TABLES
+                   for table in find_tables(clause, include_crud=True, include_joins=True))
+    return False
+
+
+def _replica_bind():
+    if not has_request_context() or g.get("db_wrote"):
+        return None
+    return g.get("replica_bind")
+
+
+class RoutingSession(Session):
+    """Session SQLAlchemy : tables d'établissement vers leur shard, lectures éligibles vers un réplica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        tenant = current_tenant_bind() if bind is None else None
+        if tenant and _touches_tenant_tables(mapper, clause):
+            return self._db.engines[tenant]
+        replica = _replica_bind() if bind is None and not self._flushing else None
+        if replica and not getattr(clause, "is_dml", False):
+            return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _mark_write(*args):
+    if has_request_context():
+        g.db_wrote = True
+
+
+def _mark_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _mark_write()
+
+
+@contextmanager
+def primary_reads():
+    """Lectures du bloc sur la base principale, même dans une route @read_replica."""
+    if not has_request_context():
+        yield
+        return
+    previous = g.get("replica_bind")
+    g.replica_bind = None
+    try:
+        yield
+    finally:
+        g.replica_bind = previous
+
+
+def read_replica(f):
+    """Marque une route en lecture seule : ses requêtes GET peuvent être servies par un réplica."""
+    # Attribut recopié par functools.wraps (login_required...) : visible sur la vue enregistrée
+    f.read_replica = True
+    return f
+
+
+def configure_replicas(app):
+    """Déclare les binds des réplicas (à appeler avant db.init_app)."""
+    uris = [uri.strip() for uri in os.environ.get("SQLALCHEMY_REPLICA_URIS", "").split(",") if uri.strip()]
+    binds = app.config.setdefault("SQLALCHEMY_BINDS", {})
+    for index, uri in enumerate(uris):
+        binds[f"{REPLICA_BIND_PREFIX}{index}"] = uri
+    app.config["REPLICA_BINDS"] = [f"{REPLICA_BIND_PREFIX}{index}" for index in range(len(uris))]
+
+
+def init_read_replicas(app):
+    """Choisit le moteur de chaque requête et mémorise les écritures (read-your-writes)."""
+    event.listen(RoutingSession, "after_flush", _mark_write)
+    event.listen(RoutingSession, "do_orm_execute", _mark_bulk_write)
+
+    @app.before_request
+    def choose_database():
+        g.replica_bind = None
+        replicas = app.config.get("REPLICA_BINDS")
+        if not replicas or request.method not in ("GET", "HEAD"):
+            return
+        view = app.view_functions.get(request.endpoint)
+        if not getattr(view, "read_replica", False):
+            return
+        if time.time() - session.get(LAST_WRITE_SESSION_KEY, 0) < REPLICA_READ_YOUR_WRITES_SECONDS:
+            return
+        # Un seul réplica par requête : lectures cohérentes entre elles
+        g.replica_bind = random.choice(replicas)
+
+    @app.after_request
+    def remember_write(response):
+        if g.get("db_wrote") and app.config.get("REPLICA_BINDS"):
+            session[LAST_WRITE_SESSION_KEY] = time.time()
+        return response
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Recherche d'employés à la frappe (nom, poste ou équipe) pour les sélecteurs.
+
+Employee.search_text contient ' helene dupont serveuse salle' (minuscules, sans accents,
+voir models.normalize_search_text) ; chaque mot saisi doit commencer un mot de ce texte
+(LIKE '% terme%'). Sur PostgreSQL, l'index trigramme (pg_trgm) sert ces LIKE ; les résultats
+sont bornés (au plus EMPLOYEE_SEARCH_MAX_LIMIT) et limités au périmètre de l'utilisateur.
+"""
+from sqlalchemy import case
+
+from models import db, Employee, Team, normalize_search_text
+from team_membership import manageable_employees_criterion
+
+EMPLOYEE_SEARCH_LIMIT = 20
+EMPLOYEE_SEARCH_MAX_LIMIT = 50
+
+
+def search_employees(user, query, limit=EMPLOYEE_SEARCH_LIMIT, unassigned=False):
+    """Employés actifs gérables par user dont le texte de recherche contient tous les mots saisis.
+
+    Sans mot saisi, les premiers employés par ordre alphabétique. unassigned=True : sans équipe.
+    """
+    terms = normalize_search_text(query or '').split()
+    limit = max(1, min(limit, EMPLOYEE_SEARCH_MAX_LIMIT))
+    rows = db.session.query(
+        Employee.id, Employee.full_name, Employee.position, Team.name.label('team_name')
+    ).outerjoin(Team, Team.id == Employee.team_id).filter(
+        Employee.is_active.is_(True),
+        manageable_employees_criterion(user)
+    )
+    # normalize_search_text ne laisse ni '%' ni '_' : aucun échappement nécessaire
+    for term in terms:
+        rows = rows.filter(Employee.search_text.like(f'% {term}%'))
+    if unassigned:
+        rows = rows.filter(Employee.team_id.is_(None))
+
+    order_by = [Employee.full_name, Employee.id]
+    if terms:
+        # Les noms qui commencent par le premier mot saisi d'abord
+        order_by.insert(0, case((Employee.search_text.like(f' {terms[0]}%'), 0), else_=1))
+    return rows.order_by(*order_by).limit(limit).all()
+
+
+def serialize_search_result(row):
+    return {
+        "id": row.id,
+        "full_name": row.full_name,
+        "position": row.position,
+        "team": row.team_name,
+    }
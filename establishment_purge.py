@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""Suppression d'un établissement en tâche de fond, par lots bornés.
+
+La demande de suppression masque immédiatement l'établissement (deleted_at) et désactive
+ses employés ; ses utilisateurs ne peuvent plus se connecter ni écrire. La purge supprime ensuite pointages, assignations, absences, liens d'équipes puis
+employés par paquets de PURGE_BATCH_SIZE lignes, chaque paquet dans sa propre transaction.
+L'avancement est enregistré sur l'établissement : une purge interrompue reprend là où
+elle s'était arrêtée (commande 'flask purge-establishments').
+"""
+import threading
+import time
+from datetime import datetime
+
+from models import (db, Establishment, User, Employee, Team, Shift, Assignment,
+                    TimeSheetEntry, ClockPunch, Absence, employee_teams, invalidate_hours_history)
+from sharding import tenant_scope, clear_tenant_cache, TENANT_CACHE_TTL
+
+# Lignes supprimées par transaction : borne la durée des verrous
+PURGE_BATCH_SIZE = 1000
+
+
+def request_establishment_deletion(establishment):
+    """Masque l'établissement et ses employés (une transaction courte) ; la purge vient ensuite."""
+    establishment.deleted_at = datetime.utcnow()
+    establishment.purge_progress = {'step': 'pending', 'deleted': {}}
+    # Employés désactivés sur le shard de l'établissement ; deleted_at reste sur la base centrale
+    with tenant_scope(establishment.id):
+        Employee.query.filter_by(establishment_id=establishment.id).update(
+            {'is_active': False}, synchronize_session=False
+        )
+    db.session.commit()
+    # Connexions et écritures refusées aussitôt dans ce processus (voir sharding.init_sharding)
+    clear_tenant_cache()
+
+
+def _employee_ids_subquery(establishment_id):
+    return db.session.query(Employee.id).filter(Employee.establishment_id == establishment_id).scalar_subquery()
+
+
+def _delete_in_batches(establishment, step, model, criterion):
+    """Supprime les lignes de 'model' répondant au critère, PURGE_BATCH_SIZE par transaction."""
+    while True:
+        ids = [row[0] for row in db.session.query(model.id).filter(criterion).limit(PURGE_BATCH_SIZE)]
+        if not ids:
+            return
+        db.session.execute(db.delete(model).where(model.id.in_(ids)))
+        _save_progress(establishment, step, len(ids))
+
+
+def _delete_team_links(establishment, employee_ids):
+    while True:
+        batch = [row[0] for row in db.session.execute(
+            db.select(employee_teams.c.employee_id)
+            .where(employee_teams.c.employee_id.in_(employee_ids))
+            .distinct()
+            .limit(PURGE_BATCH_SIZE)
+        )]
+        if not batch:
+            return
+        result = db.session.execute(db.delete(employee_teams).where(employee_teams.c.employee_id.in_(batch)))
+        _save_progress(establishment, 'team_links', result.rowcount)
+
+
+def _save_progress(establishment, step, count=0):
+    # Nouveau dict : la colonne JSON n'est pas suivie en mutation
+    deleted = dict((establishment.purge_progress or {}).get('deleted', {}))
+    deleted[step] = deleted.get(step, 0) + count
+    establishment.purge_progress = {
+        'step': step,
+        'deleted': deleted,
+        'updated_at': datetime.utcnow().isoformat(timespec='seconds'),
+    }
+    db.session.commit()
+
+
+def purge_establishment(establishment_id):
+    """Purge complète (reprenable) d'un établissement marqué supprimé."""
+    establishment = db.session.get(Establishment, establishment_id)
+    if establishment is None or establishment.deleted_at is None:
+        return False
+
+    employee_ids = _employee_ids_subquery(establishment_id)
+
+    _delete_in_batches(establishment, 'clock_punches', ClockPunch, ClockPunch.employee_id.in_(employee_ids))
+    _delete_in_batches(establishment, 'timesheet_entries', TimeSheetEntry, TimeSheetEntry.employee_id.in_(employee_ids))
+    _delete_in_batches(establishment, 'assignments', Assignment, Assignment.employee_id.in_(employee_ids))
+    _delete_in_batches(establishment, 'absences', Absence, Absence.employee_id.in_(employee_ids))
+    _delete_team_links(establishment, employee_ids)
+
+    # Références sans CASCADE vers les employés supprimés
+    Team.query.filter(Team.manager_id.in_(employee_ids)).update({'manager_id': None}, synchronize_session=False)
+    # Services : table centrale, une sous-requête y lirait les employés de la base centrale (aucun
+    # pour un établissement sur un shard) ; les ids sont donc lus sur le shard puis passés en liste
+    shard_employee_ids = [row[0] for row in db.session.query(Employee.id).filter(
+        Employee.establishment_id == establishment_id
+    )]
+    for offset in range(0, len(shard_employee_ids), PURGE_BATCH_SIZE):
+        Shift.query.filter(Shift.created_by.in_(shard_employee_ids[offset:offset + PURGE_BATCH_SIZE])).update(
+            {'created_by': None}, synchronize_session=False
+        )
+    User.query.filter_by(establishment_id=establishment_id).update({'establishment_id': None}, synchronize_session=False)
+    _save_progress(establishment, 'references')
+
+    while True:
+        ids = [row[0] for row in db.session.query(Employee.id).filter(
+            Employee.establishment_id == establishment_id
+        ).limit(PURGE_BATCH_SIZE)]
+        if not ids:
+            break
+        db.session.execute(db.delete(Employee).where(Employee.id.in_(ids)))
+        invalidate_hours_history(*ids)
+        _save_progress(establishment, 'employees', len(ids))
+
+    db.session.delete(establishment)
+    db.session.commit()
+    return True
+
+
+def purge_pending_establishments():
+    """Reprend toutes les purges en attente ou interrompues ; retourne le nombre d'établissements purgés."""
+    pending = [row[0] for row in db.session.query(Establishment.id).filter(Establishment.deleted_at.isnot(None))]
+    purged = 0
+    for establishment_id in pending:
+        with tenant_scope(establishment_id):
+            purged += purge_establishment(establishment_id)
+    return purged
+
+
+def start_purge_thread(app, establishment_id):
+    """Lance la purge dans un thread avec son propre contexte applicatif (et sa propre session)."""
+    def run():
+        # Laisse expirer le cache des autres processus : plus aucune écriture derrière la purge
+        time.sleep(TENANT_CACHE_TTL)
+        with app.app_context():
+            try:
+                with tenant_scope(establishment_id):
+                    purge_establishment(establishment_id)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Erreur lors de la purge de l'établissement {establishment_id}: {e}")
+            finally:
+                db.session.remove()
+
+    thread = threading.Thread(target=run, name=f"purge-establishment-{establishment_id}", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Configuration gunicorn (chargée automatiquement : gunicorn app:app).
+
+Mode préchargé par défaut (GUNICORN_PRELOAD=0 pour le désactiver) : voir preload.py.
+Les variables WEB_CONCURRENCY et GUNICORN_THREADS sont aussi lues par le profil de pool
+'multi-worker' (db_pool.py).
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+
+
+def when_ready(server):
+    # Maître, application chargée, avant le premier fork
+    if server.cfg.preload_app:
+        from preload import warm_up
+        warm_up(server.app.wsgi())
+        server.log.info("Application préchauffée avant le fork des workers")
+
+
+def post_fork(server, worker):
+    # Les pools hérités du maître sont abandonnés sans fermer ses sockets
+    if server.cfg.preload_app:
+        from preload import dispose_engines
+        app = server.app.wsgi()
+        with app.app_context():
+            dispose_engines(close=False)
+
+
+def post_worker_init(worker):
+    from preload import get_memory_usage
+    worker.log.info(f"Worker {worker.pid} prêt, mémoire : {get_memory_usage()}")
+
+
+def worker_exit(server, worker):
+    # Entrées du journal et notifications encore en file : traitées avant la fin du worker
+    from audit import flush_audit
+    from notifications import flush_notifications
+    flush_audit()
+    flush_notifications()
+    from preload import get_memory_usage
+    server.log.info(f"Worker {worker.pid} arrêté, mémoire : {get_memory_usage()}")
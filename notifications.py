@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""Notification des employés quand leur planning change, envoyée en tâche de fond.
+
+Les vues signalent chaque modification d'assignation (notify_assignment_change, après le
+commit) ; rien n'est envoyé pendant la requête. Les changements sont regroupés par employé :
+un seul message part quand l'employé n'a plus eu de modification depuis
+NOTIFY_DEBOUNCE_SECONDS (au plus tard NOTIFY_MAX_DELAY_SECONDS après la première). Une
+assignation modifiée plusieurs fois n'apparaît qu'une fois (état initial -> état final) ;
+créée puis supprimée dans la fenêtre, elle n'apparaît pas.
+
+Transport choisi par NOTIFY_TRANSPORT : 'smtp' (NOTIFY_SMTP_HOST, NOTIFY_SMTP_PORT,
+NOTIFY_SMTP_USER, NOTIFY_SMTP_PASSWORD, NOTIFY_SMTP_STARTTLS, NOTIFY_FROM), 'webhook'
+(NOTIFY_WEBHOOK_URL, NOTIFY_WEBHOOK_SECRET : signature HMAC-SHA256 du corps) ou 'log'.
+Par défaut : smtp si NOTIFY_SMTP_HOST est défini, webhook si NOTIFY_WEBHOOK_URL l'est,
+sinon notifications désactivées. Serveur SMTP local pour les essais : smtp_debug_server.py.
+
+Un thread par processus envoie les messages ; un envoi en échec est retenté
+(NOTIFY_MAX_ATTEMPTS essais, délai doublé à chaque fois). À l'arrêt, flush_notifications()
+envoie sans attendre ce qui reste en attente.
+"""
+import atexit
+import hashlib
+import hmac
+import json
+import os
+import smtplib
+import threading
+import time
+import urllib.request
+from collections import namedtuple
+from datetime import datetime
+from email.message import EmailMessage
+
+from models import db, Employee, User
+from planning_payload import get_shift_catalog
+from db_routing import current_tenant_bind, set_tenant_bind, reset_tenant_bind
+
+NOTIFY_DEBOUNCE_SECONDS = float(os.environ.get("NOTIFY_DEBOUNCE_SECONDS", 300))
+NOTIFY_MAX_DELAY_SECONDS = float(os.environ.get("NOTIFY_MAX_DELAY_SECONDS", 1800))
+NOTIFY_MAX_ATTEMPTS = int(os.environ.get("NOTIFY_MAX_ATTEMPTS", 5))
+NOTIFY_RETRY_BASE_SECONDS = float(os.environ.get("NOTIFY_RETRY_BASE_SECONDS", 30))
+NOTIFY_POLL_INTERVAL = 1.0
+
+DAY_NAMES_FR = ['lun.', 'mar.', 'mer.', 'jeu.', 'ven.', 'sam.', 'dim.']
+SLOT_FIELDS = ('start', 'end', 'shift_id')
+
+Recipient = namedtuple("Recipient", "id full_name email")
+
+
+# ----------------------------------------------------------------------
+# Transports
+# ----------------------------------------------------------------------
+class SmtpTransport:
+    def __init__(self, host, port=25, sender="planning@maihlili.local", username=None, password=None,
+                 starttls=False, timeout=10):
+        self.host, self.port, self.sender = host, port, sender
+        self.username, self.password, self.starttls, self.timeout = username, password, starttls, timeout
+
+    def send(self, notification):
+        """False si l'employé n'a pas d'adresse (rien à envoyer) ; exception si l'envoi échoue."""
+        if not notification["email"]:
+            return False
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = notification["email"]
+        message["Subject"] = notification["subject"]
+        message.set_content(notification["text"])
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+        return True
+
+
+class WebhookTransport:
+    def __init__(self, url, secret=None, timeout=10):
+        self.url, self.secret, self.timeout = url, secret, timeout
+
+    def send(self, notification):
+        body = json.dumps(notification).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, method="POST",
+                                         headers={"Content-Type": "application/json"})
+        if self.secret:
+            signature = hmac.new(self.secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+            request.add_header("X-Maihlili-Signature", f"sha256={signature}")
+        # Un statut HTTP >= 400 lève HTTPError : l'envoi sera retenté
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+        return True
+
+
+class LogTransport:
+    def send(self, notification):
+        print(f"Notification pour {notification['full_name']} ({notification['email'] or 'sans adresse'}) :\n"
+              f"{notification['text']}")
+        return True
+
+
+def get_transport():
+    """Transport configuré par l'environnement, ou None (notifications désactivées)."""
+    name = os.environ.get("NOTIFY_TRANSPORT")
+    if name is None:
+        name = "smtp" if os.environ.get("NOTIFY_SMTP_HOST") else "webhook" if os.environ.get("NOTIFY_WEBHOOK_URL") else None
+    if name == "smtp":
+        return SmtpTransport(
+            os.environ.get("NOTIFY_SMTP_HOST", "localhost"),
+            int(os.environ.get("NOTIFY_SMTP_PORT", 25)),
+            sender=os.environ.get("NOTIFY_FROM", "planning@maihlili.local"),
+            username=os.environ.get("NOTIFY_SMTP_USER"),
+            password=os.environ.get("NOTIFY_SMTP_PASSWORD"),
+            starttls=os.environ.get("NOTIFY_SMTP_STARTTLS") == "1"
+        )
+    if name == "webhook":
+        return WebhookTransport(os.environ["NOTIFY_WEBHOOK_URL"], os.environ.get("NOTIFY_WEBHOOK_SECRET"))
+    if name == "log":
+        return LogTransport()
+    return None
+
+
+# ----------------------------------------------------------------------
+# Contenu des messages
+# ----------------------------------------------------------------------
+def _slot(values):
+    return {field: values.get(field) for field in SLOT_FIELDS} if values else None
+
+
+def _format_slot(slot, shift_names):
+    start, end = datetime.fromisoformat(slot["start"]), datetime.fromisoformat(slot["end"])
+    text = f"{DAY_NAMES_FR[start.weekday()]} {start.strftime('%d/%m')} {start.strftime('%H:%M')}-{end.strftime('%H:%M')}"
+    shift_name = shift_names.get(slot["shift_id"])
+    return f"{text} ({shift_name})" if shift_name else text
+
+
+def build_notification(employee, changes, shift_names):
+    """Message d'un employé : changements nets triés par date (None si tout s'annule)."""
+    net = [change for change in changes if change["before"] != change["after"]]
+    if not net:
+        return None
+    net.sort(key=lambda change: (change["after"] or change["before"])["start"])
+
+    lines = []
+    for change in net:
+        if change["before"] is None:
+            change["kind"] = "added"
+            lines.append(f"+ Ajout : {_format_slot(change['after'], shift_names)}")
+        elif change["after"] is None:
+            change["kind"] = "removed"
+            lines.append(f"- Retrait : {_format_slot(change['before'], shift_names)}")
+        else:
+            change["kind"] = "changed"
+            lines.append(f"~ Modification : {_format_slot(change['before'], shift_names)}"
+                         f" -> {_format_slot(change['after'], shift_names)}")
+
+    return {
+        "employee_id": employee.id,
+        "full_name": employee.full_name,
+        "email": employee.email,
+        "subject": "Votre planning a été modifié",
+        "text": f"Bonjour {employee.full_name},\n\nVotre planning a changé :\n" + "\n".join(lines) + "\n",
+        "changes": net,
+    }
+
+
+# ----------------------------------------------------------------------
+# Regroupement et envoi en tâche de fond
+# ----------------------------------------------------------------------
+class NotificationDispatcher:
+    """Changements en attente par employé et thread d'envoi (un par processus)."""
+
+    def __init__(self):
+        self.app = None
+        self.transport = None
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._stop = None
+        # {(bind du shard, employee_id): {'first': t, 'last': t, 'changes': {assignment_id: {'before', 'after'}}}}
+        self._pending = {}
+        # [(échéance, numéro de l'essai suivant, notification)]
+        self._retries = []
+        self.sent = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def init_app(self, app, transport=None):
+        if self.app is None:
+            atexit.register(self.flush)
+        self.app = app
+        self.transport = transport if transport is not None else get_transport()
+
+    def _ensure_started(self):
+        # Après un fork, le thread du processus parent n'existe pas dans le worker
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pending, self._retries = {}, []
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name="notification-sender", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def add(self, employee_id, assignment_id, before, after, tenant_bind=None):
+        """Ajoute un changement ; une assignation déjà en attente garde son état initial.
+
+        tenant_bind : shard de l'employé (celui de la requête), relu par le thread d'envoi.
+        """
+        self._ensure_started()
+        now = time.monotonic()
+        with self._lock:
+            pending = self._pending.setdefault((tenant_bind, employee_id), {"first": now, "last": now, "changes": {}})
+            pending["last"] = now
+            change = pending["changes"].setdefault(assignment_id, {"before": before, "after": after})
+            change["after"] = after
+
+    def _take_due(self, now, force=False):
+        with self._lock:
+            due = [key for key, pending in self._pending.items()
+                   if force or now - pending["last"] >= NOTIFY_DEBOUNCE_SECONDS
+                   or now - pending["first"] >= NOTIFY_MAX_DELAY_SECONDS]
+            batches = {key: self._pending.pop(key) for key in due}
+            retries = [retry for retry in self._retries if force or retry[0] <= now]
+            self._retries = [retry for retry in self._retries if not (force or retry[0] <= now)]
+        return batches, retries
+
+    def _build(self, batches):
+        """Notifications des employés concernés (une requête par shard, puis les adresses sur la base centrale)."""
+        employee_ids_by_bind = {}
+        for tenant_bind, employee_id in batches:
+            employee_ids_by_bind.setdefault(tenant_bind, []).append(employee_id)
+        employees = []
+        with self.app.app_context():
+            try:
+                for tenant_bind, employee_ids in employee_ids_by_bind.items():
+                    # Le thread n'a pas le shard de la requête : fixé ici pour chaque groupe
+                    token = set_tenant_bind(tenant_bind)
+                    try:
+                        employees += [(tenant_bind, row) for row in db.session.query(
+                            Employee.id, Employee.full_name, Employee.user_id).filter(Employee.id.in_(employee_ids))]
+                    finally:
+                        reset_tenant_bind(token)
+                user_ids = {row.user_id for _, row in employees if row.user_id}
+                emails = dict(db.session.query(User.id, User.email).filter(User.id.in_(user_ids))) if user_ids else {}
+                shift_names = {shift_id: name for shift_id, name, _ in get_shift_catalog()}
+            finally:
+                db.session.remove()
+
+        unresolved = len(batches) - len(employees)
+        if unresolved:
+            # Employé supprimé entre-temps (ou introuvable sur son shard)
+            self.skipped += unresolved
+            print(f"Notifications : {unresolved} employé(s) introuvable(s), changements ignorés")
+        notifications = []
+        for tenant_bind, row in employees:
+            changes = [dict(change, assignment_id=assignment_id)
+                       for assignment_id, change in batches[(tenant_bind, row.id)]["changes"].items()]
+            notification = build_notification(Recipient(row.id, row.full_name, emails.get(row.user_id)),
+                                              changes, shift_names)
+            if notification:
+                notifications.append(notification)
+        return notifications
+
+    def _send(self, notification, attempt, retry=True):
+        try:
+            if self.transport.send(notification):
+                self.sent += 1
+            else:
+                self.skipped += 1
+        except Exception as e:
+            if retry and attempt < NOTIFY_MAX_ATTEMPTS:
+                delay = NOTIFY_RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+                with self._lock:
+                    self._retries.append((time.monotonic() + delay, attempt + 1, notification))
+            else:
+                self.failed += 1
+                print(f"Notification abandonnée pour l'employé {notification['employee_id']} "
+                      f"après {attempt} essai(s): {e}")
+
+    def _dispatch(self, force=False):
+        batches, retries = self._take_due(time.monotonic(), force)
+        if batches:
+            try:
+                notifications = self._build(batches)
+            except Exception as e:
+                print(f"Erreur lors de la préparation des notifications: {e}")
+                notifications = []
+            for notification in notifications:
+                self._send(notification, 1, retry=not force)
+        for _, attempt, notification in retries:
+            self._send(notification, attempt, retry=not force)
+
+    def _run(self):
+        while not self._stop.wait(NOTIFY_POLL_INTERVAL):
+            self._dispatch()
+
+    def flush(self, timeout=5.0):
+        """Arrête le thread du processus et envoie tout ce qui est en attente (un essai chacun)."""
+        if self._pid != os.getpid() or self.app is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        if self.transport is not None:
+            self._dispatch(force=True)
+        self._pid = None
+
+    def stats(self):
+        pending = len(self._pending) if self._pid == os.getpid() else 0
+        retrying = len(self._retries) if self._pid == os.getpid() else 0
+        return {
+            "enabled": self.transport is not None,
+            "pending_employees": pending,
+            "retrying": retrying,
+            "sent": self.sent,
+            "skipped": self.skipped,
+            "failed": self.failed,
+        }
+
+
+notification_dispatcher = NotificationDispatcher()
+
+
+def init_notifications(app):
+    notification_dispatcher.init_app(app)
+
+
+def notify_assignment_change(assignment_id, before=None, after=None):
+    """Signale une assignation créée (before=None), supprimée (after=None) ou modifiée.
+
+    before / after : valeurs de l'assignation (audit.snapshot) ; un déplacement vers un autre
+    employé est un retrait pour l'ancien et un ajout pour le nouveau.
+    """
+    if notification_dispatcher.transport is None:
+        return
+    # L'id peut arriver en texte (déplacement depuis le Gantt) : comparé en entier
+    before_employee = int(before["employee_id"]) if before and before.get("employee_id") is not None else None
+    after_employee = int(after["employee_id"]) if after and after.get("employee_id") is not None else None
+    # Shard de la requête : le thread d'envoi y relira les employés
+    tenant_bind = current_tenant_bind()
+    if before_employee is not None and before_employee == after_employee:
+        notification_dispatcher.add(before_employee, assignment_id, _slot(before), _slot(after), tenant_bind)
+        return
+    if before_employee is not None:
+        notification_dispatcher.add(before_employee, assignment_id, _slot(before), None, tenant_bind)
+    if after_employee is not None:
+        notification_dispatcher.add(after_employee, assignment_id, None, _slot(after), tenant_bind)
+
+
+def flush_notifications():
+    notification_dispatcher.flush()
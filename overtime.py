@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""Moteur d'heures supplémentaires / complémentaires (droit du travail français).
+
+Décompte par semaine ISO (lundi-dimanche) :
+- temps plein : au-delà de 35h, +25% jusqu'à 43h puis +50% ;
+- temps partiel : au-delà de la durée contractuelle, heures complémentaires à +10%
+  dans la limite de 1/10 du contrat, puis +25% (plafond légal : 1/3 du contrat).
+
+Une semaine à cheval sur deux mois est rattachée au mois où elle se termine (dimanche).
+"""
+from datetime import datetime, timedelta
+
+from models import db, Assignment, Employee, TimeSheetEntry
+
+FULL_TIME_WEEKLY_HOURS = 35.0
+OVERTIME_25_LIMIT = 43.0
+COMPLEMENTARY_10_RATIO = 0.10
+COMPLEMENTARY_LEGAL_RATIO = 1 / 3
+
+# Catégories d'heures produites par le moteur (réutilisées par les exports)
+HOUR_CATEGORIES = ['regular', 'overtime_25', 'overtime_50', 'complementary_10', 'complementary_25']
+
+# Coefficient appliqué au taux horaire de base et libellé de chaque catégorie
+HOUR_CATEGORY_RATES = {
+    'regular': 1.0,
+    'overtime_25': 1.25,
+    'overtime_50': 1.5,
+    'complementary_10': 1.10,
+    'complementary_25': 1.25,
+}
+HOUR_CATEGORY_LABELS = {
+    'regular': "Heures normales",
+    'overtime_25': "Heures supplémentaires +25%",
+    'overtime_50': "Heures supplémentaires +50%",
+    'complementary_10': "Heures complémentaires +10%",
+    'complementary_25': "Heures complémentaires +25%",
+}
+PREMIUM_CATEGORIES = [category for category in HOUR_CATEGORIES if category != 'regular']
+
+SOURCES = ('planned', 'actual')
+
+
+def compute_pay_lines(base_hourly_rate, contract_hours_per_month, totals):
+    """Lignes de rémunération brute : salaire de base mensualisé puis heures majorées.
+
+    Retourne une liste de (catégorie, libellé, heures, taux, montant) ; 'totals' provient de compute_overtime.
+    """
+    rate = base_hourly_rate or 10.0
+    contract_hours = contract_hours_per_month or 151.67
+    lines = [('base', "Salaire de base (mensualisé)", contract_hours, rate, contract_hours * rate)]
+    for category in PREMIUM_CATEGORIES:
+        hours = totals.get(category, 0)
+        if hours:
+            category_rate = rate * HOUR_CATEGORY_RATES[category]
+            lines.append((category, HOUR_CATEGORY_LABELS[category], hours, category_rate, hours * category_rate))
+    return lines
+
+
+def get_month_weeks_bounds(year, month):
+    """(lundi de la 1re semaine, lundi suivant la dernière semaine) des semaines finissant dans le mois."""
+    first_day = datetime(year, month, 1)
+    next_month = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    last_day = next_month - timedelta(days=1)
+    period_start = first_day - timedelta(days=first_day.weekday())
+    period_end = last_day - timedelta(days=last_day.weekday()) + timedelta(days=7)
+    if last_day.weekday() != 6:
+        # La dernière semaine se termine le mois suivant : elle n'est pas rattachée à ce mois
+        period_end -= timedelta(days=7)
+    return period_start, period_end
+
+
+def split_weekly_hours(hours, contract_hours_per_week):
+    """Répartit les heures d'une semaine dans les catégories de majoration."""
+    split = dict.fromkeys(HOUR_CATEGORIES, 0.0)
+    contract = contract_hours_per_week or FULL_TIME_WEEKLY_HOURS
+
+    if contract >= FULL_TIME_WEEKLY_HOURS:
+        split['regular'] = min(hours, FULL_TIME_WEEKLY_HOURS)
+        split['overtime_25'] = min(max(hours - FULL_TIME_WEEKLY_HOURS, 0), OVERTIME_25_LIMIT - FULL_TIME_WEEKLY_HOURS)
+        split['overtime_50'] = max(hours - OVERTIME_25_LIMIT, 0)
+        exceeds_limit = False
+    else:
+        extra = max(hours - contract, 0)
+        split['regular'] = min(hours, contract)
+        split['complementary_10'] = min(extra, contract * COMPLEMENTARY_10_RATIO)
+        split['complementary_25'] = extra - split['complementary_10']
+        exceeds_limit = extra > contract * COMPLEMENTARY_LEGAL_RATIO
+
+    return split, exceeds_limit
+
+
+def _iter_worked_intervals(employee_ids, period_start, period_end, source):
+    """(employee_id, début, fin) des heures planifiées ou pointées, en une seule requête."""
+    if source == 'actual':
+        query = db.session.query(
+            TimeSheetEntry.employee_id, TimeSheetEntry.clock_in, TimeSheetEntry.clock_out
+        ).filter(
+            TimeSheetEntry.employee_id.in_(employee_ids),
+            TimeSheetEntry.clock_out.isnot(None),
+            TimeSheetEntry.clock_in < period_end,
+            TimeSheetEntry.clock_out > period_start
+        )
+    else:
+        query = db.session.query(
+            Assignment.employee_id, Assignment.start, Assignment.end
+        ).filter(
+            Assignment.employee_id.in_(employee_ids),
+            Assignment.start < period_end,
+            Assignment.end > period_start
+        )
+    return query.execution_options(yield_per=2000)
+
+
+def _split_by_week(start, end, period_start, period_end):
+    """Découpe un intervalle aux frontières de semaine (lundi 00:00), borné à la période."""
+    start, end = max(start, period_start), min(end, period_end)
+    while start < end:
+        monday = (start - timedelta(days=start.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        week_end = min(monday + timedelta(days=7), end)
+        yield monday, (week_end - start).total_seconds() / 3600
+        start = week_end
+
+
+def compute_overtime(employee_ids, year, month, source='planned'):
+    """Calcule les heures par catégorie pour tous les employés donnés sur un mois de paie.
+
+    Deux requêtes au total (contrats + intervalles), quel que soit le nombre d'employés.
+    Retourne {employee_id: {'weeks': [...], 'totals': {...}, 'exceeds_legal_limit': bool}}.
+    """
+    if source not in SOURCES:
+        raise ValueError(f"Source inconnue : {source}")
+    results = {}
+    if not employee_ids:
+        return results
+
+    period_start, period_end = get_month_weeks_bounds(year, month)
+    contracts = dict(db.session.query(Employee.id, Employee.contract_hours_per_week).filter(
+        Employee.id.in_(employee_ids)
+    ))
+
+    weekly_hours = {}
+    for employee_id, start, end in _iter_worked_intervals(employee_ids, period_start, period_end, source):
+        for monday, hours in _split_by_week(start, end, period_start, period_end):
+            key = (employee_id, monday)
+            weekly_hours[key] = weekly_hours.get(key, 0) + hours
+
+    for employee_id in contracts:
+        results[employee_id] = {
+            'weeks': [],
+            'totals': dict.fromkeys(HOUR_CATEGORIES + ['total'], 0.0),
+            'exceeds_legal_limit': False,
+        }
+
+    for (employee_id, monday), hours in sorted(weekly_hours.items()):
+        split, exceeds_limit = split_weekly_hours(hours, contracts.get(employee_id))
+        iso_year, iso_week, _ = monday.isocalendar()
+        summary = results[employee_id]
+        summary['weeks'].append({
+            'iso_year': iso_year,
+            'iso_week': iso_week,
+            'week_start': monday.date().isoformat(),
+            'total': round(hours, 2),
+            **{category: round(value, 2) for category, value in split.items()},
+            'exceeds_legal_limit': exceeds_limit,
+        })
+        summary['totals']['total'] += hours
+        for category, value in split.items():
+            summary['totals'][category] += value
+        summary['exceeds_legal_limit'] = summary['exceeds_legal_limit'] or exceeds_limit
+
+    for summary in results.values():
+        summary['totals'] = {category: round(value, 2) for category, value in summary['totals'].items()}
+    return results
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""Export de paie en flux vers le prestataire (fichier à largeur fixe type DSN ou CSV ';').
+
+Les employés sont lus par paquets (pagination par clé sur l'id) : la mémoire reste
+constante quelle que soit la taille de l'établissement.
+"""
+import csv
+import io
+import unicodedata
+from abc import ABC, abstractmethod
+
+from models import db, Employee, Establishment
+from overtime import compute_overtime, compute_pay_lines, HOUR_CATEGORIES
+
+# Nombre d'employés lus (et calculés) par paquet
+PAYROLL_CHUNK_SIZE = 500
+
+
+def iter_payroll_rows(year, month, employee_ids=None, establishment_id=None, chunk_size=PAYROLL_CHUNK_SIZE):
+    """Une ligne par employé actif pour la période : heures par catégorie, taux, contrat et brut."""
+    # Les établissements sont sur la base centrale, les employés éventuellement sur un shard : pas de jointure
+    establishment_names = dict(db.session.query(Establishment.id, Establishment.name))
+    last_id = 0
+    while True:
+        query = db.session.query(
+            Employee.id,
+            Employee.full_name,
+            Employee.contract_type,
+            Employee.contract_hours_per_month,
+            Employee.base_hourly_rate,
+            Employee.establishment_id
+        ).filter(
+            Employee.is_active.is_(True),
+            Employee.id > last_id
+        )
+        if employee_ids is not None:
+            query = query.filter(Employee.id.in_(employee_ids))
+        if establishment_id:
+            query = query.filter(Employee.establishment_id == establishment_id)
+        chunk = query.order_by(Employee.id).limit(chunk_size).all()
+        if not chunk:
+            return
+
+        overtime = compute_overtime([row[0] for row in chunk], year, month)
+        for emp_id, full_name, contract_type, contract_hours, base_rate, emp_establishment_id in chunk:
+            totals = overtime[emp_id]['totals']
+            lines = compute_pay_lines(base_rate, contract_hours, totals)
+            row = {
+                'period': f"{year}{month:02d}",
+                'employee_id': emp_id,
+                'full_name': full_name,
+                'establishment': establishment_names.get(emp_establishment_id, ''),
+                'contract_type': contract_type or 'CDI',
+                'base_hourly_rate': round(base_rate or 10.0, 4),
+                'contract_hours': round(contract_hours or 151.67, 2),
+                'gross_total': round(sum(line[4] for line in lines), 2),
+            }
+            for category in HOUR_CATEGORIES:
+                row[category] = totals.get(category, 0)
+            yield row
+
+        last_id = chunk[-1][0]
+
+
+def _ascii_upper(value):
+    """Texte sans accents, en majuscules (les formats à largeur fixe sont en ASCII)."""
+    normalized = unicodedata.normalize('NFKD', str(value))
+    return normalized.encode('ascii', 'ignore').decode('ascii').upper()
+
+
+class PayrollLayout(ABC):
+    """Format d'export : produit l'en-tête puis une ligne de texte par employé."""
+    content_type = 'text/plain'
+    extension = 'txt'
+
+    def header(self):
+        return ''
+
+    @abstractmethod
+    def format_row(self, row):
+        """Ligne de texte (fin de ligne comprise) d'un employé."""
+
+
+class FixedWidthLayout(PayrollLayout):
+    """Enregistrements à largeur fixe type DSN : texte cadré à gauche, nombres en centièmes cadrés à droite."""
+    extension = 'txt'
+
+    # (champ, largeur, type) ; 'n' = nombre exprimé en centièmes, complété par des zéros
+    FIELDS = [
+        ('period', 6, 'a'),
+        ('employee_id', 10, 'i'),
+        ('full_name', 40, 'a'),
+        ('establishment', 30, 'a'),
+        ('contract_type', 10, 'a'),
+        ('base_hourly_rate', 9, 'n'),
+        ('contract_hours', 9, 'n'),
+        ('regular', 9, 'n'),
+        ('overtime_25', 9, 'n'),
+        ('overtime_50', 9, 'n'),
+        ('complementary_10', 9, 'n'),
+        ('complementary_25', 9, 'n'),
+        ('gross_total', 12, 'n'),
+    ]
+    RECORD_TYPE = 'S21'
+
+    def format_row(self, row):
+        parts = [self.RECORD_TYPE]
+        for name, width, kind in self.FIELDS:
+            value = row[name]
+            if kind == 'a':
+                parts.append(_ascii_upper(value)[:width].ljust(width))
+            elif kind == 'i':
+                parts.append(str(int(value)).rjust(width, '0')[-width:])
+            else:
+                parts.append(str(int(round(value * 100))).rjust(width, '0')[-width:])
+        return ''.join(parts) + '\r\n'
+
+
+class SemicolonCsvLayout(PayrollLayout):
+    """CSV séparé par des ';' avec virgule décimale (convention française)."""
+    content_type = 'text/csv'
+    extension = 'csv'
+
+    COLUMNS = ['period', 'employee_id', 'full_name', 'establishment', 'contract_type',
+               'base_hourly_rate', 'contract_hours'] + HOUR_CATEGORIES + ['gross_total']
+
+    def _line(self, values):
+        si = io.StringIO()
+        csv.writer(si, delimiter=';').writerow(values)
+        return si.getvalue()
+
+    def header(self):
+        return self._line(self.COLUMNS)
+
+    def format_row(self, row):
+        return self._line([
+            str(row[column]).replace('.', ',') if isinstance(row[column], float) else row[column]
+            for column in self.COLUMNS
+        ])
+
+
+# Formats disponibles (clé = paramètre 'layout' de l'export)
+PAYROLL_LAYOUTS = {
+    'dsn': FixedWidthLayout,
+    'csv': SemicolonCsvLayout,
+}
+
+
+def iter_payroll_export(layout, rows):
+    """Produit le fichier ligne par ligne à partir du générateur de lignes."""
+    header = layout.header()
+    if header:
+        yield header
+    for row in rows:
+        yield layout.format_row(row)
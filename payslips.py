@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""Génération par lots des bulletins de salaire PDF, rendus en parallèle et zippés en flux."""
+import io
+import multiprocessing
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+
+from pdf_branding import MAIHLILI_FOND_TABLE, MAIHLILI_TITRES_BLEU, MAIHLILI_BLANC, MAIHLILI_LOGO_PATH
+from overtime import compute_overtime, compute_pay_lines
+from models import MONTH_NAMES_FR
+
+# Nombre de processus de rendu (par défaut : un par cœur)
+PAYSLIP_WORKERS = int(os.environ.get("PAYSLIP_WORKERS", os.cpu_count() or 1))
+
+# Bulletins en cours de rendu par processus : borne la mémoire occupée par les PDF en attente
+PAYSLIP_INFLIGHT_PER_WORKER = 4
+
+
+def build_payslips(employees, year, month):
+    """Prépare les données (dict sérialisables) des bulletins d'une période.
+
+    Les heures majorées proviennent du moteur d'heures sup. : un seul calcul pour tous les employés.
+    """
+    overtime = compute_overtime([emp.id for emp in employees], year, month)
+    payslips = []
+    for emp in employees:
+        totals = overtime.get(emp.id, {}).get('totals', {})
+        lines = [line[1:] for line in compute_pay_lines(emp.base_hourly_rate, emp.contract_hours_per_month, totals)]
+
+        payslips.append({
+            'employee_id': emp.id,
+            'full_name': emp.full_name,
+            'position': emp.position or 'Employé',
+            'contract_type': emp.contract_type or 'CDI',
+            'establishment': emp.establishment.name if emp.establishment else '',
+            'period': f"{MONTH_NAMES_FR[month - 1]} {year}",
+            'filename': f"bulletin_{year}{month:02d}_{emp.id}.pdf",
+            'lines': [(label, round(hours, 2), round(rate, 4), round(amount, 2)) for label, hours, rate, amount in lines],
+            'gross_total': round(sum(amount for _, _, _, amount in lines), 2),
+        })
+    return payslips
+
+
+def render_payslip_pdf(payslip):
+    """Rend un bulletin en PDF (exécuté dans un processus du pool : aucune dépendance à Flask ou à la base)."""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=40, rightMargin=40, topMargin=40, bottomMargin=40)
+    styles = getSampleStyleSheet()
+    story = []
+
+    # --- En-tête (Logo et Titre) ---
+    logo_element = Spacer(1, 1)
+    if os.path.exists(MAIHLILI_LOGO_PATH):
+        logo_element = Image(MAIHLILI_LOGO_PATH, width=70, height=35)
+        logo_element.hAlign = 'LEFT'
+
+    title_element = Paragraph(
+        f"<font size='18' color='{MAIHLILI_TITRES_BLEU}'><b>BULLETIN DE SALAIRE</b></font><br/>"
+        f"<font size='10' color='#555555'>Période : {escape(payslip['period'])}</font>",
+        styles['Normal']
+    )
+    header_table = Table([[logo_element, title_element]], colWidths=[90, doc.width - 90])
+    header_table.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
+    ]))
+    story.append(header_table)
+    story.append(Spacer(1, 18))
+
+    # --- Identité du salarié (texte saisi échappé : '<' ou '&' casserait le balisage du Paragraph) ---
+    story.append(Paragraph(
+        f"<b>{escape(payslip['full_name'])}</b> — {escape(payslip['position'])}<br/>"
+        f"Contrat : {escape(payslip['contract_type'])} • Établissement : {escape(payslip['establishment'])}",
+        styles['Normal']
+    ))
+    story.append(Spacer(1, 12))
+
+    # --- Lignes de rémunération ---
+    table_data = [["Rubrique", "Heures", "Taux", "Montant"]]
+    for label, hours, rate, amount in payslip['lines']:
+        table_data.append([label, f"{hours:.2f}", f"{rate:.2f} €", f"{amount:.2f} €"])
+    table_data.append(["Salaire brut", "", "", f"{payslip['gross_total']:.2f} €"])
+
+    table = Table(table_data, colWidths=[doc.width * 0.49, doc.width * 0.17, doc.width * 0.17, doc.width * 0.17])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), MAIHLILI_TITRES_BLEU),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -2), [MAIHLILI_FOND_TABLE, MAIHLILI_BLANC]),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('LINEABOVE', (0, -1), (-1, -1), 1, MAIHLILI_TITRES_BLEU),
+        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+        ('GRID', (0, 0), (-1, -2), 0.5, colors.HexColor('#DDDDDD')),
+    ]))
+    story.append(table)
+
+    doc.build(story)
+    return payslip['filename'], buffer.getvalue()
+
+
+def iter_rendered_payslips(payslips, workers=None):
+    """Rend les bulletins dans un pool de processus et les produit dans l'ordre.
+
+    Au plus workers * PAYSLIP_INFLIGHT_PER_WORKER bulletins sont en cours à un instant donné.
+    """
+    workers = workers or PAYSLIP_WORKERS
+    max_inflight = workers * PAYSLIP_INFLIGHT_PER_WORKER
+    # 'spawn' : les processus de rendu n'héritent ni des connexions à la base ni des threads du serveur
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        pending = deque()
+        for payslip in payslips:
+            pending.append(executor.submit(render_payslip_pdf, payslip))
+            if len(pending) >= max_inflight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class _ZipStream(io.RawIOBase):
+    """Flux non positionnable : zipfile y écrit, on récupère les octets au fur et à mesure."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_payslips_zip(payslips, workers=None):
+    """Génère l'archive ZIP morceau par morceau (un morceau par bulletin)."""
+    stream = _ZipStream()
+    # Les PDF sont déjà compressés : ZIP_STORED évite un second passage coûteux
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for filename, pdf in iter_rendered_payslips(payslips, workers):
+            archive.writestr(filename, pdf)
+            yield stream.drain()
+    yield stream.drain()
+
+
+def write_payslips_zip(payslips, fileobj, workers=None):
+    """Écrit l'archive dans un fichier (artefact d'un traitement hors requête)."""
+    for chunk in iter_payslips_zip(payslips, workers):
+        fileobj.write(chunk)
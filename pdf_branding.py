@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""Charte graphique Maihlili partagée par les exports PDF (planning, bulletins)."""
+import os
+
+from reportlab.lib import colors
+
+# Définition de la couleur de branding à partir de votre logo
+MAIHLILI_FOND_TABLE = colors.HexColor('#FFF0F8') # Fond du tableau (simule le fond du doc)
+MAIHLILI_TITRES_BLEU = colors.HexColor('#3055FF') # Bleu pour les titres et en-têtes
+MAIHLILI_BLANC = colors.white
+
+MAIHLILI_LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'images', 'maihlili-logo-light.png')
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""Format compact, compression gzip et ETag des API de planning (calendrier, Gantt).
+
+Format compact : employés et services envoyés une seule fois (tables de correspondance),
+assignations en tableaux colonnes. Les dates sont en minutes depuis l'epoch, l'heure
+murale (naïve) étant interprétée comme UTC.
+"""
+import calendar
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, request
+from sqlalchemy import event
+
+from models import db, Assignment, Shift
+from absences import ABSENCE_TYPES
+from db_routing import primary_reads
+
+# En dessous de cette taille, la compression ne vaut pas son coût
+GZIP_MIN_SIZE = 1024
+
+# Nombre de fenêtres récentes gardées en mémoire (navigation semaine à semaine)
+PAYLOAD_CACHE_SIZE = 64
+
+_payload_cache = OrderedDict()
+_payload_cache_lock = threading.Lock()
+
+# Catalogue des services (peu de lignes, lu à chaque requête de planning) : gardé en mémoire
+# SHIFT_CACHE_TTL secondes, vidé immédiatement dans le processus qui modifie un service
+SHIFT_CACHE_TTL = 30
+
+_shift_cache = {'expires': 0.0, 'shifts': None}
+_shift_cache_lock = threading.Lock()
+
+
+def epoch_minutes(dt):
+    return calendar.timegm(dt.timetuple()) // 60
+
+
+def get_shift_catalog(refresh=False):
+    """[(id, nom, couleur)] de tous les services, triés par id."""
+    now = time.monotonic()
+    with _shift_cache_lock:
+        if not refresh and _shift_cache['shifts'] is not None and _shift_cache['expires'] > now:
+            return _shift_cache['shifts']
+    with primary_reads():
+        shifts = [tuple(row) for row in db.session.query(Shift.id, Shift.name, Shift.color).order_by(Shift.id)]
+    with _shift_cache_lock:
+        _shift_cache.update(expires=now + SHIFT_CACHE_TTL, shifts=shifts)
+    return shifts
+
+
+@event.listens_for(Shift, 'after_insert')
+@event.listens_for(Shift, 'after_update')
+@event.listens_for(Shift, 'after_delete')
+def _shift_changed(mapper, connection, target):
+    with _shift_cache_lock:
+        _shift_cache['shifts'] = None
+
+
+def get_planning_etag(employees, criteria, variant):
+    """ETag fort dérivé de la version des données, sans charger les assignations.
+
+    Version = (nombre, dernier updated_at, somme des ids) des assignations filtrées
+    + noms des employés + services (noms, couleurs).
+    """
+    count, last_update, id_sum = db.session.query(
+        db.func.count(Assignment.id),
+        db.func.max(Assignment.updated_at),
+        db.func.coalesce(db.func.sum(Assignment.id), 0)
+    ).filter(*criteria).one()
+    shifts = get_shift_catalog()
+
+    digest = hashlib.sha1()
+    digest.update(repr((variant, count, last_update, id_sum)).encode('utf-8'))
+    digest.update(repr([(emp.id, emp.full_name) for emp in employees]).encode('utf-8'))
+    digest.update(repr(shifts).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _accepts_gzip():
+    return 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+
+
+def _encoded_etag(etag, gzipped):
+    # Un ETag fort doit différer selon l'encodage de la représentation
+    return f"{etag}-gz" if gzipped else etag
+
+
+def not_modified(etag):
+    """Réponse 304 si le client possède déjà cette version, sinon None."""
+    if not etag:
+        return None
+    for gzipped in (True, False):
+        tag = _encoded_etag(etag, gzipped)
+        if request.if_none_match.contains(tag):
+            response = Response(status=304)
+            response.set_etag(tag)
+            response.headers['Vary'] = 'Accept-Encoding'
+            return response
+    return None
+
+
+def json_response(payload, etag=None):
+    """JSON sans espaces, compressé si le client l'accepte, avec ETag."""
+    body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    response = Response(mimetype='application/json')
+    gzipped = _accepts_gzip() and len(body) >= GZIP_MIN_SIZE
+    if gzipped:
+        body = gzip.compress(body, compresslevel=6)
+        response.headers['Content-Encoding'] = 'gzip'
+    response.set_data(body)
+    response.headers['Vary'] = 'Accept-Encoding'
+    if etag:
+        response.set_etag(_encoded_etag(etag, gzipped))
+        # Le navigateur revalide à chaque fois mais reçoit un 304 si rien n'a changé
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def build_compact_payload(employees, criteria, absence_indexes=None):
+    """Tables employés / services + assignations en colonnes (une requête sur colonnes, pas d'ORM).
+
+    absence_indexes ({employee_id: AbsenceIndex}) : ajoute les absences et, pour chaque
+    assignation, si elle tombe pendant une absence approuvée (colonne 'absent').
+    """
+    rows = db.session.query(
+        Assignment.id, Assignment.employee_id, Assignment.shift_id, Assignment.start, Assignment.end,
+        Assignment.version
+    ).filter(*criteria).order_by(Assignment.start, Assignment.id).all()
+
+    shift_ids = {row[2] for row in rows if row[2] is not None}
+    catalog = get_shift_catalog()
+    if not shift_ids <= {shift[0] for shift in catalog}:
+        # Service créé par un autre worker depuis la mise en cache
+        catalog = get_shift_catalog(refresh=True)
+    shifts = [shift for shift in catalog if shift[0] in shift_ids]
+
+    payload = {
+        'format': 'compact',
+        'employees': {
+            'id': [emp.id for emp in employees],
+            'name': [emp.full_name for emp in employees],
+        },
+        'shifts': {
+            'id': [shift_id for shift_id, _, _ in shifts],
+            'name': [name for _, name, _ in shifts],
+            'color': [color or '#888888' for _, _, color in shifts],
+        },
+        'assignments': {
+            'id': [row[0] for row in rows],
+            'employee_id': [row[1] for row in rows],
+            'shift_id': [row[2] for row in rows],
+            'start': [epoch_minutes(row[3]) for row in rows],
+            'end': [epoch_minutes(row[4]) for row in rows],
+            'version': [row[5] for row in rows],
+        },
+    }
+    if absence_indexes is not None:
+        absences = [absence for index in absence_indexes.values() for absence in index.absences]
+        payload['assignments']['absent'] = [
+            int(absence_indexes[row[1]].find(row[3], row[4]) is not None) if row[1] in absence_indexes else 0
+            for row in rows
+        ]
+        payload['absences'] = {
+            'employee_id': [absence.employee_id for absence in absences],
+            'label': [ABSENCE_TYPES.get(absence.absence_type, {}).get('label', absence.absence_type)
+                      for absence in absences],
+            'start': [epoch_minutes(absence.start) for absence in absences],
+            'end': [epoch_minutes(absence.end) for absence in absences],
+            'approved': [int(absence.approved) for absence in absences],
+        }
+    return payload
+
+
+def get_cached_payload(etag, build):
+    """Retourne le payload associé à l'ETag (LRU), en le construisant au besoin.
+
+    L'ETag change à chaque modification des données : une entrée n'est jamais périmée.
+    """
+    with _payload_cache_lock:
+        payload = _payload_cache.get(etag)
+        if payload is not None:
+            _payload_cache.move_to_end(etag)
+            return payload
+    with primary_reads():
+        payload = build()
+    with _payload_cache_lock:
+        _payload_cache[etag] = payload
+        while len(_payload_cache) > PAYLOAD_CACHE_SIZE:
+            _payload_cache.popitem(last=False)
+    return payload
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Mode préchargé de gunicorn (preload_app, voir gunicorn.conf.py).
+
+L'application est importée une fois dans le processus maître puis partagée par les workers
+(pages mémoire en copie sur écriture). Avant le fork, le maître compile les templates, les
+mappers et les requêtes du planning, remplit le catalogue des services, puis ferme ses
+connexions ; chaque worker repart ensuite de pools vides (aucun socket partagé entre processus).
+"""
+import gc
+import resource
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import configure_mappers
+
+from models import db, Assignment
+from planning_payload import get_shift_catalog, get_planning_etag, build_compact_payload
+
+
+def warm_up(app):
+    """Préchauffe templates, requêtes compilées et catalogue des services (processus maître)."""
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+    with app.app_context():
+        configure_mappers()
+        try:
+            get_shift_catalog(refresh=True)
+            # Mêmes formes de requêtes que le Gantt et le calendrier : le cache de compilation
+            # de l'engine (hérité par les workers) les contient déjà
+            week_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            week_end = week_start + timedelta(days=7)
+            for criteria in (
+                [Assignment.employee_id.in_([0]), Assignment.start >= week_start, Assignment.start < week_end],
+                [Assignment.employee_id.in_([0]), Assignment.end >= week_start, Assignment.start <= week_end],
+            ):
+                get_planning_etag([], criteria, "warmup")
+                build_compact_payload([], criteria)
+        except Exception as e:
+            # Base indisponible au démarrage : les workers compileront à la première requête
+            print(f"Préchauffage des requêtes ignoré : {e}")
+        finally:
+            db.session.remove()
+        dispose_engines(close=True)
+
+    # Objets du maître exclus du ramasse-miettes : leurs pages ne sont pas recopiées dans les workers
+    gc.collect()
+    gc.freeze()
+
+
+def dispose_engines(close):
+    """Vide les pools de tous les binds (contexte applicatif requis).
+
+    close=True : ferme les connexions (maître) ; close=False : les abandonne sans les fermer
+    (worker juste forké : les sockets appartiennent au maître).
+    """
+    for engine in db.engines.values():
+        engine.dispose(close=close)
+
+
+def get_memory_usage():
+    """Mémoire du processus courant en Mo : résidente, pic, et partage avec le maître (Linux)."""
+    usage = {"peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = {line.split(":")[0]: int(line.split()[1]) for line in f if line.endswith("kB\n")}
+    except OSError:
+        return usage
+    usage.update({
+        "rss_mb": round(fields.get("Rss", 0) / 1024, 1),
+        # PSS : pages partagées réparties entre les processus qui les partagent
+        "pss_mb": round(fields.get("Pss", 0) / 1024, 1),
+        "shared_mb": round((fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)) / 1024, 1),
+        "private_mb": round((fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 1024, 1),
+    })
+    return usage
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Rapport d'écarts planifié / réalisé (Assignment vs TimeSheetEntry)."""
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from models import db, Assignment, Employee, TimeSheetEntry
+
+# Tolérance avant de compter un retard ou un départ anticipé
+VARIANCE_GRACE = timedelta(minutes=5)
+
+# Nombre de lignes lues par aller-retour lors du parcours en flux
+VARIANCE_FETCH_SIZE = 2000
+
+VARIANCE_COLUMNS = ['employee_id', 'employee_name', 'date', 'planned_hours', 'actual_hours',
+                    'difference', 'late_starts', 'early_leaves', 'missing_punches']
+
+
+def _variance_query(employee_ids, period_start, period_end, establishment_id=None):
+    """Une seule requête : assignations LEFT JOIN pointages, triées par employé puis début."""
+    query = db.session.query(
+        Assignment.id,
+        Assignment.employee_id,
+        Employee.full_name,
+        Assignment.start,
+        Assignment.end,
+        TimeSheetEntry.clock_in,
+        TimeSheetEntry.clock_out
+    ).join(
+        Employee, Employee.id == Assignment.employee_id
+    ).outerjoin(
+        TimeSheetEntry, TimeSheetEntry.assignment_id == Assignment.id
+    ).filter(
+        Assignment.employee_id.in_(employee_ids),
+        Assignment.start >= period_start,
+        Assignment.start < period_end
+    )
+    if establishment_id:
+        query = query.filter(Employee.establishment_id == establishment_id)
+    return query.order_by(Assignment.employee_id, Assignment.start, Assignment.id) \
+        .execution_options(stream_results=True, yield_per=VARIANCE_FETCH_SIZE)
+
+
+def _summarize_assignment(start, end, entries, now):
+    """Heures planifiées / réalisées et anomalies d'une assignation et de ses pointages."""
+    planned = (end - start).total_seconds() / 3600
+    actual = 0
+    late = early = missing = 0
+    if not entries:
+        # Aucun pointage pour un shift déjà commencé
+        return planned, 0, 0, 0, (1 if start <= now else 0)
+
+    first_in = min(clock_in for clock_in, _ in entries)
+    if first_in > start + VARIANCE_GRACE:
+        late = 1
+    closed = [clock_out for _, clock_out in entries if clock_out]
+    if len(closed) < len(entries):
+        # Entrée sans sortie pour un shift terminé
+        if end <= now:
+            missing = 1
+    elif max(closed) < end - VARIANCE_GRACE:
+        early = 1
+    for clock_in, clock_out in entries:
+        if clock_out:
+            actual += (clock_out - clock_in).total_seconds() / 3600
+    return planned, actual, late, early, missing
+
+
+def _iter_assignments(rows):
+    """Regroupe les lignes (assignation x pointage) consécutives d'une même assignation."""
+    current = None
+    for assignment_id, employee_id, name, start, end, clock_in, clock_out in rows:
+        if current is None or current['id'] != assignment_id:
+            if current is not None:
+                yield current
+            current = {'id': assignment_id, 'employee_id': employee_id, 'employee_name': name,
+                       'start': start, 'end': end, 'entries': []}
+        if clock_in is not None:
+            current['entries'].append((clock_in, clock_out))
+    if current is not None:
+        yield current
+
+
+def iter_variance_rows(employee_ids, period_start, period_end, establishment_id=None, now=None):
+    """Génère une ligne par employé et par jour, en un seul passage sur le résultat trié.
+
+    Les lignes sont produites au fil de l'eau : la mémoire ne dépend pas de la taille du mois.
+    """
+    if not employee_ids:
+        return
+    now = now or datetime.now()
+
+    assignments = _iter_assignments(_variance_query(employee_ids, period_start, period_end, establishment_id))
+    for (employee_id, day), group in groupby(assignments, key=lambda a: (a['employee_id'], a['start'].date())):
+        row = {'employee_id': employee_id, 'employee_name': None, 'date': day.isoformat(),
+               'planned_hours': 0, 'actual_hours': 0,
+               'late_starts': 0, 'early_leaves': 0, 'missing_punches': 0}
+        for assignment in group:
+            row['employee_name'] = assignment['employee_name']
+            planned, actual, late, early, missing = _summarize_assignment(
+                assignment['start'], assignment['end'], assignment['entries'], now)
+            row['planned_hours'] += planned
+            row['actual_hours'] += actual
+            row['late_starts'] += late
+            row['early_leaves'] += early
+            row['missing_punches'] += missing
+
+        row['planned_hours'] = round(row['planned_hours'], 2)
+        row['actual_hours'] = round(row['actual_hours'], 2)
+        row['difference'] = round(row['actual_hours'] - row['planned_hours'], 2)
+        yield row
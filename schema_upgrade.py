@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Mise à niveau du schéma d'une base existante (pas d'outil de migration dans le projet).
+
+db.create_all() crée les tables manquantes mais n'ajoute ni colonne ni index à une table
+existante : 'flask upgrade-schema' ajoute les colonnes de UPGRADE_COLUMNS absentes, crée
+les tables et index manquants, sur la base centrale puis sur chaque shard (tables
+d'établissement seulement). La commande peut être relancée sans effet de bord.
+"""
+from sqlalchemy import DDL, inspect
+
+from models import db, Employee
+from sharding import shard_metadata, shard_bind_key
+
+# Colonnes ajoutées à des tables existantes, dans l'ordre des évolutions
+UPGRADE_COLUMNS = [
+    ('establishment', 'deleted_at'),
+    ('establishment', 'purge_progress'),
+    ('establishment', 'shard_key'),
+    ('establishment', 'shard_moving'),
+    ('assignments', 'version'),
+    ('employees', 'search_text'),
+    ('employees', 'calendar_token'),
+]
+
+# Colonnes ajoutées avec unique=True : contrainte remplacée par un index unique nommé
+UPGRADE_UNIQUE_INDEXES = {
+    ('employees', 'calendar_token'): 'ix_employees_calendar_token',
+}
+
+
+def _add_column_ddl(column, dialect):
+    ddl = f"ALTER TABLE {column.table.name} ADD COLUMN {column.name} {column.type.compile(dialect=dialect)}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT '{column.server_default.arg}'"
+    if not column.nullable:
+        ddl += " NOT NULL"
+    return ddl
+
+
+def upgrade_schema(engine, metadata, log=print):
+    """Ajoute colonnes, tables et index manquants de 'metadata' sur 'engine' ; retourne le nombre de colonnes ajoutées."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = 0
+    with engine.begin() as connection:
+        if engine.dialect.name == "postgresql" and 'employees' in metadata.tables:
+            # Index trigramme de la recherche d'employés (table déjà créée : pas d'événement before_create)
+            connection.execute(DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        for table_name, column_name in UPGRADE_COLUMNS:
+            if table_name not in metadata.tables or table_name not in existing_tables:
+                continue
+            if column_name in {column['name'] for column in inspector.get_columns(table_name)}:
+                continue
+            column = metadata.tables[table_name].c[column_name]
+            connection.exec_driver_sql(_add_column_ddl(column, engine.dialect))
+            index_name = UPGRADE_UNIQUE_INDEXES.get((table_name, column_name))
+            if index_name:
+                connection.exec_driver_sql(f"CREATE UNIQUE INDEX {index_name} ON {table_name} ({column_name})")
+            log(f"  colonne {table_name}.{column_name} ajoutée")
+            added += 1
+
+    # Tables absentes (avec leurs index), puis index ajoutés aux tables existantes
+    metadata.create_all(engine)
+    for table in metadata.tables.values():
+        if table.name in existing_tables:
+            for index in table.indexes:
+                index.create(engine, checkfirst=True)
+    return added
+
+
+def init_schema_commands(app):
+    @app.cli.command("upgrade-schema")
+    def upgrade_schema_command():
+        """Met à niveau le schéma de la base centrale et des shards (colonnes, tables et index manquants)."""
+        print("Base centrale")
+        added = upgrade_schema(db.engine, db.metadata)
+        tenant_metadata = shard_metadata()
+        for shard_key in app.config.get("SHARD_KEYS", []):
+            print(f"Shard {shard_key}")
+            added += upgrade_schema(db.engines[shard_bind_key(shard_key)], tenant_metadata)
+        print(f"Schéma à jour ({added} colonne(s) ajoutée(s))")
+        if added and db.session.query(Employee.id).filter(Employee.search_text.is_(None)).first():
+            print("Lancer 'flask reindex-employee-search' pour remplir le texte de recherche des employés")
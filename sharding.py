@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""Répartition des établissements sur plusieurs bases (shards).
+
+Les données globales (utilisateurs, établissements, services) restent sur la base centrale ;
+les tables propres à un établissement (db_routing.TENANT_TABLES) vivent sur le shard désigné
+par Establishment.shard_key (None : base centrale). Les shards sont déclarés par
+SQLALCHEMY_SHARD_URIS="nom=uri,nom2=uri2" (binds 'shard_<nom>').
+
+Les clés étrangères vers les tables globales ne sont pas créées sur les shards (pas de
+contrainte entre deux bases) ; sur PostgreSQL, chaque shard reçoit une plage d'ids
+distincte pour qu'un établissement puisse être déplacé sans collision.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import click
+from flask import current_app, g, jsonify, request
+from flask_login import current_user
+from sqlalchemy import MetaData
+
+from db_routing import TENANT_TABLES, set_tenant_bind, reset_tenant_bind
+from models import db, Establishment, Employee, Team, employee_teams
+
+SHARD_BIND_PREFIX = "shard_"
+
+# Plage d'ids réservée à chaque shard (PostgreSQL) : shard n => ids à partir de n * SHARD_ID_SPAN
+SHARD_ID_SPAN = 10 ** 12
+
+# Durée de mise en cache de la correspondance établissement -> shard (par processus)
+TENANT_CACHE_TTL = 5
+
+# Lignes copiées par transaction lors d'un déplacement
+SHARD_MOVE_BATCH_SIZE = 1000
+
+# Ordre de copie (parents avant enfants) ; la suppression se fait dans l'ordre inverse
+TENANT_COPY_ORDER = ['employees', 'teams', 'employee_teams', 'assignments', 'timesheet_entries', 'clock_punches',
+                     'absences']
+
+# Colonnes copiées à NULL puis renseignées une fois la table référencée copiée
+DEFERRED_COLUMNS = {'employees': 'team_id'}
+DEFERRED_APPLY_AFTER = 'teams'
+
+_tenant_cache = {}
+_tenant_cache_lock = threading.Lock()
+
+
+def shard_bind_key(shard_key):
+    return f"{SHARD_BIND_PREFIX}{shard_key}" if shard_key else None
+
+
+def configure_shards(app):
+    """Déclare les binds des shards (à appeler avant db.init_app)."""
+    binds = app.config.setdefault("SQLALCHEMY_BINDS", {})
+    shards = []
+    for item in os.environ.get("SQLALCHEMY_SHARD_URIS", "").split(","):
+        if "=" not in item:
+            continue
+        name, uri = (part.strip() for part in item.split("=", 1))
+        binds[shard_bind_key(name)] = uri
+        shards.append(name)
+    app.config["SHARD_KEYS"] = shards
+
+
+def get_establishment_state(establishment_id):
+    """(shard_key, en cours de déplacement, supprimé) d'un établissement, mis en cache TENANT_CACHE_TTL secondes."""
+    now = time.monotonic()
+    with _tenant_cache_lock:
+        cached = _tenant_cache.get(establishment_id)
+        if cached and now - cached[0] < TENANT_CACHE_TTL:
+            return cached[1]
+    row = db.session.query(Establishment.shard_key, Establishment.shard_moving, Establishment.deleted_at).filter(
+        Establishment.id == establishment_id
+    ).first()
+    value = (row[0], bool(row[1]), row[2] is not None) if row else (None, False, False)
+    with _tenant_cache_lock:
+        _tenant_cache[establishment_id] = (now, value)
+    return value
+
+
+def get_establishment_shard(establishment_id):
+    """(shard_key, en cours de déplacement) d'un établissement (voir get_establishment_state)."""
+    return get_establishment_state(establishment_id)[:2]
+
+
+def establishment_is_deleted(establishment_id):
+    return bool(establishment_id) and get_establishment_state(establishment_id)[2]
+
+
+def clear_tenant_cache():
+    with _tenant_cache_lock:
+        _tenant_cache.clear()
+
+
+@contextmanager
+def tenant_scope(establishment_id):
+    """Exécute le bloc avec les tables d'établissement routées vers le shard de establishment_id."""
+    shard_key = get_establishment_shard(establishment_id)[0] if establishment_id else None
+    token = set_tenant_bind(shard_bind_key(shard_key))
+    try:
+        yield shard_key
+    finally:
+        reset_tenant_bind(token)
+
+
+def init_sharding(app):
+    """Fixe le shard de chaque requête d'après l'établissement de l'utilisateur connecté.
+
+    Refuse aussi les écritures des utilisateurs d'un établissement en cours de suppression
+    (avec ou sans shards) : la purge ne doit pas manquer des lignes ajoutées derrière elle.
+    """
+    sharded = bool(app.config.get("SHARD_KEYS"))
+
+    @app.before_request
+    def route_tenant():
+        establishment_id = getattr(current_user, "establishment_id", None) if current_user.is_authenticated else None
+        if not establishment_id:
+            return None
+        shard_key, moving, deleted = get_establishment_state(establishment_id)
+        if deleted and request.method not in ("GET", "HEAD"):
+            return jsonify({"success": False, "error": "Cet établissement a été supprimé"}), 403
+        if not sharded:
+            return None
+        # Pendant un déplacement, les lectures continuent sur l'ancien shard ; les écritures attendent
+        if moving and request.method not in ("GET", "HEAD"):
+            return jsonify({"success": False, "error": "Maintenance en cours sur cet établissement, réessayez dans quelques minutes"}), 503
+        g.tenant_token = set_tenant_bind(shard_bind_key(shard_key))
+        return None
+
+    @app.teardown_request
+    def reset_tenant(exc=None):
+        token = g.pop("tenant_token", None)
+        if token is not None:
+            reset_tenant_bind(token)
+
+
+def shard_metadata():
+    """Copie des tables d'établissement sans les clés étrangères vers les tables globales."""
+    metadata = MetaData()
+    for name in TENANT_COPY_ORDER:
+        db.metadata.tables[name].to_metadata(metadata)
+    for table in metadata.tables.values():
+        for foreign_key in list(table.foreign_keys):
+            if foreign_key.target_fullname.split('.')[0] not in TENANT_TABLES:
+                table.foreign_keys.discard(foreign_key)
+                foreign_key.parent.foreign_keys.discard(foreign_key)
+                table.constraints.discard(foreign_key.constraint)
+    return metadata
+
+
+def create_shard_schema(shard_key):
+    """Crée les tables d'établissement sur un shard et décale ses séquences (PostgreSQL)."""
+    engine = db.engines[shard_bind_key(shard_key)]
+    metadata = shard_metadata()
+    metadata.create_all(engine)
+    if engine.dialect.name == "postgresql":
+        start = (current_app.config["SHARD_KEYS"].index(shard_key) + 1) * SHARD_ID_SPAN
+        with engine.begin() as connection:
+            for table in metadata.tables.values():
+                if "id" in table.c:
+                    connection.exec_driver_sql(
+                        f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                        f"GREATEST({start}, (SELECT COALESCE(MAX(id), 0) + 1 FROM {table.name})), false)"
+                    )
+
+
+def _tenant_selects(establishment_id):
+    """Requêtes sélectionnant les lignes de chaque table d'établissement (clé = nom de table)."""
+    tables = db.metadata.tables
+    employee_ids = db.select(Employee.id).where(Employee.establishment_id == establishment_id).scalar_subquery()
+    # Équipes de l'établissement : gérées par un de ses employés ou comptant un de ses employés parmi les membres
+    team_ids = db.select(Team.id).where(db.or_(
+        Team.manager_id.in_(employee_ids),
+        Team.id.in_(db.select(employee_teams.c.team_id).where(employee_teams.c.employee_id.in_(employee_ids)))
+    )).scalar_subquery()
+    return {
+        'employees': db.select(tables['employees']).where(tables['employees'].c.id.in_(employee_ids)),
+        'teams': db.select(tables['teams']).where(tables['teams'].c.id.in_(team_ids)),
+        'employee_teams': db.select(employee_teams).where(employee_teams.c.employee_id.in_(employee_ids)),
+        'assignments': db.select(tables['assignments']).where(tables['assignments'].c.employee_id.in_(employee_ids)),
+        'timesheet_entries': db.select(tables['timesheet_entries']).where(
+            tables['timesheet_entries'].c.employee_id.in_(employee_ids)),
+        'clock_punches': db.select(tables['clock_punches']).where(tables['clock_punches'].c.employee_id.in_(employee_ids)),
+        'absences': db.select(tables['absences']).where(tables['absences'].c.employee_id.in_(employee_ids)),
+    }
+
+
+def move_establishment(establishment_id, target_shard, batch_size=SHARD_MOVE_BATCH_SIZE, log=print):
+    """Déplace un établissement vers target_shard (None : base centrale) en conservant les ids.
+
+    1. shard_moving=True : les écritures de l'établissement sont suspendues (503), les lectures continuent ;
+    2. copie par lots vers la cible ; 3. bascule de shard_key ; 4. suppression par lots de la source.
+    """
+    establishment = db.session.get(Establishment, establishment_id)
+    if establishment is None:
+        raise ValueError(f"Établissement {establishment_id} introuvable")
+    source_shard = establishment.shard_key
+    if source_shard == target_shard:
+        return 0
+
+    source = db.engines[shard_bind_key(source_shard)]
+    target = db.engines[shard_bind_key(target_shard)]
+
+    establishment.shard_moving = True
+    db.session.commit()
+    # Laisse expirer le cache des autres processus avant de copier : plus aucune écriture sur la source
+    time.sleep(TENANT_CACHE_TTL)
+
+    selects = _tenant_selects(establishment_id)
+    deferred_updates = []
+    copied = 0
+    try:
+        for name in TENANT_COPY_ORDER:
+            table = db.metadata.tables[name]
+            deferred = DEFERRED_COLUMNS.get(name)
+            deferred_values = []
+            with source.connect() as source_connection:
+                result = source_connection.execution_options(stream_results=True, yield_per=batch_size) \
+                    .execute(selects[name])
+                for partition in result.mappings().partitions(batch_size):
+                    rows = [dict(row) for row in partition]
+                    if deferred:
+                        # Référence circulaire (employees.team_id <-> teams.manager_id) : renseignée après les équipes
+                        deferred_values.extend({'_id': row['id'], '_value': row[deferred]} for row in rows if row[deferred])
+                        for row in rows:
+                            row[deferred] = None
+                    with target.begin() as target_connection:
+                        target_connection.execute(table.insert(), rows)
+                    copied += len(rows)
+                    log(f"{name}: {copied} lignes copiées")
+            if deferred_values:
+                deferred_updates.append((table, deferred, deferred_values))
+            if name == DEFERRED_APPLY_AFTER:
+                _apply_deferred_updates(target, deferred_updates, batch_size)
+
+        establishment.shard_key = target_shard
+        establishment.shard_moving = False
+        db.session.commit()
+        clear_tenant_cache()
+    except Exception:
+        db.session.rollback()
+        # Copie partielle abandonnée : la cible est nettoyée, la source reste la référence
+        _delete_tenant_rows(target, selects, batch_size)
+        establishment.shard_moving = False
+        db.session.commit()
+        raise
+
+    # La cible fait foi : nettoyage de la source
+    time.sleep(TENANT_CACHE_TTL)
+    _delete_tenant_rows(source, selects, batch_size)
+    return copied
+
+
+def _delete_tenant_rows(engine, selects, batch_size):
+    """Supprime par lots les lignes d'un établissement, enfants d'abord (clés relevées avant toute suppression)."""
+    with engine.connect() as connection:
+        keys = {}
+        for name in TENANT_COPY_ORDER:
+            key = _delete_key(name)
+            keys[name] = [row[0] for row in connection.execute(
+                db.select(selects[name].subquery().c[key.name]).distinct())]
+    employees = db.metadata.tables['employees']
+    for name in reversed(TENANT_COPY_ORDER):
+        table = db.metadata.tables[name]
+        key = _delete_key(name)
+        ids = keys[name]
+        for offset in range(0, len(ids), batch_size):
+            batch = ids[offset:offset + batch_size]
+            with engine.begin() as connection:
+                if name == 'teams':
+                    connection.execute(employees.update().where(employees.c.team_id.in_(batch)).values(team_id=None))
+                connection.execute(table.delete().where(key.in_(batch)))
+
+
+def _delete_key(name):
+    table = db.metadata.tables[name]
+    return table.c.employee_id if name == 'employee_teams' else table.c.id
+
+
+def _apply_deferred_updates(target, deferred_updates, batch_size):
+    while deferred_updates:
+        table, column, values = deferred_updates.pop()
+        statement = table.update().where(table.c.id == db.bindparam('_id')).values({column: db.bindparam('_value')})
+        for offset in range(0, len(values), batch_size):
+            with target.begin() as connection:
+                connection.execute(statement, values[offset:offset + batch_size])
+
+
+def init_shard_commands(app):
+    @app.cli.command("init-shard")
+    @click.argument("shard_key")
+    def init_shard_command(shard_key):
+        """Crée les tables d'établissement sur un shard déclaré dans SQLALCHEMY_SHARD_URIS."""
+        create_shard_schema(shard_key)
+        print(f"Shard {shard_key} initialisé")
+
+    @app.cli.command("move-establishment")
+    @click.argument("establishment_id", type=int)
+    @click.argument("shard_key")
+    def move_establishment_command(establishment_id, shard_key):
+        """Déplace un établissement vers un shard ('central' : base principale)."""
+        copied = move_establishment(establishment_id, None if shard_key == "central" else shard_key)
+        print(f"{copied} lignes déplacées")
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Serveur SMTP local de débogage : affiche les messages reçus au lieu de les envoyer.
+
+Usage : python smtp_debug_server.py [--host 127.0.0.1] [--port 1025]
+puis NOTIFY_SMTP_HOST=127.0.0.1 NOTIFY_SMTP_PORT=1025 pour l'application.
+
+Dans un script d'essai : DebugSMTPServer(('127.0.0.1', 0)) lancé dans un thread
+(serve_forever) ; les messages reçus sont dans server.messages.
+"""
+import argparse
+import email
+import socketserver
+import sys
+from email import policy
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Sous-ensemble de SMTP suffisant pour smtplib : HELO/EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+
+    def _reply(self, code, text):
+        self.wfile.write(f"{code} {text}\r\n".encode("utf-8"))
+
+    def _read_data(self):
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b".\r\n", b".\n"):
+                return b"".join(lines)
+            # Points doublés en début de ligne (RFC 5321, 4.5.2)
+            lines.append(line[1:] if line.startswith(b"..") else line)
+
+    def handle(self):
+        self._reply(220, "maihlili debug SMTP")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.decode("utf-8", "replace").strip()[:4].upper()
+            if verb in ("HELO", "EHLO", "NOOP"):
+                self._reply(250, "OK")
+            elif verb == "MAIL":
+                recipients = []
+                self._reply(250, "OK")
+            elif verb == "RCPT":
+                recipients.append(line.decode("utf-8", "replace").split(":", 1)[1].strip().strip("<>"))
+                self._reply(250, "OK")
+            elif verb == "DATA":
+                self._reply(354, "Fin des données par <CRLF>.<CRLF>")
+                message = email.message_from_bytes(self._read_data(), policy=policy.default)
+                self.server.deliver(recipients, message)
+                self._reply(250, "OK")
+            elif verb == "RSET":
+                recipients = []
+                self._reply(250, "OK")
+            elif verb == "QUIT":
+                self._reply(221, "Au revoir")
+                return
+            else:
+                self._reply(502, "Commande non prise en charge")
+
+
+class DebugSMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, echo=False):
+        super().__init__(address, _SMTPHandler)
+        self.echo = echo
+        self.messages = []
+
+    def deliver(self, recipients, message):
+        self.messages.append(message)
+        if self.echo:
+            print(f"---------- {', '.join(recipients)} : {message['Subject']}")
+            print(message.get_content())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+
+    with DebugSMTPServer((args.host, args.port), echo=True) as server:
+        print(f"Serveur SMTP de débogage sur {args.host}:{args.port} (Ctrl+C pour arrêter)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
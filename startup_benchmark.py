@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Mesure du temps de démarrage : import de l'application dans des processus neufs.
+
+Usage : python startup_benchmark.py [--runs 10] [--top 15]
+
+Chaque essai lance 'python -X importtime -c "import app"' (création de l'application
+comprise) ; le script affiche la médiane du temps total et les modules les plus coûteux
+(temps cumulé, dernier essai). À lancer avant / après une modification des imports.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _run_once():
+    env = dict(os.environ)
+    # L'import crée l'application : une base en mémoire suffit (aucune connexion n'est ouverte)
+    env.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite://")
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return elapsed, result.stderr
+
+
+def _parse_importtime(output):
+    """[(temps cumulé en µs, module)] d'une sortie -X importtime."""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative_us), name.strip()))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    timings, output = [], ""
+    for _ in range(args.runs):
+        elapsed, output = _run_once()
+        timings.append(elapsed)
+
+    print(f"Démarrage (import app, {args.runs} essais) : médiane {statistics.median(timings) * 1000:.0f} ms, "
+          f"min {min(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms")
+
+    modules = _parse_importtime(output)
+    print("\nModules les plus coûteux (temps cumulé) :")
+    for cumulative_us, name in sorted(modules, reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    loaded = {name for _, name in modules}
+    for module in ("reportlab", "payslips", "payroll_export"):
+        print(f"{module} chargé au démarrage : {'oui' if module in loaded else 'non'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
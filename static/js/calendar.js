@@ -48,12 +48,12 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Événement lors du déplacement d'un événement
         eventDrop: function(info) {
-            updateAssignment(info.event.id, info.event.start, info.event.end);
+            updateAssignment(info.event.id, info.event.start, info.event.end, info.event.extendedProps.version);
         },
         
         // Événement lors du redimensionnement
         eventResize: function(info) {
-            updateAssignment(info.event.id, info.event.start, info.event.end);
+            updateAssignment(info.event.id, info.event.start, info.event.end, info.event.extendedProps.version);
         }
     });
     
@@ -113,8 +113,8 @@ function deleteAssignment(assignmentId) {
     });
 }
 
-// Fonction pour mettre à jour un assignment
-function updateAssignment(assignmentId, start, end) {
+// Fonction pour mettre à jour un assignment (version affichée : 409 si modifié entre-temps)
+function updateAssignment(assignmentId, start, end, version) {
     fetch(`/api/assignments/${assignmentId}`, {
         method: 'PUT',
         headers: {
@@ -122,7 +122,8 @@ function updateAssignment(assignmentId, start, end) {
         },
         body: JSON.stringify({
             start: start.toISOString(),
-            end: end.toISOString()
+            end: end.toISOString(),
+            version: version
         })
     })
     .then(response => response.json())
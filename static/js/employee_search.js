@@ -0,0 +1,92 @@
+// Recherche d'employés à la frappe (/api/employees/search) : remplace les listes déroulantes
+// qui contenaient tous les employés gérables.
+
+const EMPLOYEE_SEARCH_DELAY = 150;
+
+function searchEmployees(query, options) {
+    options = options || {};
+    const params = new URLSearchParams({q: query, limit: options.limit || 20});
+    if (options.unassigned) {
+        params.set('unassigned', '1');
+    }
+    return fetch(`/api/employees/search?${params}`, {signal: options.signal})
+        .then(response => response.json())
+        .then(data => data.success ? data.employees : []);
+}
+
+function employeeLabel(emp) {
+    return `${emp.full_name} - ${emp.position || 'Employé'}` + (emp.team ? ` (${emp.team})` : '');
+}
+
+// Appelle callback(employés) à chaque saisie, après EMPLOYEE_SEARCH_DELAY ms sans frappe ;
+// seule la dernière requête est prise en compte.
+function onEmployeeSearchInput(input, options, callback) {
+    let timer = null;
+    let controller = null;
+    const run = () => {
+        if (controller) {
+            controller.abort();
+        }
+        controller = new AbortController();
+        searchEmployees(input.value, Object.assign({}, options, {signal: controller.signal}))
+            .then(callback)
+            .catch(error => {
+                if (error.name !== 'AbortError') {
+                    console.error('Erreur lors de la recherche des employés:', error);
+                }
+            });
+    };
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(run, EMPLOYEE_SEARCH_DELAY);
+    });
+    return run;
+}
+
+// Champ texte + champ caché employee_id : l'employé est choisi dans la liste des résultats.
+function attachEmployeeSearch(input, hiddenInput, options) {
+    const results = document.createElement('div');
+    results.className = 'absolute left-0 right-0 z-50 mt-1 bg-white border rounded-lg shadow-lg max-h-60 overflow-y-auto hidden';
+    input.parentNode.classList.add('relative');
+    input.parentNode.appendChild(results);
+
+    const setSelected = (emp) => {
+        hiddenInput.value = emp ? emp.id : '';
+        input.setCustomValidity(emp || !input.value ? '' : 'Sélectionnez un employé dans la liste');
+    };
+
+    const render = (employees) => {
+        results.innerHTML = '';
+        if (!employees.length) {
+            const empty = document.createElement('div');
+            empty.className = 'px-3 py-2 text-sm text-gray-500';
+            empty.textContent = 'Aucun employé trouvé';
+            results.appendChild(empty);
+        }
+        employees.forEach(emp => {
+            const item = document.createElement('div');
+            item.className = 'px-3 py-2 text-sm text-left cursor-pointer hover:bg-blue-50';
+            item.textContent = employeeLabel(emp);
+            // mousedown : avant la perte du focus du champ (qui masque la liste)
+            item.addEventListener('mousedown', (event) => {
+                event.preventDefault();
+                input.value = employeeLabel(emp);
+                setSelected(emp);
+                results.classList.add('hidden');
+            });
+            results.appendChild(item);
+        });
+        results.classList.remove('hidden');
+    };
+
+    const run = onEmployeeSearchInput(input, options, render);
+    input.addEventListener('input', () => setSelected(null));
+    input.addEventListener('focus', run);
+    input.addEventListener('blur', () => results.classList.add('hidden'));
+    if (input.form) {
+        input.form.addEventListener('reset', () => {
+            hiddenInput.value = '';
+            input.setCustomValidity('');
+        });
+    }
+}
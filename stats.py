@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""Statistiques du planning calculées par agrégat SQL (sans hydratation ORM)."""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import Float, literal, select, union_all
+
+from models import db, Assignment, Employee
+from absences import load_absence_indexes, absence_hours
+from db_routing import primary_reads, current_tenant_bind
+
+# Durée de vie du cache (en secondes) par shard + périmètre + semaine
+STATS_CACHE_TTL = 60
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_scope_key(user):
+    """Clé de périmètre : tous les employés pour un admin, sinon ceux du manager."""
+    if user.is_admin:
+        return "admin"
+    if user.employee:
+        return f"manager:{user.employee.id}"
+    return f"user:{user.id}"
+
+
+def get_week_stats(employee_ids, week_start, week_end, scope_key):
+    """Retourne le nombre d'assignations, les heures et les employés couverts sur [week_start, week_end[.
+
+    Une seule requête agrégée ; le résultat est mis en cache STATS_CACHE_TTL secondes par périmètre.
+    La clé comprend le shard de la requête : les admins de deux établissements partagent la
+    clé de périmètre "admin" mais pas les mêmes employés.
+    """
+    key = (current_tenant_bind(), scope_key, week_start, week_end)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    if employee_ids:
+        # Résultat mis en cache : lu sur la base principale
+        with primary_reads():
+            count, total_hours, covered = db.session.query(
+                db.func.count(Assignment.id),
+                db.func.coalesce(db.func.sum(Assignment.duration_hours), 0),
+                db.func.count(db.distinct(Assignment.employee_id))
+            ).filter(
+                Assignment.employee_id.in_(employee_ids),
+                Assignment.start >= week_start,
+                Assignment.start < week_end
+            ).one()
+    else:
+        count, total_hours, covered = 0, 0, 0
+
+    stats = {
+        'assignments_count': count,
+        'total_hours': round(float(total_hours or 0), 2),
+        'employees_covered': covered,
+    }
+    with _cache_lock:
+        # Entrées expirées retirées à chaque ajout : le cache ne garde que les semaines consultées récemment
+        for expired in [cached_key for cached_key, (expires, _) in _cache.items() if expires <= now]:
+            del _cache[expired]
+        _cache[key] = (now + STATS_CACHE_TTL, stats)
+    return stats
+
+
+def get_current_week_bounds(now=None):
+    """Retourne (lundi 00:00, lundi suivant 00:00) pour la semaine en cours."""
+    now = now or datetime.now()
+    week_start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    return week_start, week_start + timedelta(days=7)
+
+
+def get_month_bounds(year, month):
+    """Retourne (1er du mois 00:00, 1er du mois suivant 00:00)."""
+    month_start = datetime(year, month, 1)
+    if month == 12:
+        return month_start, datetime(year + 1, 1, 1)
+    return month_start, datetime(year, month + 1, 1)
+
+
+def get_attention_list(employee_ids, year, month, threshold=10, limit=20, offset=0):
+    """Employés dont l'écart heures travaillées / heures contrat dépasse 'threshold' sur le mois.
+
+    Écart calculé en SQL (LEFT JOIN + SUM), filtré par HAVING et trié par écart absolu
+    décroissant ; seuls 'limit' employés à partir de 'offset' sont retournés. Les heures
+    d'absence comptées au contrat sont calculées à part et jointes comme une table de valeurs.
+    """
+    if not employee_ids:
+        return []
+
+    month_start, month_end = get_month_bounds(year, month)
+    worked = db.func.coalesce(db.func.sum(Assignment.duration_hours), 0)
+    contract = db.func.coalesce(Employee.contract_hours_per_month, 151.67)
+
+    credits = _absence_credits(employee_ids, month_start, month_end)
+    if credits is not None:
+        difference = worked + db.func.coalesce(db.func.max(credits.c.hours), 0) - contract
+    else:
+        difference = worked - contract
+
+    query = db.session.query(
+        Employee.id,
+        Employee.full_name,
+        Employee.position,
+        difference.label('difference')
+    ).outerjoin(
+        Assignment,
+        db.and_(
+            Assignment.employee_id == Employee.id,
+            Assignment.start >= month_start,
+            Assignment.start < month_end
+        )
+    )
+    if credits is not None:
+        query = query.outerjoin(credits, credits.c.employee_id == Employee.id)
+
+    rows = query.filter(
+        Employee.id.in_(employee_ids)
+    ).group_by(
+        Employee.id, Employee.full_name, Employee.position, Employee.contract_hours_per_month
+    ).having(
+        db.func.abs(difference) > threshold
+    ).order_by(
+        db.func.abs(difference).desc(), Employee.id
+    ).limit(limit).offset(offset).all()
+
+    attention_list = []
+    for emp_id, name, position, diff in rows:
+        diff = round(float(diff), 2)
+        attention_list.append({
+            "id": emp_id,
+            "name": name,
+            "position": position,
+            "difference": diff,
+            "status": 'over' if diff > 0 else 'under' if diff < 0 else 'exact'
+        })
+    return attention_list
+
+
+def _absence_credits(employee_ids, month_start, month_end):
+    """Sous-requête (employee_id, hours) des heures d'absence créditées au contrat, ou None."""
+    indexes = load_absence_indexes(employee_ids, month_start, month_end)
+    absent_ids = [employee_id for employee_id, index in indexes.items() if index.absences]
+    if not absent_ids:
+        return None
+    hours_per_week = dict(db.session.query(Employee.id, Employee.contract_hours_per_week).filter(
+        Employee.id.in_(absent_ids)
+    ))
+    rows = []
+    for employee_id in absent_ids:
+        credited, _ = absence_hours(indexes[employee_id], month_start, month_end, hours_per_week.get(employee_id))
+        if credited:
+            rows.append(select(literal(employee_id).label('employee_id'), literal(credited, Float).label('hours')))
+    if not rows:
+        return None
+    return (union_all(*rows) if len(rows) > 1 else rows[0]).subquery('absence_credits')
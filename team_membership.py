@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Appartenance aux équipes en requêtes ensemblistes.
+
+Employee.team_id (équipe principale) et la table employee_teams (utilisée par Team.members)
+sont toujours modifiés ensemble : set_team_membership place un employé dans une seule équipe,
+présente dans les deux représentations (et dans Employee.search_text, recalculé après chaque
+UPDATE en bloc) ; remove_team_member ne retire que le lien vers l'équipe visée.
+Les droits sont vérifiés pour tout l'ensemble d'ids en une requête.
+"""
+from sqlalchemy import and_, false, or_, true
+
+from models import db, Employee, Team, employee_teams, refresh_employee_search_text
+
+
+def manageable_employees_criterion(user):
+    """Critère SQL équivalent à Employee.can_be_managed_by(user)."""
+    if user.is_admin:
+        return true()
+    if not user.is_manager or not user.employee:
+        return false()
+    managed_team_ids = db.select(Team.id).where(Team.manager_id == user.employee.id)
+    return or_(
+        and_(Employee.team_id.is_(None), Employee.is_active.is_(True)),
+        Employee.team_id.in_(managed_team_ids),
+        Employee.id.in_(
+            db.select(employee_teams.c.employee_id).where(employee_teams.c.team_id.in_(managed_team_ids))
+        )
+    )
+
+
+def can_manage_team(user, team):
+    return user.is_admin or (user.employee is not None and team.manager_id == user.employee.id)
+
+
+def get_unmanageable_ids(user, employee_ids):
+    """Ids (parmi employee_ids) inexistants ou hors du périmètre de l'utilisateur, en une requête."""
+    employee_ids = set(employee_ids)
+    if not employee_ids:
+        return []
+    allowed = {row[0] for row in db.session.query(Employee.id).filter(
+        Employee.id.in_(employee_ids),
+        manageable_employees_criterion(user)
+    )}
+    return sorted(employee_ids - allowed)
+
+
+def set_team_membership(employee_ids, team_id):
+    """Place les employés dans l'équipe team_id (None : retire de toute équipe).
+
+    Trois instructions (UPDATE, DELETE, INSERT ... SELECT) quel que soit le nombre d'employés,
+    plus le recalcul de leur texte de recherche ; le commit est laissé à l'appelant.
+    """
+    employee_ids = list(set(employee_ids))
+    if not employee_ids:
+        return 0
+    result = db.session.execute(
+        db.update(Employee).where(Employee.id.in_(employee_ids)).values(team_id=team_id),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.execute(db.delete(employee_teams).where(employee_teams.c.employee_id.in_(employee_ids)))
+    if team_id is not None:
+        db.session.execute(employee_teams.insert().from_select(
+            ['employee_id', 'team_id'],
+            db.select(Employee.id, Employee.team_id).where(Employee.id.in_(employee_ids))
+        ))
+    refresh_employee_search_text(Employee.id.in_(employee_ids))
+    # Les objets Employee déjà chargés dans la session ne reflètent plus la base
+    db.session.expire_all()
+    return result.rowcount
+
+
+def remove_team_member(employee_id, team_id):
+    """Retire l'employé de la seule équipe team_id ; False s'il n'en est pas membre.
+
+    Le lien employee_teams est supprimé ; team_id n'est remis à NULL que s'il désigne cette
+    équipe. Le commit est laissé à l'appelant.
+    """
+    links = db.session.execute(db.delete(employee_teams).where(
+        employee_teams.c.employee_id == employee_id,
+        employee_teams.c.team_id == team_id
+    )).rowcount
+    main = db.session.execute(
+        db.update(Employee).where(Employee.id == employee_id, Employee.team_id == team_id).values(team_id=None),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    if not (links or main):
+        return False
+    refresh_employee_search_text(Employee.id == employee_id)
+    db.session.expire_all()
+    return True
+
+
+def clear_team_membership(team_id):
+    """Retire tous les membres d'une équipe (avant sa suppression), en deux instructions (plus le texte de recherche)."""
+    member_ids = [row[0] for row in db.session.query(Employee.id).filter(Employee.team_id == team_id)]
+    db.session.execute(
+        db.update(Employee).where(Employee.team_id == team_id).values(team_id=None),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.execute(db.delete(employee_teams).where(employee_teams.c.team_id == team_id))
+    if member_ids:
+        refresh_employee_search_text(Employee.id.in_(member_ids))
+    db.session.expire_all()
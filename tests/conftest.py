@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Fixtures communes : application sur une base SQLite temporaire (et un shard si demandé)."""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# app.py crée une instance à l'import : une base jetable suffit
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "import.db"))
+
+import pytest
+
+from app import create_app
+from models import db
+from sharding import clear_tenant_cache, create_shard_schema
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """Fabrique d'application ; shards=['a'] déclare un shard SQLite par nom."""
+    def factory(shards=()):
+        monkeypatch.setenv("SQLALCHEMY_SHARD_URIS", ",".join(
+            f"{name}=sqlite:///{tmp_path / f'shard_{name}.db'}" for name in shards
+        ))
+        app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'central.db'}"})
+        with app.app_context():
+            db.create_all(bind_key=None)
+            for name in shards:
+                create_shard_schema(name)
+        clear_tenant_cache()
+        return app
+    return factory
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        yield app
+        db.session.remove()
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+import pytest
+
+from models import db, Employee, Establishment, Absence
+from absences import find_absence, get_blocking_absence
+
+
+@pytest.fixture
+def employee(app):
+    establishment = Establishment(name="E1")
+    db.session.add(establishment)
+    db.session.flush()
+    employee = Employee(full_name="Emp", establishment_id=establishment.id)
+    db.session.add(employee)
+    db.session.flush()
+    return employee
+
+
+def test_pending_request_does_not_hide_approved_absence(employee):
+    approved = Absence(employee_id=employee.id, absence_type="conges_payes", approved=True,
+                       start=datetime(2024, 3, 4), end=datetime(2024, 3, 9))
+    # Demande en attente commençant plus tard, recoupant aussi le service
+    pending = Absence(employee_id=employee.id, absence_type="conges_payes", approved=False,
+                      start=datetime(2024, 3, 5, 12), end=datetime(2024, 3, 6))
+    db.session.add_all([approved, pending])
+    db.session.commit()
+
+    start, end = datetime(2024, 3, 5, 8), datetime(2024, 3, 5, 16)
+    assert get_blocking_absence(employee.id, start, end) == approved
+    assert find_absence(employee.id, start, end) == pending
+
+
+def test_no_blocking_absence_outside_approved_range(employee):
+    db.session.add(Absence(employee_id=employee.id, absence_type="maladie", approved=False,
+                           start=datetime(2024, 3, 4), end=datetime(2024, 3, 9)))
+    db.session.commit()
+
+    assert get_blocking_absence(employee.id, datetime(2024, 3, 5, 8), datetime(2024, 3, 5, 16)) is None
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from models import db, User, Employee, Establishment
+from sharding import tenant_scope
+
+
+@pytest.fixture
+def sharded_app(make_app):
+    app = make_app(shards=["a"])
+    with app.app_context():
+        establishment = Establishment(name="E1", shard_key="a")
+        db.session.add(establishment)
+        db.session.flush()
+        for username, active in (("active", True), ("inactive", False)):
+            user = User(username=username, email=f"{username}@x", establishment_id=establishment.id)
+            user.set_password("pw")
+            db.session.add(user)
+            db.session.flush()
+            with tenant_scope(establishment.id):
+                db.session.add(Employee(full_name=username, user_id=user.id, establishment_id=establishment.id,
+                                        is_active=active))
+                db.session.flush()
+        db.session.commit()
+        db.session.remove()
+    return app
+
+
+def _login(app, username):
+    client = app.test_client()
+    response = client.post("/login", data={"username": username, "password": "pw"})
+    with client.session_transaction() as session:
+        return response, session.get("_user_id")
+
+
+def test_inactive_employee_of_sharded_establishment_cannot_log_in(sharded_app):
+    response, user_id = _login(sharded_app, "inactive")
+    assert response.status_code == 200
+    assert user_id is None
+
+
+def test_active_employee_of_sharded_establishment_logs_in(sharded_app):
+    response, user_id = _login(sharded_app, "active")
+    assert response.status_code == 302
+    assert user_id is not None
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from models import db, Employee, Establishment
+from payroll_export import iter_payroll_rows, PayrollLayout
+
+
+@pytest.fixture
+def two_establishments(app):
+    first, second = Establishment(name="E1"), Establishment(name="E2")
+    db.session.add_all([first, second])
+    db.session.flush()
+    # Ids alternés entre les deux établissements : chaque paquet les mélange
+    for i in range(6):
+        db.session.add(Employee(full_name=f"Emp {i}", establishment_id=first.id if i % 2 == 0 else second.id))
+    db.session.commit()
+    return first, second
+
+
+def test_all_chunks_keep_every_establishment(two_establishments):
+    rows = list(iter_payroll_rows(2024, 3, chunk_size=2))
+    assert [row['employee_id'] for row in rows] == [1, 2, 3, 4, 5, 6]
+    assert [row['establishment'] for row in rows] == ["E1", "E2"] * 3
+
+
+def test_establishment_filter_applies_to_every_chunk(two_establishments):
+    first, _ = two_establishments
+    rows = list(iter_payroll_rows(2024, 3, establishment_id=first.id, chunk_size=2))
+    assert [row['employee_id'] for row in rows] == [1, 3, 5]
+
+
+def test_layout_requires_format_row():
+    with pytest.raises(TypeError):
+        PayrollLayout()
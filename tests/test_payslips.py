@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+from payslips import render_payslip_pdf
+
+
+def test_markup_characters_in_employee_fields():
+    filename, pdf = render_payslip_pdf({
+        'full_name': 'Dupont <Jr & Fils',
+        'position': 'Chef de rang & second',
+        'contract_type': 'CDI',
+        'establishment': 'Café & Co',
+        'period': 'Mars 2024',
+        'filename': 'bulletin_202403_1.pdf',
+        'lines': [('Heures normales', 151.67, 11.65, 1766.96)],
+        'gross_total': 1766.96,
+    })
+    assert filename == 'bulletin_202403_1.pdf'
+    assert pdf.startswith(b'%PDF')
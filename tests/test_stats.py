@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, time, timedelta
+
+import pytest
+
+import stats
+from models import db, Assignment, Employee, Establishment, Shift
+from sharding import tenant_scope
+from stats import get_week_stats
+
+WEEK_START = datetime(2024, 3, 4)
+WEEK_END = WEEK_START + timedelta(days=7)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    stats._cache.clear()
+    yield
+    stats._cache.clear()
+
+
+def _add_assignments(establishment_id, shift_id, count):
+    employee = Employee(full_name="Emp", establishment_id=establishment_id)
+    db.session.add(employee)
+    db.session.flush()
+    for day in range(count):
+        start = WEEK_START + timedelta(days=day, hours=8)
+        db.session.add(Assignment(employee_id=employee.id, shift_id=shift_id, start=start, end=start + timedelta(hours=8)))
+    db.session.flush()
+    return employee.id
+
+
+def test_admin_stats_are_cached_per_shard(make_app):
+    app = make_app(shards=["a"])
+    with app.app_context():
+        central, sharded = Establishment(name="E1"), Establishment(name="E2", shard_key="a")
+        shift = Shift(name="Matin", start_time=time(8), end_time=time(16))
+        db.session.add_all([central, sharded, shift])
+        db.session.flush()
+        with tenant_scope(central.id):
+            central_ids = [_add_assignments(central.id, shift.id, 2)]
+        with tenant_scope(sharded.id):
+            sharded_ids = [_add_assignments(sharded.id, shift.id, 3)]
+        db.session.commit()
+
+        with tenant_scope(central.id):
+            assert get_week_stats(central_ids, WEEK_START, WEEK_END, "admin")['assignments_count'] == 2
+        with tenant_scope(sharded.id):
+            assert get_week_stats(sharded_ids, WEEK_START, WEEK_END, "admin")['assignments_count'] == 3
+        db.session.remove()
+
+
+def test_expired_entries_are_pruned(app, monkeypatch):
+    monkeypatch.setattr(stats, "STATS_CACHE_TTL", 0)
+    for week in range(3):
+        get_week_stats([], WEEK_START + timedelta(weeks=week), WEEK_END + timedelta(weeks=week), "admin")
+    assert len(stats._cache) == 1
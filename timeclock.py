@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""Ingestion par lots des pointages des badgeuses (TimeSheetEntry)."""
+from datetime import datetime, timedelta
+
+from models import db, Employee, Assignment, TimeSheetEntry, ClockPunch
+
+# Taille maximale d'un lot envoyé par une badgeuse
+MAX_PUNCH_BATCH = 1000
+
+# Un pointage est rattaché à une assignation s'il tombe dans [start - tolérance, end + tolérance]
+PUNCH_MATCH_TOLERANCE = timedelta(hours=2)
+
+
+class PunchValidationError(ValueError):
+    """Lot de pointages invalide (format, type ou horodatage)."""
+
+
+def _parse_timestamp(value):
+    if not isinstance(value, str):
+        raise TypeError("Horodatage ISO 8601 attendu")
+    punched_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if punched_at.tzinfo is not None:
+        # Les DateTime de la base sont naïfs (heure locale du serveur)
+        punched_at = punched_at.astimezone().replace(tzinfo=None)
+    return punched_at
+
+
+def _normalize_punches(raw_punches):
+    """Valide le lot et le trie chronologiquement ; les clés en double dans le lot sont ignorées."""
+    punches = []
+    seen_keys = set()
+    for index, raw in enumerate(raw_punches):
+        try:
+            key = str(raw["key"])
+            employee_id = int(raw["employee_id"])
+            punch_type = raw["type"]
+            punched_at = _parse_timestamp(raw["timestamp"])
+        except (KeyError, TypeError, ValueError):
+            raise PunchValidationError(f"Pointage #{index} invalide")
+        if punch_type not in ("in", "out"):
+            raise PunchValidationError(f"Pointage #{index} : type '{punch_type}' inconnu")
+        if key in seen_keys:
+            continue
+        seen_keys.add(key)
+        punches.append({
+            'key': key,
+            'employee_id': employee_id,
+            'type': punch_type,
+            'punched_at': punched_at,
+            'terminal_id': raw.get("terminal_id"),
+        })
+    punches.sort(key=lambda p: p['punched_at'])
+    return punches
+
+
+def _known_keys(keys):
+    return {
+        key for (key,) in db.session.query(ClockPunch.idempotency_key).filter(
+            ClockPunch.idempotency_key.in_(keys)
+        )
+    }
+
+
+def has_idempotency_conflict(raw_punches):
+    """Après une IntegrityError (et le rollback) : une clé du lot a-t-elle été enregistrée par une requête concurrente ?"""
+    return bool(_known_keys([str(raw["key"]) for raw in raw_punches]))
+
+
+def _load_candidate_assignments(punches):
+    """Une requête (index employee_id, start) pour toutes les assignations proches des pointages."""
+    employee_ids = {p['employee_id'] for p in punches}
+    window_start = min(p['punched_at'] for p in punches) - PUNCH_MATCH_TOLERANCE
+    window_end = max(p['punched_at'] for p in punches) + PUNCH_MATCH_TOLERANCE
+    rows = db.session.query(
+        Assignment.id, Assignment.employee_id, Assignment.start, Assignment.end
+    ).filter(
+        Assignment.employee_id.in_(employee_ids),
+        Assignment.start <= window_end,
+        Assignment.end >= window_start
+    ).all()
+
+    by_employee = {}
+    for assignment_id, employee_id, start, end in rows:
+        by_employee.setdefault(employee_id, []).append((start, end, assignment_id))
+    for candidates in by_employee.values():
+        candidates.sort()
+    return by_employee
+
+
+def _match_assignment(candidates, punch):
+    """Assignation dont la plage (avec tolérance) contient le pointage, la plus proche du bord concerné."""
+    best_id, best_gap = None, None
+    for start, end, assignment_id in candidates:
+        if not (start - PUNCH_MATCH_TOLERANCE <= punch['punched_at'] <= end + PUNCH_MATCH_TOLERANCE):
+            continue
+        reference = start if punch['type'] == 'in' else end
+        gap = abs((punch['punched_at'] - reference).total_seconds())
+        if best_gap is None or gap < best_gap:
+            best_id, best_gap = assignment_id, gap
+    return best_id
+
+
+def ingest_punches(raw_punches, received_at=None, establishment_id=None):
+    """Enregistre un lot de pointages en une transaction (sur le shard courant, voir tenant_scope).
+
+    - les clés d'idempotence déjà connues sont ignorées (une requête IN) ;
+    - chaque pointage est rattaché à une assignation via une seule requête indexée ;
+    - les entrées 'in' sont insérées en masse, les 'out' ferment l'entrée ouverte par une
+      mise à jour groupée ;
+    - un seul commit pour tout le lot.
+
+    Retourne un dict {key: statut} ; statuts : 'matched', 'unmatched', 'orphan_out', 'duplicate',
+    'unknown_employee' (pointage refusé, non enregistré : le renvoyer ne servirait à rien).
+    Avec establishment_id, les employés d'un autre établissement sont refusés.
+    """
+    if len(raw_punches) > MAX_PUNCH_BATCH:
+        raise PunchValidationError(f"Lot trop volumineux (maximum {MAX_PUNCH_BATCH} pointages)")
+
+    received_at = received_at or datetime.utcnow()
+    punches = _normalize_punches(raw_punches)
+    if not punches:
+        return {}
+
+    results = {}
+    known_keys = _known_keys([p['key'] for p in punches])
+    for key in known_keys:
+        results[key] = 'duplicate'
+    punches = [p for p in punches if p['key'] not in known_keys]
+
+    # Employés inconnus refusés avant l'insertion (sinon violation de clé étrangère à chaque renvoi)
+    employee_ids = {p['employee_id'] for p in punches}
+    employee_query = db.session.query(Employee.id).filter(Employee.id.in_(employee_ids))
+    if establishment_id:
+        employee_query = employee_query.filter(Employee.establishment_id == establishment_id)
+    existing_ids = {employee_id for (employee_id,) in employee_query} if employee_ids else set()
+    for punch in punches:
+        if punch['employee_id'] not in existing_ids:
+            results[punch['key']] = 'unknown_employee'
+    punches = [p for p in punches if p['employee_id'] in existing_ids]
+    if not punches:
+        return results
+
+    candidates_by_employee = _load_candidate_assignments(punches)
+    for punch in punches:
+        punch['assignment_id'] = _match_assignment(candidates_by_employee.get(punch['employee_id'], []), punch)
+
+    # Entrées encore ouvertes (clock_out NULL) pour les assignations concernées par une sortie
+    out_assignment_ids = {p['assignment_id'] for p in punches if p['type'] == 'out' and p['assignment_id']}
+    open_entries = {}
+    if out_assignment_ids:
+        for entry_id, assignment_id in db.session.query(TimeSheetEntry.id, TimeSheetEntry.assignment_id).filter(
+            TimeSheetEntry.assignment_id.in_(out_assignment_ids),
+            TimeSheetEntry.clock_out.is_(None)
+        ).order_by(TimeSheetEntry.clock_in):
+            open_entries.setdefault(assignment_id, {'id': entry_id})
+
+    new_entries = []
+    entry_updates = []
+    punch_rows = []
+    for punch in punches:
+        assignment_id = punch['assignment_id']
+        status = 'matched'
+        if assignment_id is None:
+            status = 'unmatched'
+        elif punch['type'] == 'in':
+            entry = {
+                'assignment_id': assignment_id,
+                'employee_id': punch['employee_id'],
+                'clock_in': punch['punched_at'],
+                'clock_out': None,
+                'entry_type': 'work',
+            }
+            new_entries.append(entry)
+            open_entries[assignment_id] = entry
+        else:
+            entry = open_entries.pop(assignment_id, None)
+            if entry is None:
+                status = 'orphan_out'
+            elif 'id' in entry:
+                entry_updates.append({'id': entry['id'], 'clock_out': punch['punched_at']})
+            else:
+                # Entrée et sortie dans le même lot : l'entrée n'est pas encore insérée
+                entry['clock_out'] = punch['punched_at']
+
+        results[punch['key']] = status
+        punch_rows.append({
+            'idempotency_key': punch['key'],
+            'employee_id': punch['employee_id'],
+            'punch_type': punch['type'],
+            'punched_at': punch['punched_at'],
+            'status': status,
+            'assignment_id': assignment_id,
+            'terminal_id': punch['terminal_id'],
+            'received_at': received_at,
+        })
+
+    if new_entries:
+        db.session.execute(db.insert(TimeSheetEntry), new_entries)
+    if entry_updates:
+        db.session.execute(db.update(TimeSheetEntry), entry_updates)
+    db.session.execute(db.insert(ClockPunch), punch_rows)
+    db.session.commit()
+    return results
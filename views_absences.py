@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""Absences : saisie par le manager, demandes des employés et validation."""
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+
+from models import db, Employee, Assignment, Absence
+from access import get_manageable_employees
+from absences import ABSENCE_TYPES, find_absence, serialize_absence, parse_absence_bound
+from db_routing import read_replica
+
+absences_bp = Blueprint("absences", __name__)
+
+
+def _can_manage_absence(absence):
+    return current_user.is_manager and absence.employee.can_be_managed_by(current_user)
+
+
+@absences_bp.get("/api/absences")
+@read_replica
+@login_required
+def list_absences():
+    """Absences recoupant [start, end[ des employés visibles (les siennes pour un employé)."""
+    try:
+        start = parse_absence_bound(request.args["start"])
+        end = parse_absence_bound(request.args["end"], is_end=True)
+    except (KeyError, ValueError):
+        return jsonify({"success": False, "error": "Paramètres start et end requis (AAAA-MM-JJ)"}), 400
+
+    if current_user.is_manager:
+        employee_ids = [emp.id for emp in get_manageable_employees(current_user)]
+    else:
+        employee_ids = [current_user.employee.id] if current_user.employee else []
+    employee_id = request.args.get("employee_id", type=int)
+    if employee_id is not None:
+        employee_ids = [employee_id] if employee_id in employee_ids else []
+    if not employee_ids:
+        return jsonify({"success": True, "absences": []})
+
+    absences = Absence.query.filter(
+        Absence.employee_id.in_(employee_ids),
+        Absence.start < end,
+        Absence.end > start
+    ).order_by(Absence.employee_id, Absence.start).all()
+    return jsonify({"success": True, "absences": [serialize_absence(absence) for absence in absences]})
+
+
+@absences_bp.route("/api/absences", methods=["POST"])
+@login_required
+def create_absence():
+    """Saisie par un manager (approuvée par défaut) ou demande d'un employé pour lui-même."""
+    data = request.get_json() or {}
+    absence_type = data.get("type")
+    if absence_type not in ABSENCE_TYPES:
+        return jsonify({"success": False, "error": f"Type d'absence inconnu (types : {', '.join(ABSENCE_TYPES)})"}), 400
+    try:
+        start = parse_absence_bound(data["start"])
+        end = parse_absence_bound(data["end"], is_end=True)
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"success": False, "error": "Dates de début et de fin invalides"}), 400
+    if end <= start:
+        return jsonify({"success": False, "error": "La fin doit être postérieure au début"}), 400
+
+    if current_user.is_manager:
+        try:
+            employee = db.session.get(Employee, int(data.get("employee_id")))
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "Employé invalide"}), 400
+        if not employee or not employee.can_be_managed_by(current_user):
+            return jsonify({"success": False, "error": "Vous ne pouvez pas gérer cet employé"}), 403
+        approved = bool(data.get("approved", True))
+    else:
+        employee = current_user.employee
+        if not employee:
+            return jsonify({"success": False, "error": "Aucun profil employé associé"}), 403
+        approved = False
+
+    # Les absences d'un employé ne se chevauchent pas (index d'intervalles)
+    existing = find_absence(employee.id, start, end)
+    if existing:
+        return jsonify({
+            "success": False,
+            "error": "Une absence existe déjà sur cette période",
+            "absence": serialize_absence(existing)
+        }), 409
+
+    try:
+        absence = Absence(
+            employee_id=employee.id,
+            absence_type=absence_type,
+            start=start,
+            end=end,
+            approved=approved,
+            notes=data.get("notes", ""),
+            created_by=current_user.id
+        )
+        db.session.add(absence)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erreur lors de la création de l'absence: {e}")
+        return jsonify({"success": False, "error": "Erreur lors de la création de l'absence"}), 500
+
+    # Assignations déjà planifiées pendant l'absence : à réaffecter par le manager
+    conflicting_ids = [row[0] for row in db.session.query(Assignment.id).filter(
+        Assignment.employee_id == employee.id,
+        Assignment.start < end,
+        Assignment.end > start
+    )]
+    return jsonify({"success": True, "absence": serialize_absence(absence), "conflicting_assignments": conflicting_ids})
+
+
+@absences_bp.route("/api/absences/<int:absence_id>/approve", methods=["POST"])
+@login_required
+def approve_absence(absence_id):
+    absence = Absence.query.get_or_404(absence_id)
+    if not _can_manage_absence(absence):
+        return jsonify({"success": False, "error": "Accès refusé"}), 403
+
+    try:
+        absence.approved = True
+        db.session.commit()
+        return jsonify({"success": True, "absence": serialize_absence(absence)})
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erreur lors de la validation de l'absence: {e}")
+        return jsonify({"success": False, "error": "Erreur lors de la validation"}), 500
+
+
+@absences_bp.route("/api/absences/<int:absence_id>", methods=["DELETE"])
+@login_required
+def delete_absence(absence_id):
+    """Suppression par le manager, ou retrait par l'employé de sa demande non encore validée."""
+    absence = Absence.query.get_or_404(absence_id)
+    own_request = (current_user.employee is not None and absence.employee_id == current_user.employee.id
+                   and not absence.approved)
+    if not (own_request or _can_manage_absence(absence)):
+        return jsonify({"success": False, "error": "Accès refusé"}), 403
+
+    try:
+        db.session.delete(absence)
+        db.session.commit()
+        return jsonify({"success": True})
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erreur lors de la suppression de l'absence: {e}")
+        return jsonify({"success": False, "error": "Erreur lors de la suppression"}), 500
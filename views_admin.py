@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""Ultra-Admin : établissements, purges, métriques et commande 'flask purge-establishments'."""
+import os
+
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, jsonify, flash
+from flask_login import login_required
+
+from models import db, Establishment, AuditLog
+from access import super_admin_required
+from db_pool import get_pool_metrics
+from preload import get_memory_usage
+from audit import audit_writer
+from notifications import notification_dispatcher
+from establishment_purge import request_establishment_deletion, start_purge_thread, purge_pending_establishments
+
+admin_bp = Blueprint("admin", __name__, cli_group=None)
+
+
+# ----------------------------------------------------------------------
+# 🏰 NOUVELLE ROUTE : Gestion des établissements
+# ----------------------------------------------------------------------
+@admin_bp.route('/super-admin/establishments', methods=['GET', 'POST'])
+@login_required
+@super_admin_required # Seul l'Ultra-Admin y a accès
+def manage_establishments():
+    # Les établissements en cours de suppression sont masqués (affichés à part avec l'avancement)
+    establishments = Establishment.query.filter(Establishment.deleted_at.is_(None)).all()
+    purging_establishments = Establishment.query.filter(Establishment.deleted_at.isnot(None)).all()
+    
+    if request.method == 'POST':
+        action = request.form.get('action')
+        
+        if action == 'create':
+            name = request.form.get('name')
+            if name:
+                if Establishment.query.filter_by(name=name).first():
+                    flash(f'Un établissement nommé "{name}" existe déjà.', 'error')
+                else:
+                    shard_key = request.form.get('shard_key') or None
+                    if shard_key not in [None] + current_app.config.get("SHARD_KEYS", []):
+                        shard_key = None
+                    new_est = Establishment(name=name, shard_key=shard_key)
+                    db.session.add(new_est)
+                    try:
+                        db.session.commit()
+                        flash(f'Établissement "{name}" créé avec succès.', 'success')
+                    except Exception as e:
+                        db.session.rollback()
+                        flash(f'Erreur lors de la création : {e}', 'error')
+            
+        elif action == 'delete':
+            est_id = request.form.get('establishment_id')
+            est = Establishment.query.get(est_id)
+            
+            if est and est.deleted_at is None:
+                try:
+                    # 1. Masquer immédiatement l'établissement et désactiver ses employés
+                    request_establishment_deletion(est)
+                    
+                    # 2. Purge par lots en tâche de fond (pointages, assignations, équipes, employés)
+                    start_purge_thread(current_app._get_current_object(), est.id)
+                    flash(f'Suppression de l\'établissement "{est.name}" lancée en arrière-plan.', 'success')
+                except Exception as e:
+                    db.session.rollback()
+                    flash(f'Erreur lors de la suppression : {e}', 'error')
+
+        return redirect(url_for('admin.manage_establishments'))
+
+    return render_template('manage_establishments.html', establishments=establishments,
+                           purging_establishments=purging_establishments,
+                           shard_keys=current_app.config.get("SHARD_KEYS", []))
+
+@admin_bp.route('/api/super-admin/establishments/purges')
+@login_required
+@super_admin_required
+def api_establishment_purges():
+    """Avancement des suppressions d'établissements en cours."""
+    purging = Establishment.query.filter(Establishment.deleted_at.isnot(None)).all()
+    return jsonify({
+        "success": True,
+        "purges": [{
+            "id": est.id,
+            "name": est.name,
+            "deleted_at": est.deleted_at.isoformat(),
+            "progress": est.purge_progress or {}
+        } for est in purging]
+    })
+
+@admin_bp.route('/api/super-admin/metrics')
+@login_required
+@super_admin_required
+def api_admin_metrics():
+    """Métriques du processus (worker) qui répond : pools de connexions par bind, mémoire, journal et notifications."""
+    return jsonify({
+        "success": True,
+        "pid": os.getpid(),
+        "pool_profile": current_app.config["DB_POOL_PROFILE"],
+        "pools": get_pool_metrics(db.engines),
+        "memory": get_memory_usage(),
+        "audit": audit_writer.stats(),
+        "notifications": notification_dispatcher.stats()
+    })
+
+@admin_bp.route('/api/super-admin/audit')
+@login_required
+@super_admin_required
+def api_audit_log():
+    """Journal des modifications, du plus récent au plus ancien.
+
+    Filtres : entity_type, entity_id, user_id ; pagination par before_id (id de la dernière entrée reçue).
+    """
+    query = AuditLog.query
+    if request.args.get("entity_type"):
+        query = query.filter(AuditLog.entity_type == request.args["entity_type"])
+    for name in ("entity_id", "user_id"):
+        value = request.args.get(name, type=int)
+        if value is not None:
+            query = query.filter(getattr(AuditLog, name) == value)
+    before_id = request.args.get("before_id", type=int)
+    if before_id is not None:
+        query = query.filter(AuditLog.id < before_id)
+    limit = max(1, min(request.args.get("limit", 50, type=int), 500))
+    
+    entries = query.order_by(AuditLog.id.desc()).limit(limit).all()
+    return jsonify({
+        "success": True,
+        "entries": [{
+            "id": entry.id,
+            "created_at": entry.created_at.isoformat(),
+            "user_id": entry.user_id,
+            "username": entry.username,
+            "establishment_id": entry.establishment_id,
+            "action": entry.action,
+            "entity_type": entry.entity_type,
+            "entity_id": entry.entity_id,
+            "before": entry.before,
+            "after": entry.after
+        } for entry in entries]
+    })
+
+@admin_bp.cli.command("purge-establishments")
+def purge_establishments_command():
+    """Reprend les suppressions d'établissements interrompues (redémarrage pendant une purge)."""
+    count = purge_pending_establishments()
+    print(f"{count} établissement(s) purgé(s)")
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""Assignations : formulaire, API du calendrier et contrôle de version."""
+from datetime import datetime, timedelta
+
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify, flash
+from flask_login import login_required, current_user
+from sqlalchemy.orm.exc import StaleDataError
+
+from models import db, Employee, Shift, Assignment
+from access import get_manageable_employees
+from absences import get_blocking_absence, serialize_absence, ABSENCE_TYPES
+from audit import record_audit, snapshot, ASSIGNMENT_FIELDS
+from notifications import notify_assignment_change
+
+assignments_bp = Blueprint("assignments", __name__)
+
+# --- Assignations ---
+
+@assignments_bp.route("/assignments", methods=["GET", "POST"])
+@login_required
+def assignments():
+    if not current_user.is_manager:
+        flash("Accès refusé", "error")
+        return redirect(url_for("dashboard.index"))
+        
+    if request.method == "POST":
+        employee_id = request.form["employee_id"]
+        shift_id = request.form["shift_id"]
+        start_date = request.form["start_date"]
+        start_time = request.form["start_time"]
+        end_date = request.form["end_date"]
+        end_time = request.form["end_time"]
+        notes = request.form.get("notes", "")
+        
+        try:
+            # Vérifier que le manager peut assigner cet employé
+            employee = Employee.query.get(employee_id)
+            if not employee or not employee.can_be_managed_by(current_user):
+                flash("Vous ne pouvez pas assigner cet employé", "error")
+                return redirect(url_for("assignments.assignments"))
+            
+            start = datetime.strptime(f"{start_date} {start_time}", "%Y-%m-%d %H:%M")
+            end = datetime.strptime(f"{end_date} {end_time}", "%Y-%m-%d %H:%M")
+            
+            absence = get_blocking_absence(employee.id, start, end)
+            if absence:
+                flash(absence_message(absence), "error")
+                return redirect(url_for("assignments.assignments"))
+            
+            assignment = Assignment(
+                employee_id=employee_id,
+                shift_id=shift_id,
+                start=start,
+                end=end,
+                notes=notes,
+                created_by=current_user.id
+            )
+            
+            db.session.add(assignment)
+            db.session.flush()
+            assignment_id, after = assignment.id, snapshot(assignment, ASSIGNMENT_FIELDS)
+            db.session.commit()
+            assignment_changed("create", assignment_id, after=after)
+            
+            flash("Assignation créée avec succès", "success")
+            return redirect(url_for("assignments.assignments"))
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"ERREUR LORS DE L'ENREGISTREMENT DE L'ASSIGNATION: {e}")
+            flash("Erreur lors de la création de l'assignation", "error")
+            return redirect(url_for("assignments.assignments"))
+    
+    # Afficher seulement les assignations des employés gérables
+    manageable_employees = get_manageable_employees(current_user)
+    manageable_ids = [emp.id for emp in manageable_employees]
+    
+    if manageable_ids:
+        assignments = Assignment.query.filter(
+            Assignment.employee_id.in_(manageable_ids)
+        ).order_by(Assignment.start.desc()).all()
+    else:
+        assignments = []
+    
+    shifts = Shift.query.all()
+    
+    # Calculer les statistiques pour le template
+    assignments_today = 0
+    assignments_week = 0
+    conflicts = 0
+    
+    now = datetime.now()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    today_end = today_start + timedelta(days=1)
+    week_start = now - timedelta(days=now.weekday())
+    
+    for assignment in assignments:
+        if today_start <= assignment.start < today_end:
+            assignments_today += 1
+        if assignment.start >= week_start:
+            assignments_week += 1
+    
+    return render_template("assignments.html", 
+                         assignments=assignments,
+                         employees=manageable_employees, 
+                         shifts=shifts,
+                         assignments_today=assignments_today,
+                         assignments_week=assignments_week,
+                         conflicts=conflicts)
+
+def serialize_assignment_state(assignment):
+    """État d'une assignation renvoyé au client (succès ou conflit), avec sa version."""
+    return {
+        "id": assignment.id,
+        "employee_id": assignment.employee_id,
+        "shift_id": assignment.shift_id,
+        "start": assignment.start.isoformat(),
+        "end": assignment.end.isoformat(),
+        "version": assignment.version,
+        "updated_at": assignment.updated_at.isoformat() if assignment.updated_at else None
+    }
+
+def version_matches(assignment, expected_version):
+    """Vrai si la version envoyée par le client correspond à celle de l'assignation."""
+    try:
+        return int(expected_version) == assignment.version
+    except (TypeError, ValueError):
+        return False
+
+def absence_message(absence):
+    label = ABSENCE_TYPES.get(absence.absence_type, {}).get('label', absence.absence_type)
+    return (f"Employé absent ({label}) du {absence.start.strftime('%d/%m/%Y %H:%M')} "
+            f"au {absence.end.strftime('%d/%m/%Y %H:%M')}")
+
+def absence_conflict(employee_id, start, end):
+    """409 si l'employé a une absence approuvée sur [start, end[, sinon None."""
+    absence = get_blocking_absence(employee_id, start, end)
+    if absence is None:
+        return None
+    return jsonify({
+        "success": False,
+        "error": absence_message(absence),
+        "absence": serialize_absence(absence)
+    }), 409
+
+def assignment_changed(action, assignment_id, before=None, after=None):
+    """Journal des modifications et notification des employés concernés (après le commit)."""
+    record_audit(action, "assignment", assignment_id, before=before, after=after)
+    # Une duplication est un ajout pour l'employé ('before' y est l'assignation d'origine)
+    notify_assignment_change(assignment_id, before=None if action == "duplicate" else before, after=after)
+
+def version_required():
+    """428 : une modification sans version écraserait celle d'un autre utilisateur."""
+    return jsonify({
+        "success": False,
+        "error": "Version de l'assignation manquante : rechargez le planning avant de la modifier."
+    }), 428
+
+def assignment_conflict(assignment):
+    """409 : l'assignation a été modifiée par quelqu'un d'autre ; le client reçoit l'état actuel."""
+    return jsonify({
+        "success": False,
+        "error": "Cette assignation a été modifiée entre-temps. Le planning a été rechargé.",
+        "current": serialize_assignment_state(assignment)
+    }), 409
+
+@assignments_bp.route("/api/assignments", methods=["POST"])
+@login_required
+def create_assignment():
+    if not current_user.is_manager:
+        return jsonify({"success": False, "error": "Accès refusé"}), 403
+    
+    try:
+        employee_id_str = request.form.get("employee_id")
+        shift_id_str = request.form.get("shift_id") 
+        start_str = request.form.get("start")
+        end_str = request.form.get("end")
+        notes = request.form.get("notes", "")
+        
+        if not all([employee_id_str, shift_id_str, start_str, end_str]):
+            return jsonify({"success": False, "error": "Données manquantes"}), 400
+        
+        # 🚨 CORRECTION 1 : CONVERSION DES ID EN INT ICI 🚨
+        try:
+            employee_id = int(employee_id_str)
+            shift_id = int(shift_id_str)
+        except ValueError:
+            print("ERREUR: Impossible de convertir l'ID en entier.")
+            return jsonify({"success": False, "error": "IDs d'employé ou de service invalides"}), 400
+        
+        # Vérifier que le manager peut assigner cet employé (avec l'ID entier)
+        employee = Employee.query.get(employee_id)
+        if not employee or not employee.can_be_managed_by(current_user):
+            return jsonify({"success": False, "error": "Vous ne pouvez pas assigner cet employé"}), 403
+        
+        start = datetime.fromisoformat(start_str.replace("Z", "+00:00").replace(" ", "+"))
+        end = datetime.fromisoformat(end_str.replace("Z", "+00:00").replace(" ", "+"))
+        
+        conflict = absence_conflict(employee_id, start, end)
+        if conflict:
+            return conflict
+        
+        assignment = Assignment(
+            employee_id=employee_id, # Utiliser l'entier
+            shift_id=shift_id,       # Utiliser l'entier
+            start=start,
+            end=end,
+            notes=notes,
+            created_by=current_user.id
+        )
+        
+        db.session.add(assignment)
+        db.session.flush()
+        assignment_id, after = assignment.id, snapshot(assignment, ASSIGNMENT_FIELDS)
+        db.session.commit()
+        assignment_changed("create", assignment_id, after=after)
+        
+        return jsonify({"success": True})
+        
+    except Exception as e:
+        db.session.rollback()
+        # 🚨 CORRECTION 2 : AJOUTER LE PRINT POUR DIAGNOSTIQUER LES FUTURES ERREURS 🚨
+        print(f"ERREUR CATCHED DANS L'API POST /api/assignments: {e}") 
+        return jsonify({"success": False, "error": "Erreur interne lors de la création (voir logs)"}), 500
+
+@assignments_bp.route("/api/assignments/<int:assignment_id>", methods=["PUT"])
+@login_required
+def update_assignment(assignment_id):
+    if not current_user.is_manager:
+        return jsonify({"success": False, "error": "Accès refusé"}), 403
+    
+    try:
+        assignment = Assignment.query.get_or_404(assignment_id)
+        
+        # Vérifier que le manager peut modifier cette assignation
+        if not assignment.employee.can_be_managed_by(current_user):
+            return jsonify({"success": False, "error": "Vous ne pouvez pas modifier cette assignation"}), 403
+        
+        data = request.get_json()
+        if data.get('version') is None:
+            return version_required()
+        
+        # Modifiée entre-temps par un autre utilisateur : le client reçoit l'état actuel
+        if not version_matches(assignment, data.get('version')):
+            return assignment_conflict(assignment)
+        
+        before = snapshot(assignment, ASSIGNMENT_FIELDS)
+        if 'start' in data:
+            assignment.start = datetime.fromisoformat(data['start'].replace('Z', ''))
+        if 'end' in data:
+            assignment.end = datetime.fromisoformat(data['end'].replace('Z', ''))
+            
+        db.session.flush()
+        after = snapshot(assignment, ASSIGNMENT_FIELDS)
+        db.session.commit()
+        assignment_changed("update", assignment_id, before=before, after=after)
+        
+        return jsonify({"success": True, "assignment": serialize_assignment_state(assignment)})
+    except StaleDataError:
+        # Modification concurrente entre la lecture et l'écriture
+        db.session.rollback()
+        return assignment_conflict(Assignment.query.get_or_404(assignment_id))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": "Erreur lors de la mise à jour"}), 500
+
+@assignments_bp.route("/api/assignments/<int:assignment_id>", methods=["DELETE"])
+@login_required
+def delete_assignment(assignment_id):
+    if not current_user.is_manager:
+        return jsonify({"success": False, "error": "Accès refusé"}), 403
+    
+    try:
+        assignment = Assignment.query.get_or_404(assignment_id)
+        
+        # Vérifier que le manager peut supprimer cette assignation
+        if not assignment.employee.can_be_managed_by(current_user):
+            return jsonify({"success": False, "error": "Vous ne pouvez pas supprimer cette assignation"}), 403
+        
+        before = snapshot(assignment, ASSIGNMENT_FIELDS)
+        db.session.delete(assignment)
+        db.session.commit()
+        assignment_changed("delete", assignment_id, before=before)
+        
+        return jsonify({"success": True})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": "Erreur lors de la suppression"}), 500
+
+@assignments_bp.route("/api/assignments/<int:assignment_id>/duplicate", methods=["POST"])
+@login_required
+def duplicate_assignment(assignment_id):
+    if not current_user.is_manager:
+        return jsonify({"success": False, "error": "Accès refusé"}), 403
+    
+    try:
+        original = Assignment.query.get_or_404(assignment_id)
+        
+        # Vérifier les permissions
+        if not original.employee.can_be_managed_by(current_user):
+            return jsonify({"success": False, "error": "Vous ne pouvez pas dupliquer cette assignation"}), 403
+        
+        # Décaler d'une semaine, sauf si l'employé est absent
+        start = original.start + timedelta(days=7)
+        end = original.end + timedelta(days=7)
+        conflict = absence_conflict(original.employee_id, start, end)
+        if conflict:
+            return conflict
+        
+        # Créer une nouvelle assignation basée sur l'originale
+        duplicate = Assignment(
+            employee_id=original.employee_id,
+            shift_id=original.shift_id,
+            start=start,
+            end=end,
+            notes=original.notes,
+            created_by=current_user.id
+        )
+        
+        db.session.add(duplicate)
+        db.session.flush()
+        # 'before' : l'assignation d'origine
+        before = dict(snapshot(original, ASSIGNMENT_FIELDS), id=assignment_id)
+        duplicate_id, after = duplicate.id, snapshot(duplicate, ASSIGNMENT_FIELDS)
+        db.session.commit()
+        assignment_changed("duplicate", duplicate_id, before=before, after=after)
+        
+        return jsonify({"success": True})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": "Erreur lors de la duplication"}), 500
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""Authentification (inscription, connexion, mot de passe) et paramètres du compte."""
+from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask_login import login_user, logout_user, login_required, current_user
+
+from models import db, User, Employee
+from sharding import establishment_is_deleted, tenant_scope
+
+auth_bp = Blueprint("auth", __name__)
+
+# --- Auth ---
+
+@auth_bp.route("/register", methods=["GET", "POST"])
+def register():
+    if request.method == "POST":
+        username = request.form["username"]
+        email = request.form.get("email", f"{username.lower().replace(' ', '')}@maihlili.com")
+        password = request.form["password"]
+        
+        # Gérer les rôles
+        role = request.form.get("role", "employee")
+        is_manager = (role in ["manager", "admin"])
+        is_admin = (role == "admin")
+
+        if User.query.filter_by(email=email).first():
+            flash("Email déjà utilisé", "error")
+            return render_template("register.html")
+
+        try:
+            # Créer l'utilisateur
+            user = User(username=username, email=email, is_manager=is_manager, is_admin=is_admin)
+            user.set_password(password)
+            db.session.add(user)
+            db.session.flush()
+
+            # Créer automatiquement l'employé associé
+            emp = Employee(full_name=username, user_id=user.id)
+            db.session.add(emp)
+            db.session.commit()
+            
+            flash("Compte créé avec succès", "success")
+            return redirect(url_for("auth.login"))
+            
+        except Exception as e:
+            db.session.rollback()
+            flash("Erreur lors de la création du compte", "error")
+            return render_template("register.html")
+
+    return render_template("register.html")
+
+@auth_bp.route("/login", methods=["GET", "POST"])
+def login():
+    if request.method == "POST":
+        # On peut se connecter avec username OU email
+        identifier = request.form.get("username") or request.form.get("email")
+        password = request.form["password"]
+        
+        # Chercher l'utilisateur par username OU email
+        user = User.query.filter(
+            (User.username == identifier) | (User.email == identifier)
+        ).first()
+            
+        if user and user.check_password(password):
+            # Établissement en cours de suppression : plus aucune connexion
+            if establishment_is_deleted(user.establishment_id):
+                flash("Votre établissement a été supprimé.", "error")
+                return render_template("login.html")
+            
+            # Vérifier si l'employé est actif (lu sur le shard de l'établissement : aucun n'est encore routé)
+            with tenant_scope(user.establishment_id):
+                employee_inactive = user.employee is not None and not user.employee.is_active
+            if employee_inactive:
+                flash("Votre compte a été désactivé. Contactez votre manager.", "error")
+                return render_template("login.html")
+            
+            login_user(user)
+            
+            # Vérifier si c'est le mot de passe par défaut
+            if user.check_password("maihlili123"):
+                return redirect(url_for("auth.force_password_change"))
+            
+            # Rediriger selon le rôle
+            if user.is_manager:
+                return redirect(url_for("dashboard.index"))  # Dashboard manager
+            else:
+                return redirect(url_for("dashboard.employee_dashboard"))  # Dashboard employé
+        
+        flash("Nom d'utilisateur/email ou mot de passe incorrect", "error")
+    
+    return render_template("login.html")
+
+@auth_bp.route("/logout")
+@login_required
+def logout():
+    logout_user()
+    return redirect(url_for("auth.login"))
+
+@auth_bp.route("/force-password-change", methods=["GET", "POST"])
+@login_required
+def force_password_change():
+    """Forcer le changement du mot de passe par défaut"""
+    if request.method == "POST":
+        current_password = request.form["current_password"]
+        new_password = request.form["new_password"]
+        confirm_password = request.form["confirm_password"]
+        
+        # Vérifier le mot de passe actuel
+        if not current_user.check_password(current_password):
+            return render_template("force_password_change.html", error="Mot de passe actuel incorrect")
+        
+        # Vérifier que le nouveau mot de passe n'est pas le défaut
+        if new_password == "maihlili123":
+            return render_template("force_password_change.html", error="Vous devez choisir un nouveau mot de passe différent")
+        
+        # Vérifier la confirmation
+        if new_password != confirm_password:
+            return render_template("force_password_change.html", error="Les mots de passe ne correspondent pas")
+        
+        # Vérifier la longueur minimale
+        if len(new_password) < 6:
+            return render_template("force_password_change.html", error="Le mot de passe doit contenir au moins 6 caractères")
+        
+        try:
+            # Changer le mot de passe
+            current_user.set_password(new_password)
+            db.session.commit()
+            
+            flash("Mot de passe modifié avec succès", "success")
+            
+            # Rediriger selon le rôle
+            if current_user.is_manager:
+                return redirect(url_for("dashboard.index"))
+            else:
+                return redirect(url_for("dashboard.employee_dashboard"))
+        except Exception as e:
+            db.session.rollback()
+            return render_template("force_password_change.html", error="Erreur lors du changement de mot de passe")
+    
+    return render_template("force_password_change.html")
+
+# --- Paramètres ---
+
+@auth_bp.route("/settings", methods=["GET", "POST"])
+@login_required
+def settings():
+    if request.method == "POST":
+        # Gestion changement de mot de passe
+        if 'current_password' in request.form:
+            current_password = request.form["current_password"]
+            new_password = request.form["new_password"]
+            confirm_password = request.form["confirm_password"]
+            
+            # Vérifier le mot de passe actuel
+            if not current_user.check_password(current_password):
+                flash("Mot de passe actuel incorrect", "error")
+                return redirect(url_for("auth.settings"))
+            
+            # Vérifier que les nouveaux mots de passe correspondent
+            if new_password != confirm_password:
+                flash("Les mots de passe ne correspondent pas", "error")
+                return redirect(url_for("auth.settings"))
+            
+            if len(new_password) < 6:
+                flash("Le mot de passe doit contenir au moins 6 caractères", "error")
+                return redirect(url_for("auth.settings"))
+            
+            try:
+                # Changer le mot de passe
+                current_user.set_password(new_password)
+                db.session.commit()
+                flash("Mot de passe changé avec succès", "success")
+            except Exception as e:
+                db.session.rollback()
+                flash("Erreur lors du changement de mot de passe", "error")
+                
+        # Gestion modification profil
+        elif 'username' in request.form:
+            username = request.form.get("username")
+            email = request.form.get("email")
+            
+            if username and username != current_user.username:
+                # Vérifier unicité
+                if User.query.filter_by(username=username).first():
+                    flash("Ce nom d'utilisateur est déjà pris", "error")
+                else:
+                    current_user.username = username
+            
+            if email and email != current_user.email:
+                # Vérifier unicité
+                if User.query.filter_by(email=email).first():
+                    flash("Cet email est déjà utilisé", "error")
+                else:
+                    current_user.email = email
+            
+            try:
+                db.session.commit()
+                flash("Profil mis à jour avec succès", "success")
+            except Exception as e:
+                db.session.rollback()
+                flash("Erreur lors de la mise à jour", "error")
+                
+        return redirect(url_for("auth.settings"))
+    
+    return render_template("settings.html")
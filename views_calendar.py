@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Abonnement calendrier : flux .ics des assignations de chaque employé (voir calendar_feed.py)."""
+from datetime import datetime
+
+from flask import Blueprint, Response, request, jsonify, url_for, abort
+from flask_login import login_required, current_user
+from werkzeug.http import is_resource_modified
+
+from models import db
+from calendar_feed import (generate_calendar_token, token_establishment, get_feed_version, feed_window,
+                           feed_etag, load_feed_assignments, build_calendar)
+from planning_payload import get_shift_catalog
+from db_routing import read_replica
+from sharding import tenant_scope
+
+calendar_bp = Blueprint("calendar", __name__)
+
+
+@calendar_bp.get("/calendar/<token>.ics")
+@read_replica
+def calendar_feed(token):
+    """Flux public (le jeton fait office d'authentification) ; 304 si rien n'a changé."""
+    try:
+        establishment_id = token_establishment(token)
+    except ValueError:
+        abort(404)
+
+    with tenant_scope(establishment_id):
+        version = get_feed_version(token)
+        if version is None:
+            abort(404)
+        window_start, window_end = feed_window()
+        shift_catalog = get_shift_catalog()
+        etag = feed_etag(version, window_start, shift_catalog)
+        headers = {"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"}
+        if not is_resource_modified(request.environ, etag=etag):
+            return Response(status=304, headers=headers)
+
+        assignments = load_feed_assignments(version[0], window_start, window_end)
+
+    body = build_calendar(version[1], assignments, {shift[0]: shift[1] for shift in shift_catalog}, datetime.utcnow())
+    response = Response(body, mimetype="text/calendar", headers=headers)
+    response.headers["Content-Disposition"] = 'inline; filename="planning.ics"'
+    return response
+
+
+def _feed_url(employee):
+    return url_for("calendar.calendar_feed", token=employee.calendar_token, _external=True)
+
+
+@calendar_bp.get("/api/calendar-feed")
+@login_required
+def get_calendar_feed():
+    """URL d'abonnement de l'employé connecté (jeton créé à la première demande)."""
+    employee = current_user.employee
+    if not employee:
+        return jsonify({"success": False, "error": "Aucun profil employé associé à ce compte"}), 404
+
+    try:
+        if not employee.calendar_token:
+            generate_calendar_token(employee)
+            db.session.commit()
+        return jsonify({"success": True, "url": _feed_url(employee)})
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erreur lors de la création du jeton de calendrier: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@calendar_bp.post("/api/calendar-feed/reset")
+@login_required
+def reset_calendar_feed():
+    """Nouveau jeton : l'ancienne URL d'abonnement cesse de fonctionner."""
+    employee = current_user.employee
+    if not employee:
+        return jsonify({"success": False, "error": "Aucun profil employé associé à ce compte"}), 404
+
+    try:
+        generate_calendar_token(employee)
+        db.session.commit()
+        return jsonify({"success": True, "url": _feed_url(employee)})
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erreur lors du renouvellement du jeton de calendrier: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Tableaux de bord manager et employé."""
+from datetime import datetime, timedelta
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask_login import login_required, current_user
+
+from models import db, Shift, Assignment
+from access import get_manageable_employees
+from stats import get_week_stats, get_scope_key, get_current_week_bounds
+
+# Tableau de bord employé : fenêtre "récent" et taille de page
+EMPLOYEE_DASHBOARD_RECENT_DAYS = 30
+EMPLOYEE_DASHBOARD_PER_PAGE = 20
+
+dashboard_bp = Blueprint("dashboard", __name__)
+
+# --- Dashboard Principal ---
+
+@dashboard_bp.route("/")
+@login_required
+def index():
+    if not current_user.is_manager:
+        return redirect(url_for("dashboard.employee_dashboard"))
+    
+    # Statistiques basées sur les employés gérables
+    manageable_employees = get_manageable_employees(current_user)
+    manageable_ids = [emp.id for emp in manageable_employees]
+    
+    total_employees = len(manageable_employees)
+    total_shifts_today = Shift.query.count()
+    
+    # Assignations de cette semaine pour les employés gérables (agrégat SQL partagé)
+    week_start, week_end = get_current_week_bounds()
+    week_stats = get_week_stats(manageable_ids, week_start, week_end, get_scope_key(current_user))
+    
+    total_hours = week_stats['total_hours']
+    conflicts = 0
+    
+    # Ajouter les shifts pour le modal
+    shifts = Shift.query.all()
+    
+    return render_template("index.html", 
+                         total_employees=total_employees,
+                         total_shifts_today=week_stats['assignments_count'],
+                         total_hours=int(total_hours),
+                         conflicts=conflicts,
+                         shifts=shifts)
+
+# --- Dashboard Employé ---
+
+@dashboard_bp.route("/employee-dashboard")
+@login_required
+def employee_dashboard():
+    if current_user.is_manager:
+        return redirect(url_for("dashboard.index"))
+    
+    # Récupérer seulement les assignations de cet employé
+    employee = current_user.employee
+    if not employee:
+        flash("Profil employé non trouvé", "error")
+        return redirect(url_for("auth.login"))
+    
+    now = datetime.now()
+    week_start, week_end = get_current_week_bounds(now)
+    
+    # 1. Statistiques de la semaine : une seule requête agrégée (index employee_id, start)
+    assignments_week, total_hours_week = db.session.query(
+        db.func.count(Assignment.id),
+        db.func.coalesce(db.func.sum(Assignment.duration_hours), 0)
+    ).filter(
+        Assignment.employee_id == employee.id,
+        Assignment.start >= week_start,
+        Assignment.start < week_end
+    ).one()
+    
+    # 2. Prochain shift : ORDER BY start LIMIT 1
+    next_shift = Assignment.query.filter(
+        Assignment.employee_id == employee.id,
+        Assignment.start > now
+    ).order_by(Assignment.start.asc()).first()
+    
+    # 3. Liste paginée des assignations récentes et à venir
+    page = request.args.get("page", 1, type=int)
+    per_page = min(request.args.get("per_page", EMPLOYEE_DASHBOARD_PER_PAGE, type=int), 100)
+    pagination = Assignment.query.filter(
+        Assignment.employee_id == employee.id,
+        Assignment.start >= now - timedelta(days=EMPLOYEE_DASHBOARD_RECENT_DAYS)
+    ).order_by(Assignment.start.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    
+    return render_template("employee_dashboard.html", 
+                         assignments=pagination.items,
+                         pagination=pagination,
+                         employee=employee,
+                         total_hours_week=int(round(total_hours_week, 2)),
+                         assignments_week=assignments_week,
+                         next_shift=next_shift)
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""Employés : liste, création, heures contractuelles et statistiques d'heures."""
+from datetime import datetime
+
+import click
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify, flash
+from flask_login import login_required, current_user
+
+from models import db, User, Employee, Team, refresh_employee_search_text
+from access import get_manageable_employees
+from stats import get_attention_list, get_month_bounds
+from overtime import compute_overtime
+from absences import load_absence_indexes
+from employee_search import search_employees, serialize_search_result, EMPLOYEE_SEARCH_LIMIT
+from db_routing import read_replica
+from audit import record_audit, snapshot, CONTRACT_FIELDS
+from sharding import tenant_scope
+
+# Fenêtres (en mois) proposées pour l'historique des heures
+HOURS_HISTORY_WINDOWS = (6, 12, 24)
+
+employees_bp = Blueprint("employees", __name__, cli_group=None)
+
+# --- CRUD Employés ---
+@employees_bp.route("/employees", methods=["GET", "POST"])
+@login_required
+def show_employees():
+    if not current_user.is_manager:
+        flash("Accès refusé", "error")
+        return redirect(url_for("dashboard.index"))
+        
+    if request.method == "POST":
+        name = request.form["full_name"]
+        position = request.form.get("position")
+        email = request.form.get("email")
+        team_id = request.form.get("team_id")
+        create_account = "create_account" in request.form
+        
+        try:
+            # NOUVEAU : Récupérer les heures contractuelles
+            contract_hours = float(request.form.get("contract_hours", 35.0))
+            contract_type = request.form.get("contract_type", "CDI")
+            
+            # Créer l'employé
+            emp = Employee(
+                full_name=name, 
+                position=position,
+                team_id=int(team_id) if team_id else None,
+                contract_hours_per_week=contract_hours,
+                contract_type=contract_type
+            )
+            emp.update_contract_hours(contract_hours)
+            
+            # Créer un compte utilisateur si demandé et email fourni
+            if create_account and email:
+                # Vérifier que l'email n'existe pas
+                if User.query.filter_by(email=email).first():
+                    flash("Un compte avec cet email existe déjà", "error")
+                    return redirect(url_for("employees.show_employees"))
+                
+                # Créer le nom d'utilisateur
+                username = name.lower().replace(' ', '.').replace('é', 'e').replace('è', 'e').replace('à', 'a')
+                counter = 1
+                original_username = username
+                
+                while User.query.filter_by(username=username).first():
+                    username = f"{original_username}{counter}"
+                    counter += 1
+                
+                # Créer l'utilisateur
+                user = User(
+                    username=username,
+                    email=email,
+                    is_manager=False,
+                    is_admin=False
+                )
+                user.set_password("maihlili123")
+                db.session.add(user)
+                db.session.flush()
+                emp.user_id = user.id
+                
+                flash(f"Employé créé avec compte utilisateur (nom d'utilisateur: {username})", "success")
+            else:
+                flash("Employé créé avec succès", "success")
+            
+            db.session.add(emp)
+            db.session.flush()
+            employee_id, after = emp.id, snapshot(emp, CONTRACT_FIELDS)
+            db.session.commit()
+            record_audit("create", "contract", employee_id, after=after)
+            
+            return redirect(url_for("employees.show_employees"))
+            
+        except Exception as e:
+            db.session.rollback()
+            flash("Erreur lors de la création de l'employé", "error")
+            return redirect(url_for("employees.show_employees"))
+    
+    # GET: Afficher seulement les employés gérables
+    employees = get_manageable_employees(current_user)
+    
+    # Absences du mois chargées en une requête pour tous les employés
+    now = datetime.now()
+    absence_indexes = load_absence_indexes([e.id for e in employees], *get_month_bounds(now.year, now.month))
+    
+    # Ajouter des attributs pour l'affichage
+    for e in employees:
+        e.avatar = 'USER'
+        e.role = e.position or 'Employe'
+        e.status = 'active' if e.is_active else 'absent'
+        e.hours_summary = e.get_hours_difference_for_month(now.year, now.month, absence_indexes[e.id])
+        
+    # Équipes disponibles pour ce manager
+    teams = []
+    if current_user.is_admin:
+        teams = Team.query.all()
+    elif current_user.employee:
+        teams = Team.query.filter_by(manager_id=current_user.employee.id).all()
+    else:
+        teams = []
+    
+    return render_template("employees.html", employees=employees, teams=teams)
+
+# ========== NOUVELLES ROUTES POUR LES HEURES CONTRACTUELLES ==========
+
+@employees_bp.route("/employees/<int:employee_id>/hours")
+@read_replica
+@login_required
+def employee_hours_detail(employee_id):
+    if not current_user.is_manager:
+        flash("Accès refusé", "error")
+        return redirect(url_for("dashboard.index"))
+    
+    employee = Employee.query.get_or_404(employee_id)
+    
+    # Vérifier que le manager peut voir cet employé
+    if not employee.can_be_managed_by(current_user):
+        flash("Vous ne pouvez pas consulter cet employé", "error")
+        return redirect(url_for("employees.show_employees"))
+    
+    # Fenêtre d'historique : 6, 12 ou 24 mois
+    months = request.args.get("months", 6, type=int)
+    if months not in HOURS_HISTORY_WINDOWS:
+        months = 6
+    
+    months_history = employee.get_monthly_hours_history(months)
+    current_month = employee.current_month_hours_summary
+    
+    # Majorations hebdomadaires du mois en cours (heures sup. / complémentaires)
+    now = datetime.now()
+    overtime = compute_overtime([employee.id], now.year, now.month)[employee.id]
+    
+    return render_template("employee_hours_detail.html",
+                         employee=employee,
+                         months=months,
+                         months_history=months_history,
+                         overtime=overtime,
+                         current_month=current_month)
+
+@employees_bp.route("/api/employees/<int:employee_id>/contract", methods=["PUT"])
+@login_required
+def update_employee_contract(employee_id):
+    if not current_user.is_manager:
+        return jsonify({"success": False, "error": "Accès refusé"}), 403
+    
+    employee = Employee.query.get_or_404(employee_id)
+    
+    if not employee.can_be_managed_by(current_user):
+        return jsonify({"success": False, "error": "Non autorisé"}), 403
+    
+    try:
+        data = request.get_json()
+        hours_per_week = float(data.get("hours_per_week", employee.contract_hours_per_week))
+        contract_type = data.get("contract_type", employee.contract_type)
+        
+        before = snapshot(employee, CONTRACT_FIELDS)
+        employee.contract_hours_per_week = hours_per_week
+        employee.contract_type = contract_type
+        employee.update_contract_hours(hours_per_week)
+        
+        after = snapshot(employee, CONTRACT_FIELDS)
+        db.session.commit()
+        record_audit("update", "contract", employee_id, before=before, after=after)
+        return jsonify({"success": True})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@employees_bp.route("/api/employees/search")
+@read_replica
+@login_required
+def search_employees_api():
+    """Recherche à la frappe : ?q=hel&limit=20 (&unassigned=1 : employés sans équipe)."""
+    if not current_user.is_manager:
+        return jsonify({"success": False, "error": "Accès refusé"}), 403
+    
+    employees = search_employees(
+        current_user,
+        request.args.get("q", ""),
+        limit=request.args.get("limit", EMPLOYEE_SEARCH_LIMIT, type=int),
+        unassigned=request.args.get("unassigned") == "1"
+    )
+    return jsonify({"success": True, "employees": [serialize_search_result(row) for row in employees]})
+
+@employees_bp.cli.command("reindex-employee-search")
+@click.option("--establishment-id", type=int, default=None)
+def reindex_employee_search_command(establishment_id):
+    """Recalcule le texte de recherche de tous les employés (après ajout de la colonne ou import en bloc)."""
+    with tenant_scope(establishment_id):
+        criteria = [Employee.establishment_id == establishment_id] if establishment_id else []
+        count = refresh_employee_search_text(*criteria)
+        db.session.commit()
+    click.echo(f"Texte de recherche recalculé pour {count} employé(s)")
+
+@employees_bp.route("/api/hours-stats")
+@read_replica
+@login_required
+def get_hours_stats():
+    if not current_user.is_manager:
+        return jsonify({"error": "Accès refusé"}), 403
+    
+    manageable_employees = get_manageable_employees(current_user)
+    now = datetime.now()
+    absence_indexes = load_absence_indexes([emp.id for emp in manageable_employees],
+                                           *get_month_bounds(now.year, now.month))
+    
+    total_over_hours = 0
+    total_absence_hours = 0
+    total_under_hours = 0
+    employees_over = 0
+    employees_under = 0
+    
+    for emp in manageable_employees:
+        hours_data = emp.get_hours_difference_for_month(now.year, now.month, absence_indexes[emp.id])
+        diff = hours_data['difference']
+        total_absence_hours += hours_data['absence_hours']
+        
+        if diff > 0:
+            total_over_hours += diff
+            employees_over += 1
+        elif diff < 0:
+            total_under_hours += abs(diff)
+            employees_under += 1
+    
+    return jsonify({
+        "total_over_hours": round(total_over_hours, 2),
+        "total_under_hours": round(total_under_hours, 2),
+        "total_absence_hours": round(total_absence_hours, 2),
+        "employees_over": employees_over,
+        "employees_under": employees_under,
+        "total_employees": len(manageable_employees)
+    })
+
+@employees_bp.route("/api/employees-attention")
+@read_replica
+@login_required
+def get_attention_employees():
+    if not current_user.is_manager:
+        return jsonify({"error": "Accès refusé"}), 403
+    
+    # Paramètres : seuil d'écart (heures), top K et page
+    threshold = request.args.get("threshold", 10, type=float)
+    limit = max(1, min(request.args.get("limit", 20, type=int), 100))
+    page = max(1, request.args.get("page", 1, type=int))
+    
+    manageable_ids = [emp.id for emp in get_manageable_employees(current_user)]
+    now = datetime.now()
+    
+    attention_list = get_attention_list(
+        manageable_ids, now.year, now.month,
+        threshold=threshold, limit=limit, offset=(page - 1) * limit
+    )
+    return jsonify(attention_list)
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""Exports (CSV, bulletins, paie, écarts) et commande 'flask generate-payslips'.
+
+ReportLab et les formats de paie sont importés dans les vues qui les utilisent : ils ne
+pèsent pas sur le démarrage des workers.
+"""
+import click
+from datetime import datetime
+
+from flask import Blueprint, request, redirect, url_for, jsonify, flash, Response, stream_with_context
+from flask_login import login_required, current_user
+
+from models import Employee, Assignment
+from access import get_manageable_employees
+from stats import get_month_bounds
+from reports import iter_variance_rows, VARIANCE_COLUMNS
+from overtime import compute_overtime, SOURCES as OVERTIME_SOURCES
+from db_routing import read_replica
+from sharding import tenant_scope
+
+exports_bp = Blueprint("exports", __name__, cli_group=None)
+
+# --- Export CSV ---
+
+@exports_bp.route("/export/week")
+@read_replica
+@login_required
+def export_week():
+    if not current_user.is_manager:
+        flash("Accès refusé", "error")
+        return redirect(url_for("dashboard.index"))
+        
+    import csv
+    from io import StringIO
+    
+    # Exporter seulement les assignations des employés gérables
+    manageable_employees = get_manageable_employees(current_user)
+    manageable_ids = [emp.id for emp in manageable_employees]
+    
+    if manageable_ids:
+        assignments = Assignment.query.filter(Assignment.employee_id.in_(manageable_ids)).all()
+    else:
+        assignments = []
+    
+    si = StringIO()
+    writer = csv.writer(si)
+    writer.writerow(["Employee", "Shift", "Start", "End", "Duration"])
+    
+    for a in assignments:
+        duration = a.end - a.start
+        writer.writerow([
+            a.employee.full_name, 
+            a.shift.name, 
+            a.start.strftime('%d/%m/%Y %H:%M'), 
+            a.end.strftime('%d/%m/%Y %H:%M'),
+            f"{duration.total_seconds() / 3600:.1f}h"
+        ])
+    
+    si.seek(0)
+    return si.getvalue(), 200, {
+        'Content-Type': 'text/csv', 
+        'Content-Disposition': 'attachment; filename="planning_maihlili_spv.csv"'
+    }
+
+# --- Heures supplémentaires / complémentaires ---
+
+def _overtime_params():
+    now = datetime.now()
+    year = request.args.get("year", now.year, type=int)
+    month = request.args.get("month", now.month, type=int)
+    if not 1 <= month <= 12:
+        month = now.month
+    source = request.args.get("source", "planned")
+    if source not in OVERTIME_SOURCES:
+        source = "planned"
+    return year, month, source
+
+@exports_bp.route("/api/overtime")
+@read_replica
+@login_required
+def api_overtime():
+    if not current_user.is_manager:
+        return jsonify({"error": "Accès refusé"}), 403
+    
+    year, month, source = _overtime_params()
+    manageable_employees = get_manageable_employees(current_user)
+    results = compute_overtime([emp.id for emp in manageable_employees], year, month, source)
+    
+    return jsonify({
+        "year": year,
+        "month": month,
+        "source": source,
+        "employees": [
+            {"id": emp.id, "name": emp.full_name, **results[emp.id]}
+            for emp in manageable_employees
+        ]
+    })
+
+@exports_bp.route("/export/overtime")
+@read_replica
+@login_required
+def export_overtime():
+    if not current_user.is_manager:
+        flash("Accès refusé", "error")
+        return redirect(url_for("dashboard.index"))
+    
+    import csv
+    from io import StringIO
+    
+    year, month, source = _overtime_params()
+    manageable_employees = get_manageable_employees(current_user)
+    results = compute_overtime([emp.id for emp in manageable_employees], year, month, source)
+    
+    si = StringIO()
+    writer = csv.writer(si)
+    writer.writerow(["Employee", "Week", "Total", "Normales", "Sup. 25%", "Sup. 50%", "Compl. 10%", "Compl. 25%"])
+    
+    for emp in manageable_employees:
+        for week in results[emp.id]['weeks']:
+            writer.writerow([
+                emp.full_name,
+                f"{week['iso_year']}-W{week['iso_week']:02d}",
+                week['total'],
+                week['regular'],
+                week['overtime_25'],
+                week['overtime_50'],
+                week['complementary_10'],
+                week['complementary_25']
+            ])
+    
+    si.seek(0)
+    return si.getvalue(), 200, {
+        'Content-Type': 'text/csv',
+        'Content-Disposition': f'attachment; filename="heures_sup_maihlili_{year}{month:02d}.csv"'
+    }
+
+# --- Bulletins de salaire (ZIP) ---
+
+@exports_bp.route("/export/payslips")
+@read_replica
+@login_required
+def export_payslips():
+    if not current_user.is_manager:
+        flash("Accès refusé", "error")
+        return redirect(url_for("dashboard.index"))
+    
+    from payslips import build_payslips, iter_payslips_zip
+
+    year, month, _ = _overtime_params()
+    # Les données sont lues ici ; le rendu PDF et le ZIP sont produits pendant l'envoi de la réponse
+    payslips = build_payslips(get_manageable_employees(current_user), year, month)
+    
+    return Response(iter_payslips_zip(payslips), 200, {
+        'Content-Type': 'application/zip',
+        'Content-Disposition': f'attachment; filename="bulletins_maihlili_{year}{month:02d}.zip"'
+    })
+
+@exports_bp.cli.command("generate-payslips")
+@click.argument("year", type=int)
+@click.argument("month", type=int)
+@click.option("--output", default=None, help="Chemin du fichier ZIP produit")
+@click.option("--establishment-id", type=int, default=None)
+def generate_payslips_command(year, month, output, establishment_id):
+    """Génère les bulletins d'une période dans un fichier ZIP (traitement hors requête)."""
+    from payslips import build_payslips, write_payslips_zip
+
+    # Hors requête : le shard est celui de l'établissement demandé (base centrale sinon)
+    with tenant_scope(establishment_id):
+        query = Employee.query.filter_by(is_active=True)
+        if establishment_id:
+            query = query.filter_by(establishment_id=establishment_id)
+        payslips = build_payslips(query.all(), year, month)
+    
+    output = output or f"bulletins_maihlili_{year}{month:02d}.zip"
+    with open(output, "wb") as f:
+        write_payslips_zip(payslips, f)
+    click.echo(f"{len(payslips)} bulletins écrits dans {output}")
+
+# --- Export de paie (prestataire) ---
+
+@exports_bp.route("/export/payroll")
+@read_replica
+@login_required
+def export_payroll():
+    if not current_user.is_manager:
+        flash("Accès refusé", "error")
+        return redirect(url_for("dashboard.index"))
+    
+    year, month, _ = _overtime_params()
+    from payroll_export import PAYROLL_LAYOUTS, iter_payroll_rows, iter_payroll_export
+
+    layout_name = request.args.get("layout", "csv")
+    if layout_name not in PAYROLL_LAYOUTS:
+        return jsonify({"error": f"Format inconnu : {layout_name}"}), 400
+    layout = PAYROLL_LAYOUTS[layout_name]()
+    
+    # Les admins exportent par établissement sans charger la liste complète des employés
+    employee_ids = None if current_user.is_admin else [emp.id for emp in get_manageable_employees(current_user)]
+    establishment_id = request.args.get("establishment_id", type=int)
+    rows = iter_payroll_rows(year, month, employee_ids=employee_ids, establishment_id=establishment_id)
+    
+    filename = f"paie_maihlili_{year}{month:02d}.{layout.extension}"
+    return Response(stream_with_context(iter_payroll_export(layout, rows)), 200, {
+        'Content-Type': f'{layout.content_type}; charset=utf-8',
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    })
+
+# --- Rapport d'écarts planifié / réalisé ---
+
+def _variance_report_params():
+    """Période (mois) et périmètre communs au rapport JSON et à l'export CSV."""
+    now = datetime.now()
+    year = request.args.get("year", now.year, type=int)
+    month = request.args.get("month", now.month, type=int)
+    if not 1 <= month <= 12:
+        month = now.month
+    period_start, period_end = get_month_bounds(year, month)
+    manageable_ids = [emp.id for emp in get_manageable_employees(current_user)]
+    establishment_id = request.args.get("establishment_id", type=int)
+    return manageable_ids, period_start, period_end, establishment_id
+
+@exports_bp.route("/api/reports/variance")
+@read_replica
+@login_required
+def api_variance_report():
+    if not current_user.is_manager:
+        return jsonify({"error": "Accès refusé"}), 403
+    
+    manageable_ids, period_start, period_end, establishment_id = _variance_report_params()
+    rows = list(iter_variance_rows(manageable_ids, period_start, period_end, establishment_id))
+    
+    return jsonify({
+        "start": period_start.date().isoformat(),
+        "end": period_end.date().isoformat(),
+        "rows": rows
+    })
+
+@exports_bp.route("/export/variance")
+@read_replica
+@login_required
+def export_variance():
+    if not current_user.is_manager:
+        flash("Accès refusé", "error")
+        return redirect(url_for("dashboard.index"))
+    
+    import csv
+    from io import StringIO
+    
+    manageable_ids, period_start, period_end, establishment_id = _variance_report_params()
+    
+    def generate():
+        # Écriture ligne par ligne : le fichier n'est jamais entièrement en mémoire
+        si = StringIO()
+        writer = csv.DictWriter(si, fieldnames=VARIANCE_COLUMNS)
+        writer.writeheader()
+        for row in iter_variance_rows(manageable_ids, period_start, period_end, establishment_id):
+            writer.writerow(row)
+            yield si.getvalue()
+            si.seek(0)
+            si.truncate(0)
+        yield si.getvalue()
+    
+    filename = f"ecarts_maihlili_{period_start.strftime('%Y%m')}.csv"
+    return Response(stream_with_context(generate()), 200, {
+        'Content-Type': 'text/csv',
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    })
@@ -0,0 +1,549 @@
+# -*- coding: utf-8 -*-
+"""Planning : calendrier, vue Gantt, statistiques, export PDF et déplacement d'assignations."""
+import os
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, jsonify
+from flask_login import login_required, current_user
+from sqlalchemy.orm.exc import StaleDataError
+
+from models import db, Assignment
+from access import get_manageable_employees
+from stats import get_week_stats, get_scope_key, get_current_week_bounds
+from absences import load_absence_indexes, get_absence_version, serialize_absence
+from planning_payload import get_planning_etag, not_modified, json_response, build_compact_payload, get_cached_payload
+from db_routing import read_replica
+from audit import snapshot, ASSIGNMENT_FIELDS
+from views_assignments import (serialize_assignment_state, version_matches, version_required, assignment_conflict,
+                               absence_conflict,
+                               assignment_changed)
+
+# Vue Gantt : fenêtres en semaines et durée maximale d'une fenêtre explicite
+GANTT_WEEK_RANGES = {"week": 1, "2weeks": 2}
+GANTT_MAX_RANGE_DAYS = 100
+
+planning_bp = Blueprint("planning", __name__)
+
+# --- NOUVELLE FONCTION HELPER POUR LA RÉCUPÉRATION DES DONNÉES DE PLANNING ---
+def resolve_gantt_range(start_date, range_name="week", end_date=None):
+    """Bornes [début, fin[ d'une fenêtre de planning : semaine(s), mois, trimestre ou dates explicites."""
+    if end_date:
+        return start_date, min(end_date, start_date + timedelta(days=GANTT_MAX_RANGE_DAYS))
+    if range_name == "month":
+        range_start = start_date.replace(day=1)
+        return range_start, (range_start + timedelta(days=32)).replace(day=1)
+    if range_name == "quarter":
+        range_start = start_date.replace(month=(start_date.month - 1) // 3 * 3 + 1, day=1)
+        range_end = range_start
+        for _ in range(3):
+            range_end = (range_end + timedelta(days=32)).replace(day=1)
+        return range_start, range_end
+    # Calculer le début de la semaine (Lundi)
+    range_start = start_date - timedelta(days=start_date.weekday())
+    return range_start, range_start + timedelta(days=7 * GANTT_WEEK_RANGES.get(range_name, 1))
+
+def absence_window(range_start, range_end):
+    """Bornes de fenêtre (dates) en datetimes, comparables aux bornes des absences."""
+    return (datetime.combine(range_start, datetime.min.time()),
+            datetime.combine(range_end, datetime.min.time()))
+
+def get_gantt_data_for_range(range_start, range_end, user, manageable_employees=None):
+    """Récupère les données d'employés et d'assignations pour une fenêtre [range_start, range_end[."""
+    if manageable_employees is None:
+        manageable_employees = get_manageable_employees(user)
+    manageable_ids = [emp.id for emp in manageable_employees]
+    
+    if manageable_ids:
+        assignments_db = Assignment.query.filter(
+            Assignment.employee_id.in_(manageable_ids),
+            Assignment.start >= range_start,
+            Assignment.start < range_end
+        ).all()
+    else:
+        assignments_db = []
+    absence_indexes = load_absence_indexes(manageable_ids, *absence_window(range_start, range_end))
+
+    # Formatage pour le frontend (et potentiellement le PDF)
+    assignments_data = []
+    for a in assignments_db:
+        shift_color = a.shift.color if a.shift and a.shift.color else '#888888'
+        assignments_data.append({
+            'id': a.id,
+            'employee_id': a.employee_id,
+            'shift_name': a.shift.name if a.shift else 'N/A',
+            'shift_color': shift_color,
+            'start': a.start, # Format datetime.datetime
+            'end': a.end,     # Format datetime.datetime
+            'start_time': a.start.strftime('%H:%M'),
+            'end_time': a.end.strftime('%H:%M'),
+            'version': a.version,
+            # Planifiée pendant une absence approuvée (saisie après coup)
+            'absent': absence_indexes[a.employee_id].find(a.start, a.end) is not None,
+        })
+
+    return {
+        'employees': [{'id': emp.id, 'name': emp.full_name} for emp in manageable_employees],
+        'assignments': assignments_data,
+        'absences': [serialize_absence(absence) for index in absence_indexes.values() for absence in index.absences],
+        'range_start': range_start,
+        'range_end': range_end
+    }
+
+def get_gantt_data_for_week(start_date, user, manageable_employees=None):
+    """Récupère les données d'employés et d'assignations pour une semaine donnée."""
+    week_start, week_end = resolve_gantt_range(start_date, "week")
+    data = get_gantt_data_for_range(week_start, week_end, user, manageable_employees)
+    data['week_start'], data['week_end'] = week_start, week_end
+    return data
+
+# --- API Événements --- CORRIGÉ
+
+@planning_bp.get("/api/assignments/events")  # Route corrigée
+@read_replica
+@login_required
+def api_events():
+    start_str = request.args.get("start")
+    end_str = request.args.get("end")
+    compact = request.args.get("format") == "compact"
+    
+    if current_user.is_manager:
+        # Manager : voir les assignations de ses employés
+        employees = get_manageable_employees(current_user)
+        if not employees:
+            return jsonify([])
+    else:
+        # Employé : voir seulement ses assignations
+        emp = current_user.employee
+        if not emp:
+            return jsonify([])
+        employees = [emp]
+    
+    criteria = [Assignment.employee_id.in_([e.id for e in employees])]
+    if start_str:
+        criteria.append(Assignment.end >= datetime.fromisoformat(start_str.replace("Z", "+00:00").replace(" ", "+")))
+    if end_str:
+        criteria.append(Assignment.start <= datetime.fromisoformat(end_str.replace("Z", "+00:00").replace(" ", "+")))
+    
+    # 304 si la version des données n'a pas changé (aucune assignation chargée)
+    etag = get_planning_etag(employees, criteria, f"events:{start_str}:{end_str}:{compact}")
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    if compact:
+        return json_response(build_compact_payload(employees, criteria), etag)
+    
+    q = Assignment.query.filter(*criteria)
+    events = [
+    {
+        "id": a.id,
+            "title": f"{a.employee.full_name} - {a.shift.name}" if a.shift else f"{a.employee.full_name} - Shift",
+            "start": a.start.isoformat(),
+            "end": a.end.isoformat(),
+            "allDay": False,
+            "color": a.shift.color if a.shift else '#888888',
+            "extendedProps": {
+                "employee_name": a.employee.full_name,
+                "shift_name": a.shift.name if a.shift else 'N/A',
+                "version": a.version
+            }
+    }
+    for a in q.all()
+]
+
+    return json_response(events, etag)
+    
+
+# --- Route pour afficher le planning ---
+@planning_bp.route("/planning")
+@login_required
+def planning():
+    """Vue principale du planning avec calendrier et Gantt"""
+    if not current_user.is_manager:
+        return redirect(url_for("dashboard.employee_dashboard"))
+    
+    return render_template("planning.html")
+
+
+# --- API pour les données Gantt ---
+@planning_bp.get("/api/gantt-data")
+@read_replica
+@login_required
+def api_gantt_data():
+    """Récupère les données pour afficher la vue Gantt"""
+    start_str = request.args.get("start")
+    
+    # Déterminer la date de début pour le helper
+    if not start_str:
+        start_date = datetime.now().date()
+    else:
+        # Assurez-vous d'avoir une date simple pour le calcul du Lundi
+        start_date = datetime.fromisoformat(start_str).date()
+    
+    # Fenêtre : week (défaut), 2weeks, month, quarter, ou 'end' explicite
+    end_str = request.args.get("end")
+    end_date = datetime.fromisoformat(end_str).date() if end_str else None
+    range_start, range_end = resolve_gantt_range(start_date, request.args.get("range", "week"), end_date)
+    
+    manageable_employees = get_manageable_employees(current_user)
+    manageable_ids = [emp.id for emp in manageable_employees]
+    criteria = [
+        Assignment.employee_id.in_(manageable_ids),
+        Assignment.start >= range_start,
+        Assignment.start < range_end
+    ]
+    
+    # 304 si la fenêtre n'a pas changé depuis le dernier chargement (assignations et absences)
+    compact = request.args.get("format") == "compact"
+    window = absence_window(range_start, range_end)
+    absence_version = get_absence_version(manageable_ids, *window)
+    etag = get_planning_etag(manageable_employees, criteria,
+                             f"gantt:{range_start}:{range_end}:{compact}:{absence_version}")
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    if compact:
+        # Les fenêtres récentes sont gardées en mémoire (clé = ETag, donc invalidées par toute modification)
+        payload = get_cached_payload(etag, lambda: {
+            **build_compact_payload(manageable_employees, criteria,
+                                    load_absence_indexes(manageable_ids, *window)),
+            "start": range_start.isoformat(),
+            "end": range_end.isoformat()
+        })
+        return json_response(payload, etag)
+    
+    # Utiliser le helper
+    data = get_gantt_data_for_range(range_start, range_end, current_user, manageable_employees)
+
+    # Convertir les objets datetime en ISO string pour JSON
+    assignments_json = [
+        {
+            **a, 
+            'start': a['start'].isoformat(), 
+            'end': a['end'].isoformat()
+        } for a in data['assignments']
+    ]
+    
+    return json_response({
+        "employees": data['employees'],
+        "assignments": assignments_json,
+        "absences": data['absences'],
+        "start": data['range_start'].isoformat(),
+        "end": data['range_end'].isoformat()
+    }, etag)
+
+
+# --- API pour les statistiques du planning ---
+@planning_bp.get("/api/planning-stats")
+@read_replica
+@login_required
+def api_planning_stats():
+    """Récupère les statistiques du planning"""
+    
+    manageable_employees = get_manageable_employees(current_user)
+    manageable_ids = [emp.id for emp in manageable_employees]
+    
+    week_start, week_end = get_current_week_bounds()
+    week_stats = get_week_stats(manageable_ids, week_start, week_end, get_scope_key(current_user))
+    
+    employees_covered = week_stats['employees_covered']
+    
+    # Conformité (% employés ayant des assignations)
+    compliance = int((employees_covered / len(manageable_employees) * 100) if manageable_employees else 0)
+    
+    return jsonify({
+        "assignments_week": week_stats['assignments_count'],
+        "total_hours": round(week_stats['total_hours'], 2),
+        "employees_covered": employees_covered,
+        "compliance": compliance
+    })
+
+
+# --- NOUVELLE ROUTE POUR L'EXPORT PDF (REMPLACE LE PLACEHOLDER) ---
+@planning_bp.route('/api/export-gantt-pdf', methods=['GET'])
+@read_replica
+@login_required
+def export_gantt_pdf():
+    if not current_user.is_manager:
+        return jsonify({'error': 'Accès refusé'}), 403
+
+    # ReportLab n'est chargé qu'au premier export PDF (démarrage des workers plus rapide)
+    from io import BytesIO
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+
+    # --- 1. Fonction HELPER pour déterminer la couleur du texte (CORRIGÉE) ---
+    def get_text_color_name(hex_color_str):
+        """Détermine si le texte doit être blanc ou noir en fonction de la couleur de fond."""
+        try:
+            color_obj = colors.HexColor(hex_color_str)
+        except: 
+            color_obj = colors.HexColor('#888888') 
+            
+        r, g, b = color_obj.red, color_obj.green, color_obj.blue
+        brightness = (r * 0.299 + g * 0.587 + b * 0.114)
+        return "white" if brightness < 0.5 else "black"
+
+    # --- 2. Préparation des dates et récupération des données ---
+    start_date_str = request.args.get('start')
+    if start_date_str:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+    else:
+        today = datetime.now().date()
+        start_date = today - timedelta(days=today.weekday())
+
+    try:
+        # Assurez-vous que cette fonction est correctement importée ou définie.
+        data = get_gantt_data_for_week(start_date, current_user)
+        employees = data['employees']
+        assignments = data['assignments']
+    except NameError:
+        return jsonify({'error': 'La fonction get_gantt_data_for_week est introuvable.'}), 500
+    
+    week_start = data['week_start']
+    week_end = week_start + timedelta(days=6) # 6 jours après le début de semaine
+
+    # --- 3. Préparation du PDF ---
+    buffer = BytesIO()
+    # Format Paysage (A4[1], A4[0])
+    doc = SimpleDocTemplate(buffer, pagesize=(A4[1], A4[0]), leftMargin=30, rightMargin=30, topMargin=30, bottomMargin=30)
+    styles = getSampleStyleSheet()
+    story = []
+
+    # Définition des couleurs ReportLab
+    MAIHLILI_TITRES_BLEU = colors.HexColor('#3055FF') 
+    MAIHLILI_BLANC = colors.white
+    MAIHLILI_FOND_TABLE = colors.HexColor('#F8F8F8') 
+
+    # --- 4. En-tête (Logo et Titre) ---
+    logo_path = os.path.join(current_app.root_path, 'static', 'images', 'maihlili-logo-light.png') 
+    
+    logo_element = Spacer(1, 1) 
+    if os.path.exists(logo_path):
+        # Logo non étiré, taille fixée
+        logo_element = Image(logo_path, width=70, height=35) 
+        logo_element.hAlign = 'LEFT'
+        
+    title_text = f"""
+    <font size='18' color='{MAIHLILI_TITRES_BLEU}'><b>PLANNING HEBDOMADAIRE</b></font><br/>
+    <font size='10' color='#555555'>Du {week_start.strftime('%d/%m/%Y')} au {week_end.strftime('%d/%m/%Y')}</font>
+    """
+    title_element = Paragraph(title_text, styles['Normal'])
+    title_element.alignment = 1 # Center
+
+    header_table = Table([[logo_element, title_element, Spacer(1, 1)]], colWidths=[70, doc.width - 140, 70])
+    header_table.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
+    ]))
+    story.append(header_table)
+    story.append(Spacer(1, 18)) 
+
+    # --- 5. Préparation des données du tableau ---
+    days_full = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
+    
+    # En-tête du planning
+    header_content = [Paragraph("<b>Employé</b><br/><font size='7'>Poste</font>", styles['Normal'])]
+    for i in range(7):
+        current_date = week_start + timedelta(days=i)
+        header_text = f"<b>{days_full[i]}</b><br/><font size='8'>{current_date.strftime('%d/%m')}</font>"
+        p = Paragraph(header_text, styles['Normal'])
+        p.alignment = 1 
+        header_content.append(p)
+    
+    table_data = [header_content]
+
+    # Structure pour regrouper les assignations par employé et par jour
+    assignments_by_employee_and_day = {emp['id']: {i: [] for i in range(7)} for emp in employees}
+    
+    for a in assignments:
+        day_of_week_index = a['start'].weekday()
+        employee_id = a['employee_id']
+        
+        content_str = f"<b>{a['shift_name']}</b><br/>{a['start_time']}-{a['end_time']}"
+        color_hex = a['shift_color']
+        
+        assignments_by_employee_and_day[employee_id][day_of_week_index].append((content_str, color_hex))
+
+    # Absences approuvées : libellé affiché dans les jours sans service
+    absence_labels = {}
+    for absence in data['absences']:
+        if not absence['approved']:
+            continue
+        for i in range(7):
+            day_start = datetime.combine(week_start + timedelta(days=i), datetime.min.time())
+            if absence['start'] < (day_start + timedelta(days=1)).isoformat() and absence['end'] > day_start.isoformat():
+                absence_labels[(absence['employee_id'], i)] = absence['label']
+
+    # Remplissage des lignes du tableau (Gantt)
+    for emp_index, emp in enumerate(employees):
+        emp_name_text = f"<b>{emp['name']}</b><br/><font size='7' color='#555555'>{emp.get('position', 'Employé')}</font>"
+        row = [Paragraph(emp_name_text, styles['Normal'])]
+        
+        emp_assignments = assignments_by_employee_and_day.get(emp['id'], {i: [] for i in range(7)})
+        
+        for i in range(7):
+            shifts = emp_assignments[i]
+            cell_content_html = []
+            
+            if shifts:
+                for content_str, color_hex in shifts:
+                    # Détermine si le texte doit être 'white' ou 'black' (chaîne)
+                    text_color_name = get_text_color_name(color_hex)
+                    
+                    # CORRECTION MAJEURE: Obtient l'objet couleur (colors.white/colors.black)
+                    text_color_obj = getattr(colors, text_color_name) 
+                    
+                    # CRÉATION DU STYLE STABLE: Utilise .clone()
+                    p_style = styles['BodyText'].clone('ShiftBlockStyle') 
+                    
+                    # Appliquer les styles pour le rendu Gantt (Rectangle plein)
+                    p_style.alignment = 1
+                    p_style.textColor = text_color_obj
+                    p_style.backColor = colors.HexColor(color_hex)
+                    p_style.fontSize = 8
+                    p_style.fontName = 'Helvetica'
+                    p_style.borderPadding = 3 
+                    p_style.borderRadius = 3 
+                    
+                    markup = f'{content_str}' # Ligne à l'origine du problème d'indentation
+                    
+                    shift_p = Paragraph(markup, p_style)
+                    cell_content_html.append(shift_p)
+                
+                # Ajout des objets Paragraphs (les shifts) à la cellule
+                row.append(cell_content_html)
+            else:
+                # Créer un Paragraph vide pour les cellules sans shift (ou le type d'absence)
+                label = absence_labels.get((emp['id'], i))
+                empty_p = Paragraph(f"<font size='7' color='#777777'><i>{label}</i></font>" if label else '',
+                                    styles['BodyText'].clone('EmptyCell'))
+                empty_p.alignment = 1
+                row.append(empty_p) 
+        
+        table_data.append(row)
+
+
+    # --- 6. Création et style du tableau ---
+    page_width = doc.width 
+    col_widths = [page_width * 0.18] + [ (page_width * 0.82) / 7 ] * 7 
+    
+    table = Table(table_data, colWidths=col_widths)
+    
+    table.setStyle(TableStyle([
+        # En-tête
+        ('BACKGROUND', (0, 0), (-1, 0), MAIHLILI_TITRES_BLEU), 
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+        
+        # Corps du tableau (Lignes alternées)
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [MAIHLILI_FOND_TABLE, MAIHLILI_BLANC]), 
+
+        # Alignements et bordures
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'), 
+        ('VALIGN', (0, 1), (-1, -1), 'TOP'), 
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#DDDDDD')), 
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        
+        # Paddings généraux
+        ('LEFTPADDING', (0, 1), (0, -1), 8), 
+        ('RIGHTPADDING', (0, 1), (0, -1), 4),
+        ('TOPPADDING', (1, 1), (-1, -1), 6), 
+        ('BOTTOMPADDING', (1, 1), (-1, -1), 6), 
+        
+        # Alignement des jours au centre (important pour les blocs de shift)
+        ('ALIGN', (1, 1), (-1, -1), 'CENTER'), 
+    ]))
+
+    story.append(table)
+
+    # --- 7. Génération du document ---
+    try:
+        doc.build(story)
+        pdf = buffer.getvalue()
+        buffer.close()
+        
+        return pdf, 200, {
+            'Content-Type': 'application/pdf',
+            'Content-Disposition': f'attachment; filename="planning_maihlili_{week_start.strftime("%Y%m%d")}.pdf"'
+        }
+    except Exception as e:
+        # Affiche l'erreur pour le débogage et retourne une erreur Flask
+        print(f"Erreur lors de la construction du PDF: {e}")
+        return jsonify({'error': 'Erreur lors de la construction du PDF.'}), 500
+
+@planning_bp.route('/api/assignment/move', methods=['POST'])
+@login_required
+def move_assignment():
+    # Vérification des droits du manager
+    if not current_user.is_manager:
+        return jsonify({'error': 'Accès refusé'}), 403
+
+    data = request.get_json()
+    assignment_id = data.get('assignment_id')
+    new_employee_id = data.get('new_employee_id')
+    new_date_str = data.get('new_date') # Format 'YYYY-MM-DD'
+
+    if not all([assignment_id, new_employee_id, new_date_str]):
+        return jsonify({'error': 'Données manquantes'}), 400
+    if data.get('version') is None:
+        return version_required()
+
+    try:
+        assignment = Assignment.query.get(assignment_id)
+        if not assignment:
+            return jsonify({'error': 'Assignation non trouvée'}), 404
+        
+        if not version_matches(assignment, data.get('version')):
+            return assignment_conflict(assignment)
+        
+        # --- LOGIQUE CRITIQUE DE MISE À JOUR DE DATE/HEURE ---
+        
+        # 1. Calculer la durée (timedelta) du shift
+        time_delta = assignment.end - assignment.start 
+        
+        # 2. Extraire l'heure et la minute de l'ancienne heure de début
+        #    La date (jour, mois, année) sera prise de new_date_str
+        old_time = assignment.start.strftime('%H:%M:%S')
+        
+        # 3. Créer le nouvel objet datetime de début
+        new_date_start = datetime.strptime(f"{new_date_str} {old_time}", '%Y-%m-%d %H:%M:%S')
+        
+        conflict = absence_conflict(new_employee_id, new_date_start, new_date_start + time_delta)
+        if conflict:
+            return conflict
+        
+        # 4. Mettre à jour l'assignation dans la DB
+        before = snapshot(assignment, ASSIGNMENT_FIELDS)
+        assignment.employee_id = new_employee_id
+        assignment.start = new_date_start
+        assignment.end = new_date_start + time_delta # Nouvelle fin = nouvelle heure de début + durée
+        
+        db.session.flush()
+        after = snapshot(assignment, ASSIGNMENT_FIELDS)
+        db.session.commit()
+        assignment_changed("move", assignment.id, before=before, after=after)
+        
+        return jsonify({'success': True, 'message': 'Assignation déplacée avec succès',
+                        'assignment': serialize_assignment_state(assignment)})
+
+    except StaleDataError:
+        db.session.rollback()
+        # Supprimée entre-temps : plus d'état à renvoyer au client
+        current = Assignment.query.get(assignment_id)
+        if not current:
+            return jsonify({'error': 'Assignation non trouvée'}), 404
+        return assignment_conflict(current)
+    except Exception as e:
+        db.session.rollback()
+        # Log l'erreur pour le débogage
+        print(f"Erreur lors du déplacement de l'assignation: {e}") 
+        return jsonify({'error': 'Erreur serveur lors de la mise à jour'}), 500
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""Équipes et appartenance des employés."""
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify, flash
+from flask_login import login_required, current_user
+
+from models import db, Employee, Team
+from access import get_manageable_employees
+from team_membership import (set_team_membership, clear_team_membership, remove_team_member, get_unmanageable_ids,
+                             can_manage_team)
+from audit import record_audit, snapshot, TEAM_FIELDS
+
+teams_bp = Blueprint("teams", __name__)
+
+# --- Gestion des Équipes ---
+
+@teams_bp.route("/teams", methods=["GET", "POST"])
+@login_required
+def manage_teams():
+    if not current_user.is_manager:
+        flash("Accès refusé", "error")
+        return redirect(url_for("dashboard.index"))
+        
+    if request.method == "POST":
+        name = request.form["name"]
+        description = request.form.get("description", "")
+        
+        try:
+            team = Team(
+                name=name,
+                description=description,
+                manager_id=current_user.employee.id if current_user.employee else None
+            )
+            db.session.add(team)
+            db.session.flush()
+            team_id, after = team.id, snapshot(team, TEAM_FIELDS)
+            db.session.commit()
+            record_audit("create", "team", team_id, after=after)
+            flash("Équipe créée avec succès", "success")
+        except Exception as e:
+            db.session.rollback()
+            flash("Erreur lors de la création de l'équipe", "error")
+    
+    # Afficher les équipes gérées
+    if current_user.is_admin:
+        teams = Team.query.all()
+    elif current_user.employee:
+        teams = Team.query.filter_by(manager_id=current_user.employee.id).all()
+    else:
+        teams = []
+    
+    return render_template("teams.html", teams=teams)
+
+@teams_bp.route("/api/teams/<int:team_id>", methods=["DELETE"])
+@login_required
+def delete_team(team_id):
+    if not current_user.is_manager:
+        return jsonify({"success": False, "error": "Accès refusé"}), 403
+    
+    try:
+        team = Team.query.get_or_404(team_id)
+        
+        # Vérifier les permissions
+        if not current_user.is_admin and team.manager_id != current_user.employee.id:
+            return jsonify({"success": False, "error": "Vous ne pouvez pas supprimer cette équipe"}), 403
+        
+        before = dict(snapshot(team, TEAM_FIELDS),
+                      employee_ids=[row[0] for row in db.session.query(Employee.id).filter(Employee.team_id == team.id)])
+        
+        # Retirer les employés de l'équipe avant de la supprimer (team_id et employee_teams, en bloc)
+        clear_team_membership(team.id)
+        
+        db.session.delete(team)
+        db.session.commit()
+        record_audit("delete", "team", team_id, before=before)
+        
+        return jsonify({"success": True})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": "Erreur lors de la suppression"}), 500
+
+def apply_team_membership(employee_ids, team_id):
+    """Vérifie les droits sur l'équipe et sur tout l'ensemble d'employés, puis applique en bloc."""
+    employee_ids = [int(emp_id) for emp_id in employee_ids]
+    if team_id is not None:
+        team = Team.query.get_or_404(int(team_id))
+        if not can_manage_team(current_user, team):
+            return jsonify({"success": False, "error": "Vous ne pouvez pas modifier cette équipe"}), 403
+        team_id = team.id
+    
+    # Tout ou rien : un seul employé hors périmètre refuse l'ensemble
+    rejected_ids = get_unmanageable_ids(current_user, employee_ids)
+    if rejected_ids:
+        return jsonify({
+            "success": False,
+            "error": "Vous ne pouvez pas modifier certains employés",
+            "rejected_ids": rejected_ids
+        }), 403
+    
+    before = {"team_ids": {str(row[0]): row[1] for row in db.session.query(Employee.id, Employee.team_id).filter(
+        Employee.id.in_(employee_ids))}}
+    updated = set_team_membership(employee_ids, team_id)
+    db.session.commit()
+    record_audit("update", "team", team_id, before=before, after={"employee_ids": sorted(set(employee_ids)), "team_id": team_id})
+    return jsonify({"success": True, "updated": updated})
+
+@teams_bp.route("/api/unassigned-employees")
+@login_required
+def get_unassigned_employees():
+    if not current_user.is_manager:
+        return jsonify([])
+    
+    # Employés sans équipe que le manager peut gérer
+    manageable_employees = get_manageable_employees(current_user)
+    unassigned = [emp for emp in manageable_employees if not emp.team_id]
+    
+    return jsonify([{
+        "id": emp.id,
+        "full_name": emp.full_name,
+        "position": emp.position
+    } for emp in unassigned])
+
+@teams_bp.route("/api/teams/<int:team_id>/assign", methods=["POST"])
+@login_required
+def assign_employees_to_team(team_id):
+    if not current_user.is_manager:
+        return jsonify({"success": False, "error": "Accès refusé"}), 403
+    
+    try:
+        data = request.get_json()
+        return apply_team_membership(data.get("employee_ids", []), team_id)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": "Erreur lors de l'assignation"}), 500
+
+@teams_bp.route("/api/teams/memberships", methods=["POST"])
+@login_required
+def update_team_memberships():
+    """Déplace un ensemble d'employés vers une équipe ({"employee_ids": [...], "team_id": id ou null})."""
+    if not current_user.is_manager:
+        return jsonify({"success": False, "error": "Accès refusé"}), 403
+    
+    try:
+        data = request.get_json() or {}
+        employee_ids = data.get("employee_ids", [])
+        if not isinstance(employee_ids, list):
+            return jsonify({"success": False, "error": "employee_ids doit être une liste"}), 400
+        return apply_team_membership(employee_ids, data.get("team_id"))
+    except (TypeError, ValueError):
+        db.session.rollback()
+        return jsonify({"success": False, "error": "Identifiants invalides"}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erreur lors de la mise à jour des équipes: {e}")
+        return jsonify({"success": False, "error": "Erreur lors de la mise à jour des équipes"}), 500
+
+@teams_bp.route("/api/teams/<int:team_id>/remove/<int:employee_id>", methods=["POST"])
+@login_required
+def remove_employee_from_team(team_id, employee_id):
+    if not current_user.is_manager:
+        return jsonify({"success": False, "error": "Accès refusé"}), 403
+    
+    try:
+        employee = Employee.query.get_or_404(employee_id)
+        
+        if not employee.can_be_managed_by(current_user):
+            return jsonify({"success": False, "error": "Vous ne pouvez pas modifier cet employé"}), 403
+        
+        previous_team_id = employee.team_id
+        # Seul le lien vers cette équipe est retiré (l'employé reste dans ses autres équipes)
+        if not remove_team_member(employee.id, team_id):
+            return jsonify({"success": False, "error": "Cet employé ne fait pas partie de cette équipe"}), 404
+        db.session.commit()
+        record_audit("update", "team", team_id, before={"team_ids": {str(employee_id): previous_team_id}},
+                     after={"team_ids": {str(employee_id): None if previous_team_id == team_id else previous_team_id}})
+        
+        return jsonify({"success": True})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": "Erreur lors de la modification"}), 500
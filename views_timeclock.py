@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""API des badgeuses.
+
+Chaque badgeuse s'authentifie par un jeton propre à son établissement :
+TIMECLOCK_API_TOKENS="<établissement>=<jeton>,<établissement>=<jeton>" ; les pointages sont
+enregistrés sur le shard de cet établissement. TIMECLOCK_API_TOKEN (jeton unique, sans
+établissement) écrit sur la base centrale : il ne convient qu'aux déploiements sans shard.
+"""
+import os
+import hmac
+
+from flask import Blueprint, request, jsonify
+from sqlalchemy.exc import IntegrityError
+
+from models import db
+from timeclock import ingest_punches, has_idempotency_conflict, PunchValidationError
+from sharding import get_establishment_state, tenant_scope
+
+timeclock_bp = Blueprint("timeclock", __name__)
+
+
+def _terminal_establishment(auth_header):
+    """(jeton valide, établissement de la badgeuse) d'après l'en-tête Authorization."""
+    for item in os.environ.get("TIMECLOCK_API_TOKENS", "").split(","):
+        establishment_id, _, token = item.strip().partition("=")
+        if token and hmac.compare_digest(auth_header, f"Bearer {token}"):
+            return True, int(establishment_id)
+    expected_token = os.environ.get("TIMECLOCK_API_TOKEN")
+    if expected_token and hmac.compare_digest(auth_header, f"Bearer {expected_token}"):
+        return True, None
+    return False, None
+
+# ----------------------------------------------------------------------
+# 🛂 API Badgeuses : ingestion des pointages par lots
+# ----------------------------------------------------------------------
+@timeclock_bp.route('/api/timeclock/punches', methods=['POST'])
+def ingest_clock_punches():
+    """Reçoit un lot de pointages {key, employee_id, type: in|out, timestamp, terminal_id}."""
+    # Les badgeuses s'authentifient par jeton (pas de session utilisateur, donc pas de shard fixé par la requête)
+    valid, establishment_id = _terminal_establishment(request.headers.get("Authorization", ""))
+    if not valid:
+        return jsonify({"success": False, "error": "Jeton de badgeuse invalide"}), 401
+    if establishment_id:
+        _, moving, deleted = get_establishment_state(establishment_id)
+        if deleted:
+            return jsonify({"success": False, "error": "Cet établissement a été supprimé"}), 403
+        if moving:
+            return jsonify({"success": False, "error": "Maintenance en cours sur cet établissement, réessayez dans quelques minutes"}), 503
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"success": False, "error": "Objet JSON attendu"}), 400
+    punches = data.get("punches")
+    if not isinstance(punches, list):
+        return jsonify({"success": False, "error": "Liste 'punches' manquante"}), 400
+    
+    with tenant_scope(establishment_id):
+        try:
+            results = ingest_punches(punches, establishment_id=establishment_id)
+        except PunchValidationError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        except IntegrityError as e:
+            db.session.rollback()
+            # Même clé envoyée en parallèle par une autre requête : le client peut renvoyer le lot
+            if has_idempotency_conflict(punches):
+                return jsonify({"success": False, "error": "Conflit de clé d'idempotence, renvoyer le lot"}), 409
+            print(f"Erreur d'intégrité lors de l'ingestion des pointages: {e}")
+            return jsonify({"success": False, "error": "Erreur serveur lors de l'enregistrement"}), 500
+        except Exception as e:
+            db.session.rollback()
+            print(f"Erreur lors de l'ingestion des pointages: {e}")
+            return jsonify({"success": False, "error": "Erreur serveur lors de l'enregistrement"}), 500
+    
+    statuses = list(results.values())
+    return jsonify({
+        "success": True,
+        "accepted": len(statuses) - statuses.count('duplicate') - statuses.count('unknown_employee'),
+        "duplicates": statuses.count('duplicate'),
+        "rejected": statuses.count('unknown_employee'),
+        "results": results
+    })